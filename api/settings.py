@@ -15,6 +15,8 @@ from pathlib import Path
 import os
 
 import dj_database_url
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -40,6 +42,10 @@ CORS_ALLOWED_ORIGINS = [
     'http://localhost:5173', 'https://finance-app-client-ruddy.vercel.app',
 ]
 
+# conditional requests from the client
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match', 'if-modified-since')
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified', 'X-Cache', 'Server-Timing']
+
 CSRF_TRUSTED_ORIGINS = ['https://web-production-de787.up.railway.app']
 
 
@@ -59,8 +65,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # only active with PERSONALFINANCE_SERVER_TIMING
+    'personalfinance.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -108,6 +116,110 @@ if 'DATABASE_URL' in os.environ:
         conn_health_checks=True,
      )
 
+# in-process connection pool for PostgreSQL (personalfinance/backends/postgresql_pool) instead of a
+# persistent connection per worker thread, connections go back to the pool after every request
+if 'DATABASE_URL' in os.environ and os.environ.get('DJANGO_DB_POOL', '') == 'True':
+    DATABASES['default'].update({
+        'ENGINE': 'personalfinance.backends.postgresql_pool',
+        'CONN_MAX_AGE': 0,
+        # the pool checks connections idle for longer than check_after
+        'CONN_HEALTH_CHECKS': False,
+        'POOL': {
+            'max_size': int(os.environ.get('DJANGO_DB_POOL_SIZE', 10)),
+            'timeout': float(os.environ.get('DJANGO_DB_POOL_TIMEOUT', 10)),
+            'max_idle': float(os.environ.get('DJANGO_DB_POOL_MAX_IDLE', 300)),
+            'max_lifetime': float(os.environ.get('DJANGO_DB_POOL_MAX_LIFETIME', 3600)),
+            'check_after': float(os.environ.get('DJANGO_DB_POOL_CHECK_AFTER', 30)),
+        },
+    })
+
+# read replicas of the default database, comma separated URLs (sqlite:///replica.sqlite3 to try it locally)
+# the personalfinance get views read from them, see personalfinance/routers.py
+PERSONALFINANCE_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get('DJANGO_REPLICA_URLS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {
+        **dj_database_url.parse(url, conn_max_age=500, conn_health_checks=True),
+        # tests read the test database through the replica aliases
+        'TEST': {'MIRROR': 'default'},
+    }
+    PERSONALFINANCE_REPLICAS.append(f'replica{index}')
+
+DATABASE_ROUTERS = ['personalfinance.routers.ReplicaRouter']
+
+# reads stay on the primary this long after a user's write (read your writes despite the replication lag)
+PERSONALFINANCE_REPLICA_PIN_SECONDS = int(os.environ.get('DJANGO_REPLICA_PIN_SECONDS', 5))
+
+# Cache (response cache of the finance api)
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# local memory is per process: use a shared backend (Redis, Memcached) with more than one worker
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# cache shared by every worker process (redis://host:6379/0), local memory of each process otherwise
+if 'DJANGO_REDIS_URL' in os.environ:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['DJANGO_REDIS_URL'],
+    }
+
+# the cache is seen by every worker process (Redis, Memcached, database), not only the one writing to it
+PERSONALFINANCE_SHARED_CACHE = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# verified knox tokens are only cached in a shared cache: a logout evicts the token from the cache
+# of the worker handling it, the other workers would keep accepting it until it expires there
+PERSONALFINANCE_AUTH_CACHE = PERSONALFINANCE_SHARED_CACHE
+
+# cached responses and etags (per user data version) only with a shared cache: a write bumps the version
+# in the cache of the worker handling it, the others would keep serving the old body and answering 304
+PERSONALFINANCE_RESPONSE_CACHE = PERSONALFINANCE_SHARED_CACHE
+
+# the read your writes pin of a user is kept in the cache, the worker serving their next request must see it
+if PERSONALFINANCE_REPLICAS and not PERSONALFINANCE_SHARED_CACHE:
+    raise ImproperlyConfigured('DJANGO_REPLICA_URLS needs a cache shared by the workers (DJANGO_REDIS_URL)')
+
+# async overview, budget, pot and transaction list views (set by api/asgi.py)
+PERSONALFINANCE_ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '') == 'True'
+
+# Server-Timing header and a log line per request (query count and time, serializer and total time)
+# requests over either threshold are logged as warnings with their slowest SQL
+PERSONALFINANCE_SERVER_TIMING = os.environ.get('DJANGO_SERVER_TIMING', '') == 'True'
+PERSONALFINANCE_SLOW_REQUEST_MS = int(os.environ.get('DJANGO_SLOW_REQUEST_MS', 500))
+PERSONALFINANCE_SLOW_REQUEST_QUERIES = int(os.environ.get('DJANGO_SLOW_REQUEST_QUERIES', 30))
+
+# view methods over their query budget are logged as warnings, raise with strict (always in tests)
+PERSONALFINANCE_QUERY_BUDGET_STRICT = os.environ.get('DJANGO_QUERY_BUDGET_STRICT', '') == 'True'
+
+TEST_RUNNER = 'api.test_runner.QueryBudgetTestRunner'
+
+# PostgreSQL: the transaction table partitioned by range of date, 'month' or 'year' (applied by migration 0009)
+PERSONALFINANCE_TRANSACTION_PARTITIONS = os.environ.get('DJANGO_TRANSACTION_PARTITIONS', '')
+
+# columnar files of the transactions moved out of the database by archive_transactions, on a persistent
+# volume: the archived rows only exist there (the container filesystem is gone after a redeploy)
+# archive_transactions refuses to run without it
+PERSONALFINANCE_ARCHIVE_DIR = os.environ.get('DJANGO_ARCHIVE_DIR', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'personalfinance.timing': {'handlers': ['console'], 'level': 'INFO'},
+        'personalfinance.pool': {'handlers': ['console'], 'level': 'WARNING'},
+        'personalfinance.query_budget': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
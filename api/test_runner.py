@@ -0,0 +1,24 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+# tests fail whenever a view method goes over its query budget (personalfinance/query_budget.py)
+# and archive into a temporary directory (never the real archive of PERSONALFINANCE_ARCHIVE_DIR)
+class QueryBudgetTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.query_budget_strict = settings.PERSONALFINANCE_QUERY_BUDGET_STRICT
+        settings.PERSONALFINANCE_QUERY_BUDGET_STRICT = True
+
+        self.archive_dir = settings.PERSONALFINANCE_ARCHIVE_DIR
+        settings.PERSONALFINANCE_ARCHIVE_DIR = tempfile.mkdtemp(prefix='personalfinance-archive-')
+
+    def teardown_test_environment(self, **kwargs):
+        shutil.rmtree(settings.PERSONALFINANCE_ARCHIVE_DIR, ignore_errors=True)
+        settings.PERSONALFINANCE_ARCHIVE_DIR = self.archive_dir
+
+        settings.PERSONALFINANCE_QUERY_BUDGET_STRICT = self.query_budget_strict
+        super().teardown_test_environment(**kwargs)
@@ -1,7 +1,9 @@
 from django.contrib import admin
 
-from .models import Transaction, Budget, Pot
+from .models import Transaction, Budget, Pot, MonthlySpending, RecurringSeries
 # Register your models here.
 admin.site.register(Transaction)
 admin.site.register(Budget)
 admin.site.register(Pot)
+admin.site.register(MonthlySpending)
+admin.site.register(RecurringSeries)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PersonalfinanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'personalfinance'
+
+    def ready(self):
+        # connect signal handlers
+        from . import signals
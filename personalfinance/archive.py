@@ -0,0 +1,397 @@
+import array
+import bisect
+import heapq
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .helpers import next_month, start_of_day
+
+
+# archive files: <PERSONALFINANCE_ARCHIVE_DIR>/<user id>/<year>.pfa, one per user and year (current timezone)
+# layout: MAGIC, header length (uint32 little endian), JSON header, then one array per column
+# header: { rows, byteorder, columns: { name: offset from the first column }, dictionaries: { name: [values] },
+#   summary: overview totals of the file (archived_summary reads no column) }
+# rows are in (date, id) order, a date range is a slice found by bisecting the date column
+MAGIC = b'PFA1'
+SUFFIX = '.pfa'
+# new files are written to a unique <year>.pfa.<random>.tmp next to the file they replace
+STAGING_SUFFIX = '.tmp'
+# columns start on 8 byte boundaries (memoryview.cast of the mapped file)
+ALIGNMENT = 8
+
+# rows are tuples in the export field order (exports.FIELDS)
+FIELDS = ['id', 'avatar', 'name', 'category', 'date', 'amount', 'recurring', 'series']
+
+# stored columns -> array typecode
+# dates are microseconds since the epoch (UTC)
+# avatar, name and category are dictionary encoded: indexes into the file's sorted distinct values
+# the series is not stored: detection deletes and recreates series from the hot rows only, an archived id
+# would end up pointing at nothing (or another series), recurring is stored as flagged or in a series instead
+COLUMNS = {
+    'id': 'q',
+    'avatar': 'i',
+    'name': 'i',
+    'category': 'i',
+    'date': 'q',
+    'amount': 'q',
+    'recurring': 'b',
+}
+DICTIONARY_COLUMNS = ['avatar', 'name', 'category']
+
+SUMMARY_FIELDS = ('income_total', 'income_count', 'expenses_total', 'expenses_count', 'recurring_total', 'recurring_count')
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def to_micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=value)
+
+
+def aligned(size):
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+# '' when no archive is configured (nothing is archived then)
+def archive_dir():
+    return str(settings.PERSONALFINANCE_ARCHIVE_DIR or '')
+
+
+def user_dir(user_id):
+    return os.path.join(archive_dir(), str(user_id))
+
+
+def period_path(user_id, year):
+    return os.path.join(user_dir(user_id), f'{year}{SUFFIX}')
+
+
+# archived years of a user, oldest first
+def user_years(user_id):
+    if not archive_dir():
+        return []
+
+    try:
+        names = os.listdir(user_dir(user_id))
+    except FileNotFoundError:
+        return []
+
+    return sorted(int(name[:-len(SUFFIX)]) for name in names if name.endswith(SUFFIX))
+
+
+# users with an archive
+def archived_users():
+    if not archive_dir():
+        return []
+
+    try:
+        names = os.listdir(archive_dir())
+    except FileNotFoundError:
+        return []
+
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+# staged files of runs that didn't finish -> [(period path, staged path)], oldest first
+# (archive_transactions refuses to run until they are recovered)
+def staged_files():
+    staged = []
+
+    for user_id in archived_users():
+        directory = user_dir(user_id)
+        for name in os.listdir(directory):
+            if name.endswith(STAGING_SUFFIX):
+                staged.append((os.path.join(directory, name.split(SUFFIX)[0] + SUFFIX), os.path.join(directory, name)))
+
+    return sorted(staged, key=lambda item: os.path.getmtime(item[1]))
+
+
+def remove_user_archive(user_id):
+    if archive_dir():
+        shutil.rmtree(user_dir(user_id), ignore_errors=True)
+
+
+# write the rows (FIELDS tuples) of a period file, replaced atomically (no file without rows)
+def write_period(path, rows):
+    if rows:
+        os.replace(stage_period(path, rows), path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+# write the rows of a period file next to it -> path of the new file (os.replace it over path)
+def stage_period(path, rows):
+    rows = sorted(rows, key=lambda row: (row[4], row[0]))
+    dictionaries = {}
+    blocks = []
+
+    for index, name in enumerate(FIELDS):
+        if name not in COLUMNS:
+            continue
+
+        values = [row[index] for row in rows]
+        if name in DICTIONARY_COLUMNS:
+            dictionaries[name] = sorted(set(values))
+            codes = {value: code for code, value in enumerate(dictionaries[name])}
+            values = [codes[value] for value in values]
+        elif name == 'date':
+            values = [to_micros(value) for value in values]
+        elif name == 'recurring':
+            values = [row[6] or row[7] is not None for row in rows]
+        blocks.append((name, array.array(COLUMNS[name], values).tobytes()))
+
+    offsets = {}
+    position = 0
+    for name, block in blocks:
+        offsets[name] = position
+        position += aligned(len(block))
+
+    header = json.dumps({
+        'rows': len(rows),
+        'byteorder': sys.byteorder,
+        'columns': offsets,
+        'dictionaries': dictionaries,
+        'summary': summarize(rows),
+    }).encode()
+    start = len(MAGIC) + 4 + len(header)
+
+    directory, filename = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(prefix=f'{filename}.', suffix=STAGING_SUFFIX, dir=directory)
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(header).to_bytes(4, 'little'))
+        file.write(header)
+        file.write(bytes(aligned(start) - start))
+        for name, block in blocks:
+            file.write(block)
+            file.write(bytes(aligned(len(block)) - len(block)))
+        file.flush()
+        os.fsync(file.fileno())
+
+    return temporary
+
+
+# overview totals of rows (see spending.get_transaction_summary), recurring: flagged or in a series
+def summarize(rows):
+    totals = dict.fromkeys(SUMMARY_FIELDS, 0)
+
+    for row in rows:
+        amount = row[5]
+        if amount > 0:
+            totals['income_total'] += amount
+            totals['income_count'] += 1
+        elif amount < 0:
+            totals['expenses_total'] += amount
+            totals['expenses_count'] += 1
+        if row[6] or row[7] is not None:
+            totals['recurring_total'] += amount
+            totals['recurring_count'] += 1
+
+    return totals
+
+
+# one period file mapped into memory, columns are typed memoryviews of the mapping (nothing is copied)
+class ArchivePeriod:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mmap[:len(MAGIC)] != MAGIC:
+            self.mmap.close()
+            raise ValueError(f'{path} is not a transaction archive')
+
+        size = int.from_bytes(self.mmap[len(MAGIC):len(MAGIC) + 4], 'little')
+        start = len(MAGIC) + 4
+        header = json.loads(self.mmap[start:start + size])
+        if header['byteorder'] != sys.byteorder:
+            self.mmap.close()
+            raise ValueError(f'{path} was written on a {header["byteorder"]} endian machine')
+
+        # <year>.pfa or a staged <year>.pfa.<random>.tmp
+        self.year = int(os.path.basename(path).split('.')[0])
+        self.rows = header['rows']
+        self.dictionaries = header['dictionaries']
+        self.summary = header['summary']
+        self.view = memoryview(self.mmap)
+        data = aligned(start + size)
+
+        self.columns = {}
+        for name, offset in header['columns'].items():
+            # files written before the series was left out still have its column
+            if name not in COLUMNS:
+                continue
+            typecode = COLUMNS[name]
+            length = self.rows * array.array(typecode).itemsize
+            self.columns[name] = self.view[data + offset:data + offset + length].cast(typecode)
+
+    def close(self):
+        for column in self.columns.values():
+            column.release()
+        self.view.release()
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # first and end index of the rows in [start, end) (datetimes, None for open ends)
+    def date_range(self, start=None, end=None):
+        dates = self.columns['date']
+        first = bisect.bisect_left(dates, to_micros(start)) if start else 0
+        last = bisect.bisect_left(dates, to_micros(end)) if end else self.rows
+
+        return first, max(first, last)
+
+    # FIELDS tuple of a row
+    def row(self, index):
+        columns = self.columns
+
+        return (
+            columns['id'][index],
+            self.dictionaries['avatar'][columns['avatar'][index]],
+            self.dictionaries['name'][columns['name'][index]],
+            self.dictionaries['category'][columns['category'][index]],
+            from_micros(columns['date'][index]),
+            columns['amount'][index],
+            bool(columns['recurring'][index]),
+            None,
+        )
+
+    # codes of the dictionary values in values -> { code: value }
+    def codes(self, name, values):
+        return {code: value for code, value in enumerate(self.dictionaries[name]) if value in values}
+
+
+# open archive periods of a user overlapping [start, end), oldest first (closed after each one)
+def user_periods(user_id, start=None, end=None):
+    for year in user_years(user_id):
+        if start and year < timezone.localtime(start).year:
+            continue
+        if end and year > timezone.localtime(end).year:
+            continue
+
+        with ArchivePeriod(period_path(user_id, year)) as period:
+            yield period
+
+
+# every archived row of a user's year
+def read_period(user_id, year):
+    path = period_path(user_id, year)
+    if not archive_dir() or not os.path.exists(path):
+        return []
+
+    with ArchivePeriod(path) as period:
+        return [period.row(index) for index in range(period.rows)]
+
+
+# budget spending of archived transactions in [start, end) -> { category: sum of amounts }
+def archived_spending(user_id, categories, start, end):
+    totals = {}
+
+    for period in user_periods(user_id, start, end):
+        codes = period.codes('category', categories)
+        if not codes:
+            continue
+
+        first, last = period.date_range(start, end)
+        category_codes, amounts = period.columns['category'], period.columns['amount']
+        for index in range(first, last):
+            category = codes.get(category_codes[index])
+            if category is not None:
+                totals[category] = totals.get(category, 0) + amounts[index]
+
+    return totals
+
+
+# overview totals of archived transactions (SUMMARY_FIELDS), from the file headers
+def archived_summary(user_id):
+    totals = dict.fromkeys(SUMMARY_FIELDS, 0)
+
+    for period in user_periods(user_id):
+        for name in SUMMARY_FIELDS:
+            totals[name] += period.summary[name]
+
+    return totals
+
+
+# monthly rollups of archived transactions -> { (user_id, category, month): (total, count) }
+# months of a period are date slices, no row is converted
+def archived_rollups(user_ids=None):
+    rollups = {}
+
+    for user_id in archived_users() if user_ids is None else user_ids:
+        for period in user_periods(user_id):
+            categories, amounts = period.columns['category'], period.columns['amount']
+            month = date(period.year, 1, 1)
+
+            for _ in range(12):
+                first, last = period.date_range(start_of_day(month), start_of_day(next_month(month)))
+                for index in range(first, last):
+                    key = (user_id, period.dictionaries['category'][categories[index]], month)
+                    total, count = rollups.get(key, (0, 0))
+                    rollups[key] = (total + amounts[index], count + 1)
+                month = next_month(month)
+
+    return rollups
+
+
+# archived rows (FIELDS tuples) of a user matching the export filters, streamed from the files in date order:
+# oldest first for the 'date' sort, newest first for every other (helpers.get_sort_str), never all in memory
+# search: case-insensitive substring of the name like the search backends
+def archived_rows(user_id, search_term, category, sort):
+    def matching(period, indexes):
+        names = period.columns['name']
+        name_codes = None
+        if search_term != 'empty':
+            term = search_term.lower()
+            name_codes = {code for code, name in enumerate(period.dictionaries['name']) if term in name.lower()}
+        category_code = None
+        if category != 'All':
+            category_code = period.codes('category', {category})
+            if not category_code:
+                return
+
+        for index in indexes:
+            if name_codes is not None and names[index] not in name_codes:
+                continue
+            if category_code is not None and period.columns['category'][index] not in category_code:
+                continue
+            yield period.row(index)
+
+    def rows(descending):
+        years = user_years(user_id)
+        for year in reversed(years) if descending else years:
+            with ArchivePeriod(period_path(user_id, year)) as period:
+                indexes = range(period.rows - 1, -1, -1) if descending else range(period.rows)
+                yield from matching(period, indexes)
+
+    return rows(descending=sort != 'date')
+
+
+# key of the date orderings (pagination.keyset_ordering: the date, then the id)
+def sort_key(row):
+    return (row[4], row[0])
+
+
+# export rows of the hot table and the archive
+# date orders: merged into one order (datetimes and ids compare the same in python and the database)
+# name and amount orders, relevance: archived rows newest first after the hot ones, sorting them would take
+# every archived row in memory, and names don't sort like the database collation
+def merge_rows(rows, archived, sort):
+    if sort in ('date', '-date'):
+        return heapq.merge(rows, archived, key=sort_key, reverse=sort == '-date')
+
+    return (row for part in (rows, archived) for row in part)
@@ -0,0 +1,332 @@
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import path
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+
+from .authentication import CachedTokenAuthentication
+from .cache import (
+    RESPONSE_TIMEOUT, count, is_replica_read, not_modified, request_version, response_cache_enabled, response_etag,
+    response_key, set_conditional_headers,
+)
+from .helpers import filter_transactions, get_overview_includes, get_summary_mode, get_sort_str, get_spending_period
+from .models import Budget, Pot, Transaction
+from .pagination import PAGE_SIZE, capped_count, capped_num_pages, keyset_ordering, keyset_page
+from .query_budget import async_query_budget, count_async_queries
+from .recurring import RECURRING
+from .routers import reads_for_user, replica_reads
+from .serializers import budget_values, pot_values, transaction_values
+from .spending import get_budget_spending, get_transaction_summary
+from .views import BudgetListView, IndexView, PotListView, TransactionListView
+
+
+# threads running the queries of the async views, each keeps its own database connection
+# django's async orm methods all share one thread per process, queries gathered with them
+# would still run one after the other
+QUERY_THREADS = 8
+
+query_executor = ThreadPoolExecutor(QUERY_THREADS, thread_name_prefix='personalfinance-query')
+
+renderer = JSONRenderer()
+
+
+def in_query_thread(fn, *args):
+    # pool threads never see the request signals that close stale connections
+    close_old_connections()
+    try:
+        with count_async_queries():
+            return fn(*args)
+    finally:
+        # back to the connection pool right away when pooled (CONN_MAX_AGE 0), kept otherwise
+        close_old_connections()
+
+
+# run a blocking (orm) function in the query threads -> awaitable result
+def run_query(fn, *args):
+    return sync_to_async(partial(in_query_thread, fn, *args), thread_sensitive=False, executor=query_executor)()
+
+
+# same body and content type as a drf Response rendered as json
+def json_response(data, status_code=status.HTTP_200_OK):
+    response = HttpResponse(renderer.render(data), status=status_code, content_type='application/json')
+    patch_vary_headers(response, ['Accept'])
+
+    return response
+
+
+def unauthorized(detail):
+    response = json_response({ 'detail': detail }, status.HTTP_401_UNAUTHORIZED)
+    response['WWW-Authenticate'] = 'Token'
+
+    return response
+
+
+# -> user or None without a token, raises AuthenticationFailed
+def authenticate(request):
+    result = CachedTokenAuthentication().authenticate(request)
+
+    return result[0] if result else None
+
+
+# cached response data, counted as a hit or a miss
+def cached_data(key):
+    data = cache.get(key)
+    count('hits' if data is not None else 'misses')
+
+    return data
+
+
+def get_budgets_with_spending(user_id, period):
+    budgets_data = budget_values.serialize(Budget.objects.filter(user=user_id))
+    # calculate budget spending in period
+    budget_spending = get_budget_spending(user_id, [budget['category'] for budget in budgets_data], period)
+
+    return budgets_data, budget_spending
+
+
+# async get of a read view, same responses (cache, etags) as its sync view
+# posts (creating budgets and pots) are served by the sync view
+class AsyncReadView(View):
+    http_method_names = ['get', 'post', 'head', 'options']
+    sync_view_class = None
+    # responses cached like @cache_response
+    cached = False
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # token authentication, no sessions (like APIView)
+        view.csrf_exempt = True
+
+        return view
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.sync_view_class.as_view())(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            user = await run_query(authenticate, request)
+        except exceptions.AuthenticationFailed as error:
+            return unauthorized(error.detail)
+
+        if user is None:
+            return unauthorized(exceptions.NotAuthenticated.default_detail)
+        request.user = user
+
+        # budget of the sync view's get (authentication excluded like DRF)
+        name = f'{type(self).__name__}.get'
+        with async_query_budget(name, request, self.sync_view_class.get.query_budget):
+            return await self.respond(request, user, *args, **kwargs)
+
+    # cache calls are blocking (a network round trip with a shared cache), they run in the query threads
+    async def respond(self, request, user, *args, **kwargs):
+        # no cached responses or etags without a shared cache, like the sync views
+        if not response_cache_enabled():
+            with reads_for_user(user.id):
+                return json_response(*await self.get_data(request, *args, **kwargs))
+
+        # cache keys and etags of the sync view, both modes share them
+        view_name = self.sync_view_class.__name__
+        version = await run_query(request_version, request)
+        etag = response_etag(request, view_name, version, renderer.format)
+        # versions are nanosecond timestamps of the last write
+        last_modified = version // 10 ** 9
+
+        if not_modified(request, etag, last_modified):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            with reads_for_user(user.id):
+                response = await self.cached_response(request, view_name, version, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK or is_replica_read(response):
+                    return response
+
+        set_conditional_headers(response, etag, last_modified)
+
+        return response
+
+    async def cached_response(self, request, view_name, version, *args, **kwargs):
+        if not self.cached:
+            return json_response(*await self.get_data(request, *args, **kwargs))
+
+        key = response_key(request, view_name, version)
+        data = await run_query(cached_data, key)
+
+        if data is not None:
+            response = json_response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        data, status_code = await self.get_data(request, *args, **kwargs)
+        # not read from a replica, like cache_response
+        if status_code == status.HTTP_200_OK and not replica_reads.get():
+            await run_query(cache.set, key, data, RESPONSE_TIMEOUT)
+
+        response = json_response(data, status_code)
+        response['X-Cache'] = 'MISS'
+
+        return response
+
+    # -> (data, status code)
+    async def get_data(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+
+# Overview page, its lists are read concurrently
+class AsyncIndexView(AsyncReadView):
+    sync_view_class = IndexView
+    cached = True
+
+    async def get_data(self, request, *args, **kwargs):
+        # spending period (current month by default)
+        try:
+            period = get_spending_period(request.GET)
+        except ValueError:
+            return { 'message': 'Please enter a valid date range' }, status.HTTP_400_BAD_REQUEST
+
+        user_id = request.user.id
+        transactions = Transaction.objects.filter(user=user_id)
+        lists = {
+            'income': transactions.filter(amount__gt=0),
+            'expenses': transactions.filter(amount__lt=0),
+            'recurring_bills': transactions.filter(RECURRING),
+        }
+
+        summary = get_summary_mode(request.GET)
+        if summary:
+            lists = { name: lists[name] for name in get_overview_includes(request.GET) }
+
+        queries = [
+            run_query(pot_values.serialize, Pot.objects.filter(user=user_id)),
+            run_query(get_budgets_with_spending, user_id, period),
+            run_query(transaction_values.serialize, transactions.order_by('-date')[:5]),
+        ]
+        queries += [run_query(transaction_values.serialize, queryset) for queryset in lists.values()]
+        if summary:
+            queries.append(run_query(get_transaction_summary, user_id))
+
+        pots_data, (budgets_data, budget_spending), recent_transactions, *results = await asyncio.gather(*queries)
+
+        data = { 'pots': pots_data,
+                 'budgets': budgets_data,
+                 'recent_transactions': recent_transactions,
+                 'budget_spending': budget_spending
+               }
+
+        if summary:
+            data['summary'] = results.pop()
+
+        for name, rows in zip(lists, results):
+            data[name] = rows
+
+        return data, status.HTTP_200_OK
+
+
+class AsyncBudgetListView(AsyncReadView):
+    sync_view_class = BudgetListView
+    cached = True
+
+    async def get_data(self, request, *args, **kwargs):
+        try:
+            period = get_spending_period(request.GET)
+        except ValueError:
+            return { 'message': 'Please enter a valid date range' }, status.HTTP_400_BAD_REQUEST
+
+        budgets_data, budget_spending = await run_query(get_budgets_with_spending, request.user.id, period)
+
+        return {'budgets': budgets_data, 'budget_spending': budget_spending}, status.HTTP_200_OK
+
+
+class AsyncPotListView(AsyncReadView):
+    sync_view_class = PotListView
+    cached = True
+
+    async def get_data(self, request, *args, **kwargs):
+        pots = Pot.objects.filter(user=request.user.id)
+
+        return await run_query(pot_values.serialize, pots), status.HTTP_200_OK
+
+
+# transaction page, the rows are read while they are counted
+class AsyncTransactionListView(AsyncReadView):
+    sync_view_class = TransactionListView
+
+    async def get_data(self, request, search_term, category, sort_by, page, *args, **kwargs):
+        try:
+            sort = get_sort_str(sort_by, search=search_term != 'empty')
+            # built in the query threads, the search backend may look at the database once
+            transactions = partial(filter_transactions, request.user.id, search_term, category, sort)
+
+            return await self.paginate(transactions, sort, page, request.GET), status.HTTP_200_OK
+
+        except Exception:
+            return { 'page_list': [], 'num_pages': 0 }, status.HTTP_204_NO_CONTENT
+
+    # same pages as paginate_transactions
+    async def paginate(self, transactions, sort, page, params):
+        capped = params.get('count') == 'capped'
+
+        if 'cursor' in params:
+            queries = [run_query(lambda: keyset_page(transactions(), sort, params.get('cursor'), values=transaction_values))]
+            if capped:
+                queries.append(run_query(lambda: capped_num_pages(transactions())))
+
+            (rows, next_cursor), *pages = await asyncio.gather(*queries)
+            data = {
+                'page_list': rows,
+                'next_cursor': next_cursor,
+            }
+            if capped:
+                data['num_pages'], data['num_pages_capped'] = pages[0]
+
+            return data
+
+        if page < 1:
+            raise ValueError('Invalid page')
+
+        offset = (page - 1) * PAGE_SIZE
+        rows, row_count = await asyncio.gather(
+            run_query(lambda: transaction_values.serialize(transactions().order_by(*keyset_ordering(sort))[offset:offset + PAGE_SIZE])),
+            run_query(lambda: capped_count(transactions()) if capped else (transactions().count(), False)),
+        )
+        row_count, num_pages_capped = row_count
+
+        # like Paginator: the first page always exists
+        num_pages = math.ceil(max(row_count, 1) / PAGE_SIZE)
+        if page > num_pages:
+            raise ValueError('Invalid page')
+
+        data = {
+            'page_list': rows,
+            'num_pages': num_pages,
+        }
+        if capped:
+            data['num_pages_capped'] = num_pages_capped
+
+        return data
+
+
+# sync view -> async view served instead of it (PERSONALFINANCE_ASYNC_VIEWS)
+ASYNC_VIEWS = {
+    IndexView: AsyncIndexView,
+    BudgetListView: AsyncBudgetListView,
+    PotListView: AsyncPotListView,
+    TransactionListView: AsyncTransactionListView,
+}
+
+
+# url patterns with the async views in place of their sync views (same order)
+def async_urlpatterns(urlpatterns):
+    return [
+        path(str(pattern.pattern), ASYNC_VIEWS[pattern.callback.view_class].as_view())
+        if getattr(pattern.callback, 'view_class', None) in ASYNC_VIEWS else pattern
+        for pattern in urlpatterns
+    ]
@@ -1,7 +1,9 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
+from .query_budget import query_budget
 from .serializers import CreateUserSerializer, LoginSerializer, UserSerializer
 from knox.models import AuthToken
+from knox import views as knox_views
 
 # user create
 class UserCreate(generics.GenericAPIView):
@@ -10,6 +12,7 @@ class UserCreate(generics.GenericAPIView):
     
     serializer_class = CreateUserSerializer
 
+    @query_budget(3)
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -27,6 +30,7 @@ class LoginAPI(generics.GenericAPIView):
 
      serializer_class = LoginSerializer
 
+     @query_budget(2)
      def post(self, request, *args, **kwargs):
          serializer = self.get_serializer(data=request.data)
          serializer.is_valid(raise_exception=True)
@@ -36,3 +40,9 @@ class LoginAPI(generics.GenericAPIView):
              "user": UserSerializer(user, context=self.get_serializer_context()).data,
              "token": AuthToken.objects.create(user)[1]
          })
+
+# logout (knox), deletes the token
+class LogoutAPI(knox_views.LogoutView):
+    @query_budget(1)
+    def post(self, request, format=None):
+        return super().post(request, format=format)
@@ -0,0 +1,64 @@
+from functools import partial
+
+from django.db.backends.postgresql import base
+
+from personalfinance.pool import get_pool
+from personalfinance.timing import timed
+
+
+def check_connection(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+
+    return True
+
+
+# a returned connection is left like a new one: no open transaction, cursors, prepared statements or
+# session settings (the time zone and role are set again by init_connection_state)
+def reset_connection(connection):
+    if connection.closed:
+        raise base.Database.InterfaceError('connection already closed')
+
+    connection.rollback()
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute('DISCARD ALL')
+
+
+# PostgreSQL backend taking its connections from a pool per process and alias (personalfinance/pool.py),
+# shared by the threads of a WSGI worker and the sync threads of an ASGI worker
+# POOL settings: max_size, timeout, max_idle, max_lifetime, check_after (api/settings.py)
+# with CONN_MAX_AGE 0 django "closes" the connection after every request, it goes back to the pool
+class DatabaseWrapper(base.DatabaseWrapper):
+    # pool of the connection checked out, it goes back there
+    pool = None
+
+    def get_pool(self, conn_params=None):
+        return get_pool(
+            self.alias,
+            partial(super().get_new_connection, conn_params),
+            check=check_connection,
+            reset=reset_connection,
+            **self.settings_dict.get('POOL', {}),
+        )
+
+    def get_new_connection(self, conn_params):
+        # set by the base backend when it connects, pooled connections have the settings' level
+        self.isolation_level = base.IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', base.IsolationLevel.READ_COMMITTED)
+        )
+
+        # time waiting for a free connection (Server-Timing)
+        self.pool = self.get_pool(conn_params)
+        with timed('pool'):
+            return self.pool.get()
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # broken connections (errors_occurred and not usable) are closed
+                reusable = not self.errors_occurred or self.is_usable()
+                self.pool.put(self.connection, reusable=reusable)
@@ -0,0 +1,157 @@
+from django.db import transaction
+
+from .cache import DATA_SCOPES, bump_data_version
+from .helpers import scale_amounts
+from .models import Budget, Pot, Transaction
+from .query_budget import bulk_statements, check_query_budget, extend_query_budget
+from .recurring import detect_user_series, normalize_name
+from .serializers import BatchBudgetSerializer, BatchPotSerializer, BatchTransactionSerializer
+from .spending import update_spending_rollups
+
+
+# operations accepted in one request
+MAX_OPERATIONS = 500
+
+# model name -> (model, serializer, label used in messages)
+MODELS = {
+    'transaction': (Transaction, BatchTransactionSerializer, 'Transaction'),
+    'budget': (Budget, BatchBudgetSerializer, 'Budget'),
+    'pot': (Pot, BatchPotSerializer, 'Pot'),
+}
+
+
+def rollup_row(instance):
+    return (instance.user_id, instance.category, instance.date, instance.amount)
+
+
+# operation data like the single object views build it -> (data, errors)
+def operation_data(name, op, data, instance=None):
+    serializer_class = MODELS[name][1]
+    fields = [field for field in serializer_class.Meta.fields if field != 'id']
+    data, errors = scale_amounts(name, op, {field: data.get(field) for field in fields})
+    if errors:
+        return None, errors
+
+    # pot totals only change through add, withdraw and transfer
+    if name == 'pot' and instance is not None:
+        data['total'] = instance.total
+
+    return data, None
+
+
+# run an ordered list of operations for a user in one database transaction
+# operations: [{ 'op': create|update|delete, 'model': transaction|budget|pot, 'id': ..., 'data': {...} }]
+# -> (ok, per operation results), nothing is written unless every operation is valid
+@transaction.atomic
+def run_batch(user_id, operations):
+    # objects the operations refer to, one locked query per model
+    ids = {name: set() for name in MODELS}
+    for operation in operations:
+        if operation.get('model') in MODELS and operation.get('op') in ('update', 'delete'):
+            ids[operation['model']].add(operation.get('id'))
+
+    objects = {
+        name: MODELS[name][0].objects.select_for_update().filter(user=user_id).in_bulk(
+            [object_id for object_id in ids[name] if isinstance(object_id, int)]
+        )
+        for name in MODELS
+    }
+
+    results = []
+    creates = {name: [] for name in MODELS}
+    updates = {name: {} for name in MODELS}
+    deletes = {name: {} for name in MODELS}
+    # transaction rows before their update (rollups) and their (normalized name, amount) groups
+    previous_rows = {}
+    previous_groups = {}
+
+    for operation in operations:
+        name, op = operation.get('model'), operation.get('op')
+
+        if name not in MODELS or op not in ('create', 'update', 'delete'):
+            results.append({'status': 400, 'message': 'Please enter a valid operation'})
+            continue
+
+        model, serializer_class, label = MODELS[name]
+        instance = None
+
+        if op != 'create':
+            instance = objects[name].get(operation.get('id'))
+            if instance is None or instance.pk in deletes[name]:
+                results.append({'status': 400, 'message': f'Object with {name} id does not exist'})
+                continue
+
+        if op == 'delete':
+            deletes[name][instance.pk] = instance
+            updates[name].pop(instance.pk, None)
+            results.append({'status': 200, 'message': f'{label} deleted!'})
+            continue
+
+        data, errors = operation_data(name, op, operation.get('data') or {}, instance)
+        if errors:
+            results.append({'status': 400, 'errors': errors})
+            continue
+
+        serializer = serializer_class(instance, data=data)
+        if not serializer.is_valid():
+            results.append({'status': 400, 'errors': serializer.errors})
+            continue
+
+        if op == 'create':
+            instance = model(user_id=user_id, **serializer.validated_data)
+            creates[name].append(instance)
+            results.append({'status': 201, 'instance': instance})
+        else:
+            if name == 'transaction' and instance.pk not in previous_rows:
+                previous_rows[instance.pk] = rollup_row(instance)
+                previous_groups[instance.pk] = (normalize_name(instance.name), instance.amount)
+            for field, value in serializer.validated_data.items():
+                setattr(instance, field, value)
+            updates[name][instance.pk] = instance
+            results.append({'status': 200, 'instance': instance})
+
+    # nothing has been written yet
+    if any(result['status'] == 400 for result in results):
+        return False, [result if result['status'] == 400 else {'status': result['status']} for result in results]
+
+    # grouped writes: one delete, one bulk update and one bulk insert per model
+    for name, (model, serializer_class, label) in MODELS.items():
+        if deletes[name]:
+            # delete signals keep the rollups and search index in sync
+            model.objects.filter(pk__in=list(deletes[name])).delete()
+
+        if updates[name]:
+            fields = [field for field in serializer_class.Meta.fields if field != 'id']
+            extend_query_budget(bulk_statements(model, list(updates[name].values()), ['pk', 'pk'] + fields))
+            model.objects.bulk_update(list(updates[name].values()), fields)
+
+        if creates[name]:
+            fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+            extend_query_budget(bulk_statements(model, creates[name], fields))
+            model.objects.bulk_create(creates[name])
+
+    # bulk writes skip the save signals
+    update_spending_rollups([previous_rows[pk] for pk in updates['transaction']], sign=-1)
+    update_spending_rollups(
+        [rollup_row(instance) for instance in updates['transaction'].values()]
+        + [rollup_row(instance) for instance in creates['transaction']]
+    )
+    # recurring series of the created and updated transactions, the groups updated rows left too
+    if updates['transaction'] or creates['transaction']:
+        detect_user_series(user_id, {
+            (normalize_name(instance.name), instance.amount)
+            for instance in [*updates['transaction'].values(), *creates['transaction']]
+        } | {previous_groups[pk] for pk in updates['transaction']})
+
+    # deletes bumped their scopes through the delete signals
+    bump_data_version(user_id, scopes=DATA_SCOPES if updates['transaction'] or creates['transaction'] else ())
+
+    # before the commit, over budget (strict) writes nothing
+    check_query_budget()
+
+    for result in results:
+        instance = result.pop('instance', None)
+        if instance is not None:
+            result['data'] = MODELS[type(instance).__name__.lower()][1](instance).data
+
+    return True, results
@@ -0,0 +1,114 @@
+import math
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import Budget, Pot, Transaction
+from .spending import rebuild_spending_rollups
+
+
+# realistic looking names and categories for seeded data
+CATEGORIES = [
+    'Entertainment', 'Bills', 'Groceries', 'Dining Out', 'Transportation',
+    'Personal Care', 'Education', 'Lifestyle', 'Shopping', 'General',
+]
+
+NAMES = [
+    'Emma Richardson', 'Savory Bites Bistro', 'Daniel Carter', 'Sun Park', 'Urban Services Hub',
+    'Liam Hughes', 'Lily Ramirez', 'Ethan Clark', 'James Thompson', 'Pixel Playground',
+    'Ella Phillips', 'Sofia Peterson', 'Mason Martinez', 'Green Plate Eatery', 'Sebastian Cook',
+    'William Harris', 'Elevate Education', 'Serenity Spa & Wellness', 'Spark Electric Solutions', 'Rina Sato',
+    'Swift Ride Share', 'Aqua Flow Utilities', 'EcoFuel Energy', 'Yuna Kim', 'Flavor Fiesta',
+    'Harper Edwards', 'Buzz Marketing Group', 'Nimbus Data Storage', 'ByteWise', 'Bravo Zen Spa',
+]
+
+THEMES = ['#277C78', '#82C9D7', '#F2CDAC', '#626070', '#C94736', '#826CB0', '#597C7C', '#93674F']
+
+POT_NAMES = ['Savings', 'Concert Ticket', 'Gift', 'New Laptop', 'Holiday', 'Emergency Fund', 'Wedding', 'Car']
+
+
+# unsaved transactions spread over the last `days` days
+def build_transactions(user, count, days=3 * 365, seed=0):
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    for _ in range(count):
+        name = rng.choice(NAMES)
+        # mostly expenses, some income
+        if rng.random() < 0.15:
+            amount = rng.randint(1000, 300000)
+        else:
+            amount = -rng.randint(100, 50000)
+
+        yield Transaction(
+            avatar=f'./assets/images/avatars/{name.lower().replace(" ", "-")}.jpg',
+            name=name,
+            category=rng.choice(CATEGORIES),
+            date=now - timedelta(seconds=rng.randint(0, days * 24 * 60 * 60)),
+            amount=amount,
+            recurring=rng.random() < 0.1,
+            user=user,
+        )
+
+
+# insert generated transactions in chunks
+def seed_transactions(user, count, batch_size=5000, **kwargs):
+    batch = []
+    for transaction in build_transactions(user, count, **kwargs):
+        batch.append(transaction)
+        if len(batch) == batch_size:
+            Transaction.objects.bulk_create(batch)
+            batch = []
+
+    if batch:
+        Transaction.objects.bulk_create(batch)
+
+
+# users <prefix>0 .. <prefix>(count - 1) with transactions, budgets and pots, all bulk inserted
+# password None -> unusable passwords -> the created users
+def seed_users(count, transactions=1000, budgets=4, pots=3, prefix='seed-user-', password=None, days=3 * 365, seed=0):
+    rng = random.Random(seed)
+    # hashed once, every user gets the same hash
+    password = make_password(password)
+
+    users = User.objects.bulk_create([User(username=f'{prefix}{n}', password=password) for n in range(count)])
+
+    budget_rows = []
+    pot_rows = []
+    for n, user in enumerate(users):
+        seed_transactions(user, transactions, days=days, seed=seed + n)
+
+        for category in rng.sample(CATEGORIES, min(budgets, len(CATEGORIES))):
+            budget_rows.append(Budget(category=category, maximum=rng.randint(50, 1000) * 100, theme=rng.choice(THEMES), user=user))
+
+        for name in rng.sample(POT_NAMES, min(pots, len(POT_NAMES))):
+            target = rng.randint(100, 5000) * 100
+            pot_rows.append(Pot(name=name, target=target, total=rng.randint(0, target), theme=rng.choice(THEMES), user=user))
+
+    Budget.objects.bulk_create(budget_rows)
+    Pot.objects.bulk_create(pot_rows)
+    # bulk inserts skip the signals
+    rebuild_spending_rollups([user.id for user in users])
+
+    return users
+
+
+# nearest rank percentile (0-100) of a list of numbers
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+# run fn `repeat` times -> best time in ms
+def best_of(fn, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return min(timings)
@@ -0,0 +1,190 @@
+import hashlib
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import pin_to_primary, replica_reads
+
+
+# cached responses are only reachable through the current version, old ones just expire
+RESPONSE_TIMEOUT = 60 * 60 * 24
+
+STATS_KEYS = {'hits': 'pf:stats:hits', 'misses': 'pf:stats:misses'}
+
+
+# scopes with their own data version, only bumped by writes that concern them
+# (every write bumps the user's version, views of a scope use the scope's version instead)
+DATA_SCOPES = ('recurring',)
+
+
+def version_key(user_id, scope=None):
+    return f'pf:version:{user_id}:{scope}' if scope else f'pf:version:{user_id}'
+
+
+# current data version of a user (a new one if the cache lost it)
+def get_data_version(user_id, scope=None):
+    key = version_key(user_id, scope)
+    version = cache.get(key)
+
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+
+    return version
+
+
+# invalidates every cached response of the user (of the scope)
+def set_data_version(user_id, scope=None):
+    cache.set(version_key(user_id, scope), time.time_ns(), None)
+
+
+# data version read once per request
+def request_version(request, scope=None):
+    if not hasattr(request, '_data_versions'):
+        request._data_versions = {}
+    if scope not in request._data_versions:
+        request._data_versions[scope] = get_data_version(request.user.id, scope)
+
+    return request._data_versions[scope]
+
+
+# scopes: the data scopes the write concerns (all of them by default)
+# the users read from the primary for a while (read replicas, see routers.py)
+def bump_data_version(*user_ids, scopes=DATA_SCOPES):
+    pin_to_primary(*user_ids)
+    # the pin window starts again with the commit
+    transaction.on_commit(partial(pin_to_primary, *user_ids))
+
+    for user_id in set(user_ids):
+        for scope in (None, *scopes):
+            set_data_version(user_id, scope)
+            # bump again once the write is visible, a response computed in between
+            # would otherwise be cached under the new version
+            transaction.on_commit(partial(set_data_version, user_id, scope))
+
+
+def count(stat):
+    key = STATS_KEYS[stat]
+    try:
+        cache.incr(key)
+    except ValueError:
+        # first hit/miss (or the counter was evicted)
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+# hit and miss counters of the response cache (shared by every process using the cache)
+def get_cache_stats():
+    stats = {stat: cache.get(key) or 0 for stat, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many(list(STATS_KEYS.values()))
+
+
+# today is part of the key, default periods and due dates depend on it
+def response_key(request, view_name, version):
+    return f'pf:response:{request.user.id}:{version}:{view_name}:{timezone.localdate()}:{request.get_full_path()}'
+
+
+# cached responses and etags need a cache shared by the workers (PERSONALFINANCE_RESPONSE_CACHE),
+# every worker must see the version bump of a write
+def response_cache_enabled():
+    return getattr(settings, 'PERSONALFINANCE_RESPONSE_CACHE', False)
+
+
+# cache the 200 responses of a get method until the user's data changes
+# (not the ones read from a replica, it may still lag behind the version)
+def cache_response(method):
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if not response_cache_enabled():
+            return method(self, request, *args, **kwargs)
+
+        # version read before computing, a write meanwhile makes the entry unreachable
+        version = request_version(request, getattr(self, 'data_scope', None))
+        key = response_key(request, type(self).__name__, version)
+        data = cache.get(key)
+
+        if data is not None:
+            count('hits')
+            response = Response(data, status=status.HTTP_200_OK)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        count('misses')
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and not replica_reads.get():
+            cache.set(key, response.data, RESPONSE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+
+        return response
+
+    return wrapper
+
+
+# strong etag of a response: same user data, url, day and format -> same body
+def response_etag(request, view_name, version, fmt=None):
+    key = f'{response_key(request, view_name, version)}:{fmt or request.accepted_renderer.format}'
+    return '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+
+def not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+
+    # only without If-None-Match (one second resolution)
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since'))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+def set_conditional_headers(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # clients keep the response but revalidate every time
+    response['Cache-Control'] = 'private, no-cache'
+
+
+# computed from a replica: it may lag behind the data version (longer than the pin), no etag for it
+# (cached responses were read from the primary)
+def is_replica_read(response):
+    return replica_reads.get() and response.get('X-Cache') != 'HIT'
+
+
+# 304 for a get method when the client has the current response, checked before any query
+def conditional_response(method):
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if not response_cache_enabled():
+            return method(self, request, *args, **kwargs)
+
+        version = request_version(request, getattr(self, 'data_scope', None))
+        etag = response_etag(request, type(self).__name__, version)
+        # versions are nanosecond timestamps of the last write
+        last_modified = version // 10 ** 9
+
+        if not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK or is_replica_read(response):
+                return response
+
+        set_conditional_headers(response, etag, last_modified)
+
+        return response
+
+    return wrapper
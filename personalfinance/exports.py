@@ -0,0 +1,67 @@
+import csv
+import json
+
+from rest_framework import serializers
+
+from .archive import merge_rows
+from .pagination import keyset_ordering
+
+
+# rows fetched per round trip (server-side cursor on PostgreSQL)
+CHUNK_SIZE = 2000
+
+FIELDS = ['id', 'avatar', 'name', 'category', 'date', 'amount', 'recurring', 'series']
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+# dates formatted like the transaction serializer
+date_field = serializers.DateTimeField()
+
+
+# file-like object that hands back what csv.writer writes
+class Echo:
+    def write(self, value):
+        return value
+
+
+# value tuples in the list view ordering, never more than CHUNK_SIZE rows in memory
+# archived: rows of the archive in the same order (archive.archived_rows), merged in
+def export_rows(transactions, sort, archived=()):
+    rows = (
+        transactions
+        .order_by(*keyset_ordering(sort))
+        .values_list(*FIELDS)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+    return merge_rows(rows, archived, sort)
+
+
+def format_row(row):
+    row = list(row)
+    row[4] = date_field.to_representation(row[4])
+    return row
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(FIELDS)
+
+    for row in rows:
+        yield writer.writerow(format_row(row))
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(FIELDS, format_row(row)))) + '\n'
+
+
+# generator of the export file lines
+def export_lines(rows, fmt):
+    if fmt == 'csv':
+        return csv_lines(rows)
+
+    return ndjson_lines(rows)
@@ -1,5 +1,14 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Transaction
+from .search import search_transactions
+
+
 # get sort string
-def get_sort_str(term):
+def get_sort_str(term, search=False):
     if term == 'Oldest':
         return 'date'
     if term == 'A-to-Z':
@@ -10,5 +19,93 @@ def get_sort_str(term):
         return 'amount'
     if term == 'Lowest':
         return '-amount'
-    
-    return '-date'
\ No newline at end of file
+    # best matches first, only when searching
+    if term == 'Relevance' and search:
+        return '-rank'
+
+    return '-date'
+
+
+# user transactions matching the search term ('empty' for none) and category ('All' for any), in the sort order
+# of get_sort_str (the search backend may filter differently for the rank order)
+def filter_transactions(user_id, search_term, category, sort=None):
+    transactions = Transaction.objects.filter(user=user_id)
+
+    if category != 'All':
+        transactions = transactions.filter(category=category)
+
+    # ranked (rank annotation) by the search backend
+    if search_term != 'empty':
+        transactions = search_transactions(transactions, search_term, user_id, ranked=sort == '-rank')
+
+    return transactions
+
+
+# amount in the same unit as the forms (x100), None if it isn't a number
+def parse_amount(value):
+    try:
+        return round(float(value) * 100)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+# fields the forms send in their units (x100 in the database), per model and operation
+SCALED_FIELDS = {
+    ('transaction', 'create'): ['amount'],
+    ('budget', 'create'): ['maximum'],
+    ('budget', 'update'): ['maximum'],
+    ('pot', 'create'): ['target', 'total'],
+    ('pot', 'update'): ['target'],
+}
+
+
+# form data of a create or update with its amounts in database units -> (data, errors)
+# (the single object views and the batch operations validate amounts the same way)
+def scale_amounts(name, op, data):
+    data = dict(data)
+
+    for field in SCALED_FIELDS.get((name, op), []):
+        data[field] = parse_amount(data.get(field))
+        if data[field] is None:
+            return None, {field: ['Please enter a valid amount']}
+
+    return data, None
+
+
+# first day of the next month
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+# midnight at the start of a day (current timezone)
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+# spending period from the optional from/to query params (YYYY-MM-DD, both inclusive)
+# defaults to the current month -> (start, end) datetimes, end exclusive
+def get_spending_period(params):
+    month = timezone.localdate().replace(day=1)
+
+    start = parse_date(params['from']) if params.get('from') else month
+    end = parse_date(params['to']) if params.get('to') else next_month(month) - timedelta(days=1)
+
+    if start is None or end is None or start > end:
+        raise ValueError('Invalid spending period')
+
+    return start_of_day(start), start_of_day(end + timedelta(days=1))
+
+
+# lists the overview can add to its summary
+OVERVIEW_LISTS = ['income', 'expenses', 'recurring_bills']
+
+
+# ?summary=1 (or true) on the overview and the recurring bills
+def get_summary_mode(params):
+    return params.get('summary', '').lower() in ('1', 'true')
+
+
+# full lists asked for with ?include=income,expenses (unknown names are ignored)
+def get_overview_includes(params):
+    names = params.get('include', '').split(',')
+    return [name for name in OVERVIEW_LISTS if name in names]
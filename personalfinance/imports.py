@@ -0,0 +1,163 @@
+import codecs
+import csv
+import json
+
+from django.db import transaction
+
+from .cache import bump_data_version
+from .helpers import parse_amount
+from .models import Transaction
+from .query_budget import bulk_statements, check_query_budget, extend_query_budget
+from .recurring import detect_user_series, normalize_name
+from .serializers import TransactionImportSerializer
+from .spending import update_spending_rollups
+
+
+# rows validated and inserted together
+BATCH_SIZE = 500
+# errors listed in the response, the rest are only counted
+MAX_REPORTED_ERRORS = 100
+# (normalized name, amount) groups detected on their own, a file with more detects every group of the user
+# (one read of their rows instead of an amount__in over the whole file)
+MAX_DETECTED_GROUPS = 1000
+
+FIELDS = ['avatar', 'name', 'category', 'date', 'amount', 'recurring']
+
+
+# import format from the format param or the file extension
+def get_import_format(upload, fmt=None):
+    if fmt in ('csv', 'ndjson'):
+        return fmt
+
+    name = (upload.name or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+
+    return None
+
+
+# lines of the upload decoded one at a time, the numbers of the lines that aren't UTF-8 go into bad_lines
+# (decoded with replacement characters, the rows spanning them are reported and the others still imported)
+def decode_lines(upload, bad_lines):
+    # uploads above FILE_UPLOAD_MAX_MEMORY_SIZE are already on disk
+    for number, line in enumerate(upload.file, start=1):
+        if number == 1 and line.startswith(codecs.BOM_UTF8):
+            line = line[len(codecs.BOM_UTF8):]
+
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            bad_lines.append(number)
+            yield line.decode('utf-8', errors='replace')
+
+
+# (row number, row dict or None when the row can't be parsed), one line at a time
+def parse_rows(upload, fmt):
+    bad_lines = []
+    lines = decode_lines(upload, bad_lines)
+
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        number = 0
+        while True:
+            number += 1
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error:
+                # NUL byte (before python 3.11), field over the size limit: the reader goes on with the next line
+                row = None
+
+            # lines of the row (line_num counts the physical lines read so far)
+            while bad_lines and bad_lines[0] <= reader.line_num:
+                bad_lines.pop(0)
+                row = None
+
+            yield number, row
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            # the line was just decoded, it's the last bad one if it isn't UTF-8
+            row = json.loads(line) if not bad_lines or bad_lines[-1] != number else None
+        except ValueError:
+            row = None
+
+        yield number, row if isinstance(row, dict) else None
+
+
+# validate a row with the transaction serializer rules -> (Transaction or None, errors)
+def build_transaction(row, user_id):
+    if row is None:
+        return None, {'non_field_errors': ['Could not parse row']}
+
+    data = {field: row.get(field) for field in FIELDS}
+    data['amount'] = parse_amount(data['amount'])
+    if data['amount'] is None:
+        return None, {'amount': ['Please enter a valid amount']}
+    if data['recurring'] in (None, ''):
+        data['recurring'] = False
+
+    serializer = TransactionImportSerializer(data=data)
+    if not serializer.is_valid():
+        return None, serializer.errors
+
+    return Transaction(user_id=user_id, **serializer.validated_data), None
+
+
+# fields of the inserted rows (the id is generated)
+INSERT_FIELDS = [field for field in Transaction._meta.concrete_fields if not field.primary_key]
+
+
+def save_batch(batch):
+    extend_query_budget(bulk_statements(Transaction, batch, INSERT_FIELDS))
+    Transaction.objects.bulk_create(batch)
+    # bulk_create skips the save signals
+    update_spending_rollups((t.user_id, t.category, t.date, t.amount) for t in batch)
+
+
+# stream rows into the database in batches, invalid rows are reported and skipped
+def import_transactions(user_id, rows):
+    result = {'imported': 0, 'failed': 0, 'errors': []}
+    batch = []
+    # (normalized name, amount) groups imported, checked for recurring series at the end
+    # (None once over MAX_DETECTED_GROUPS: every group is checked)
+    groups = set()
+
+    with transaction.atomic():
+        for number, row in rows:
+            instance, errors = build_transaction(row, user_id)
+
+            if errors:
+                result['failed'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append({'row': number, 'errors': errors})
+                continue
+
+            batch.append(instance)
+            if groups is not None:
+                groups.add((normalize_name(instance.name), instance.amount))
+                if len(groups) > MAX_DETECTED_GROUPS:
+                    groups = None
+            if len(batch) == BATCH_SIZE:
+                save_batch(batch)
+                result['imported'] += len(batch)
+                batch = []
+
+        if batch:
+            save_batch(batch)
+            result['imported'] += len(batch)
+
+        if result['imported']:
+            # bulk_create skips the save signals
+            detect_user_series(user_id, groups)
+            bump_data_version(user_id)
+
+        # before the commit, over budget (strict) imports nothing
+        check_query_budget()
+
+    return result
@@ -0,0 +1,151 @@
+import os
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from personalfinance.archive import FIELDS, ArchivePeriod, archive_dir, period_path, read_period, stage_period, staged_files
+from personalfinance.cache import bump_data_version
+from personalfinance.helpers import start_of_day
+from personalfinance.models import Transaction
+
+
+# archived ids deleted from the hot table per query
+DELETE_BATCH_SIZE = 1000
+
+
+# staged files over the archive files, once the delete is committed (recorded in committed)
+# a rolled back delete leaves the staged files unused, they are removed
+def promote(staged, committed):
+    committed.append(True)
+    for path, temporary in staged.items():
+        os.replace(temporary, path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Move transactions older than a cutoff (the first of its month) out of the transaction table into '
+        'columnar archive files, one per user and year (merged with the files of earlier runs)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='archive transactions before the month of this date (YYYY-MM-DD)')
+        parser.add_argument('--older-than-days', type=int, default=730, help='cutoff when --before is not given')
+        parser.add_argument('--user', type=int, action='append', dest='users', help='only this user id (repeatable)')
+        parser.add_argument(
+            '--recover', action='store_true',
+            help='first finish the files of a run that stopped: promoted if their rows were deleted, removed if not',
+        )
+
+    def handle(self, *args, **options):
+        # the rows are deleted from the database, the files are their only copy
+        if not archive_dir() or not os.path.isdir(archive_dir()):
+            raise CommandError(
+                'Set DJANGO_ARCHIVE_DIR to an existing directory on a persistent volume, '
+                'archived transactions are only kept in its files'
+            )
+
+        # a staged file may be the only copy of rows deleted by a run whose promote failed
+        staged = staged_files()
+        if staged and not options['recover']:
+            raise CommandError(
+                'Staged archive files of a run that did not finish: '
+                + ', '.join(temporary for path, temporary in staged)
+                + '. Run again with --recover'
+            )
+        for path, temporary in staged:
+            self.recover(path, temporary)
+
+        if options['before']:
+            try:
+                cutoff = parse_date(options['before'])
+            except ValueError:
+                cutoff = None
+        else:
+            cutoff = timezone.localdate() - timedelta(days=options['older_than_days'])
+        if cutoff is None:
+            raise CommandError('--before must be a date (YYYY-MM-DD)')
+
+        # whole months only, the monthly rollups stay as they are
+        cutoff = start_of_day(cutoff.replace(day=1))
+        old = Transaction.objects.filter(date__lt=cutoff)
+        if options['users']:
+            old = old.filter(user__in=options['users'])
+
+        start = time.perf_counter()
+        users = list(old.order_by('user_id').values_list('user_id', flat=True).distinct())
+        archived = files = 0
+
+        for user_id in users:
+            rows, years = self.archive_user(old.filter(user=user_id), user_id)
+            archived += rows
+            files += years
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} transactions before {cutoff.date()} of {len(users)} users into {files} files '
+            f'in {time.perf_counter() - start:.1f}s'
+        ))
+
+    # the rows of a run are deleted all at once: still in the table -> the delete was rolled back,
+    # the staged file is dropped, none of them -> it holds the only copy of the deleted rows, promoted
+    def recover(self, path, temporary):
+        with ArchivePeriod(temporary) as period:
+            ids = list(period.columns['id'])
+
+        deleted = not any(
+            Transaction.objects.filter(id__in=ids[start:start + DELETE_BATCH_SIZE]).exists()
+            for start in range(0, len(ids), DELETE_BATCH_SIZE)
+        )
+        if deleted:
+            os.replace(temporary, path)
+            self.stdout.write(f'Recovered {path} from {temporary}')
+        else:
+            os.remove(temporary)
+            self.stdout.write(f'Removed {temporary} (its transactions were not deleted)')
+
+    # -> (archived rows, written files)
+    def archive_user(self, transactions, user_id):
+        by_year = {}
+        for row in transactions.order_by('date', 'id').values_list(*FIELDS):
+            by_year.setdefault(timezone.localtime(row[4]).year, []).append(row)
+
+        # new files first (nothing changes if one can't be written), they replace the old ones
+        # once the delete is committed: the rows are never in the table and the files at once
+        staged = {}
+        committed = []
+        try:
+            for year, rows in by_year.items():
+                # rows archived by an earlier run, the same id is never there twice
+                merged = {row[0]: row for row in read_period(user_id, year)}
+                merged.update((row[0], row) for row in rows)
+                staged[period_path(user_id, year)] = stage_period(period_path(user_id, year), list(merged.values()))
+
+            with transaction.atomic():
+                # no signals: the rollups keep counting the archived months, no series detection
+                ids = [row[0] for rows in by_year.values() for row in rows]
+                table = connection.ops.quote_name(Transaction._meta.db_table)
+                with connection.cursor() as cursor:
+                    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                        batch = ids[start:start + DELETE_BATCH_SIZE]
+                        cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(batch))})', batch)
+
+                # first of the commit callbacks: a failing one before it would leave committed unset
+                transaction.on_commit(partial(promote, staged, committed))
+                bump_data_version(user_id)
+        except BaseException as error:
+            # the rows are gone from the table, the staged files left are their only copy
+            if committed:
+                raise CommandError(
+                    f'Transactions of user {user_id} were deleted but their archive files could not be replaced '
+                    f'({error}), the staged files keep them: run again with --recover'
+                ) from error
+
+            for temporary in staged.values():
+                os.remove(temporary)
+            raise
+
+        return sum(len(rows) for rows in by_year.values()), len(by_year)
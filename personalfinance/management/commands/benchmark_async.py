@@ -0,0 +1,126 @@
+import asyncio
+import time
+from types import ModuleType
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+from django.urls import include, path
+from knox.models import AuthToken
+
+from personalfinance import urls
+from personalfinance.async_views import async_urlpatterns
+from personalfinance.benchmarks import seed_transactions
+from personalfinance.models import Budget, Pot
+from personalfinance.spending import rebuild_spending_rollups
+
+
+ENDPOINTS = {
+    'overview': '/finance-api/overview',
+    'budgets': '/finance-api/budgets',
+    'pots': '/finance-api/pots',
+    'transactions': '/finance-api/transactions/empty/All/Latest/1',
+}
+
+
+# root urlconf serving the async views
+def async_urlconf():
+    module = ModuleType('async_urlconf')
+    module.urlpatterns = [path('finance-api/', include(async_urlpatterns(urls.urlpatterns)))]
+
+    return module
+
+
+# round trip to a database server on another host, added to every query
+class QueryLatency:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    # on every new connection of every thread (query threads included)
+    def install(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def uninstall(self, connection):
+        if self in connection.execute_wrappers:
+            connection.execute_wrappers.remove(self)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests per second of one process serving the read views through wsgi (one request at a time) '
+        'and through asgi with the async views (concurrent requests)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=list(ENDPOINTS), default='overview')
+        parser.add_argument('--requests', type=int, default=300, help='requests per mode')
+        parser.add_argument('--concurrency', type=int, default=16, help='requests in flight on the asgi side')
+        parser.add_argument('--rows', type=int, default=2000, help='transactions of the benchmark user')
+        parser.add_argument('--latency', type=float, default=0, help='ms added to every query (network round trip)')
+
+    def handle(self, *args, **options):
+        # committed: the async views query from other threads (and connections)
+        user = User.objects.create(username='benchmark-async')
+        try:
+            seed_transactions(user, options['rows'])
+            rebuild_spending_rollups([user.id])
+            for category in ('Bills', 'Groceries', 'Dining Out', 'Entertainment'):
+                Budget.objects.create(category=category, maximum=100000, theme='#277C78', user=user)
+            for name in ('Savings', 'Holiday'):
+                Pot.objects.create(name=name, target=200000, total=15000, theme='#277C78', user=user)
+            token = AuthToken.objects.create(user)[1]
+
+            headers = {'Authorization': f'Token {token}'}
+            url = ENDPOINTS[options['endpoint']]
+            # a different url every request, the response cache would answer otherwise
+            paths = [f'{url}?n={n}' for n in range(options['requests'])]
+
+            latency = QueryLatency(options['latency'] / 1000)
+            if latency.seconds:
+                connection_created.connect(latency.install)
+                latency.install(None, connection)
+
+            try:
+                # the test clients send Host: testserver
+                with override_settings(ALLOWED_HOSTS=['testserver']):
+                    sync_seconds = self.run_sync(Client(), paths, headers)
+                    with override_settings(ROOT_URLCONF=async_urlconf()):
+                        async_seconds = asyncio.run(self.run_async(AsyncClient(), paths, headers, options['concurrency']))
+            finally:
+                connection_created.disconnect(latency.install)
+                latency.uninstall(connection)
+
+            for label, seconds in (('wsgi (sync views)', sync_seconds), ('asgi (async views)', async_seconds)):
+                self.stdout.write(f'{label:>19}: {len(paths) / seconds:,.0f} requests/s')
+            self.stdout.write(f'{"speedup":>19}: {sync_seconds / async_seconds:.2f}x')
+        finally:
+            user.delete()
+
+    def run_sync(self, client, paths, headers):
+        # warm up (token cache, search backend)
+        client.get(paths[0], headers=headers)
+
+        start = time.perf_counter()
+        for path_ in paths:
+            assert client.get(path_, headers=headers).status_code == 200
+        return time.perf_counter() - start
+
+    async def run_async(self, client, paths, headers, concurrency):
+        await client.get(paths[0], headers=headers)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get(path_):
+            async with semaphore:
+                response = await client.get(path_, headers=headers)
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(get(path_) for path_ in paths))
+        return time.perf_counter() - start
@@ -0,0 +1,47 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from knox.auth import TokenAuthentication
+from knox.models import AuthToken
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from personalfinance.authentication import CachedTokenAuthentication, evict_tokens
+from personalfinance.benchmarks import best_of
+
+
+class Command(BaseCommand):
+    help = 'Compare the per request cost of knox and cached token authentication (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='authentications per timing')
+        parser.add_argument('--tokens', type=int, default=5, help='tokens of the user (knox checks all of them)')
+
+    # cached as with a shared cache, whatever the cache backend
+    @override_settings(PERSONALFINANCE_AUTH_CACHE=True)
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark-auth')
+            for _ in range(options['tokens'] - 1):
+                AuthToken.objects.create(user)
+            auth_token, token = AuthToken.objects.create(user)
+
+            request = Request(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {token}'))
+
+            for backend in (TokenAuthentication(), CachedTokenAuthentication()):
+                evict_tokens(auth_token.digest)
+                # warm up (fills the cache)
+                backend.authenticate(request)
+
+                with CaptureQueriesContext(connection) as queries:
+                    backend.authenticate(request)
+
+                ms = best_of(lambda: [backend.authenticate(request) for _ in range(options['requests'])])
+                self.stdout.write(
+                    f'{type(backend).__name__:>26}: {ms * 1000 / options["requests"]:.1f} us per request, '
+                    f'{len(queries)} queries'
+                )
+
+            # leave the database untouched
+            transaction.set_rollback(True)
@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from personalfinance.benchmarks import best_of, seed_transactions
+from personalfinance.models import Transaction
+from personalfinance.recurring import RECURRING
+
+
+class Command(BaseCommand):
+    help = 'Seed a large transaction table and compare query plans with and without the composite indexes (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help='total transactions to seed')
+        parser.add_argument('--users', type=int, default=10, help='number of users sharing the rows')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users = [
+                User.objects.create(username=f'benchmark-indexes-{i}')
+                for i in range(options['users'])
+            ]
+            for i, user in enumerate(users):
+                seed_transactions(user, options['rows'] // len(users), seed=i)
+
+            self.analyze()
+            user_id = users[0].id
+
+            self.stdout.write(self.style.MIGRATE_HEADING('With composite indexes'))
+            self.report(user_id)
+
+            # drop the composite indexes, the implicit user FK index stays
+            with connection.cursor() as cursor:
+                for index in Transaction._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+            self.analyze()
+
+            self.stdout.write(self.style.MIGRATE_HEADING('Without composite indexes'))
+            self.report(user_id)
+
+            # leave the database untouched
+            transaction.set_rollback(True)
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    # querysets built the same way the views build them
+    def queries(self, user_id):
+        transactions = Transaction.objects.filter(user=user_id)
+
+        return {
+            'recent transactions (Latest)': transactions.order_by('-date')[:5],
+            'category page (Bills, Latest)': transactions.filter(category='Bills').order_by('-date')[:10],
+            'sort A-to-Z': transactions.order_by('name')[:10],
+            'sort Highest': transactions.order_by('amount')[:10],
+            'recurring bills': transactions.filter(RECURRING, amount__lt=0),
+            'budget spending': transactions.filter(category__in=['Bills', 'Groceries']).values('category').annotate(total=Sum('amount')).order_by(),
+        }
+
+    def report(self, user_id):
+        for label, queryset in self.queries(user_id).items():
+            ms = best_of(lambda: list(queryset.all()))
+            self.stdout.write(f'{label}: {ms:.2f} ms')
+            for line in queryset.explain().splitlines():
+                self.stdout.write(f'    {line}')
@@ -0,0 +1,210 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from personalfinance.benchmarks import percentile
+from personalfinance.pool import ConnectionPool, PoolTimeout
+
+
+MODES = ('persistent', 'reconnect', 'pool')
+
+
+class TooManyConnections(Exception):
+    pass
+
+
+# database stand-in: connecting and queries take time, at most max_connections are open at once
+class FakeServer:
+    def __init__(self, max_connections, connect_ms, query_ms):
+        self.max_connections = max_connections
+        self.connect_ms = connect_ms
+        self.query_ms = query_ms
+        self.lock = threading.Lock()
+        self.open = 0
+
+    def connect(self):
+        time.sleep(self.connect_ms / 1000)
+        with self.lock:
+            if self.open >= self.max_connections:
+                raise TooManyConnections('sorry, too many clients already')
+            self.open += 1
+
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def query(self):
+        time.sleep(self.server.query_ms / 1000)
+
+    def close(self):
+        with self.server.lock:
+            self.server.open -= 1
+
+
+# psycopg connection of the default database (PostgreSQL)
+class RealConnection:
+    def __init__(self):
+        wrapper = connections['default']
+        self.connection = wrapper.Database.connect(**wrapper.get_connection_params())
+        self.connection.autocommit = True
+
+    def query(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def close(self):
+        self.connection.close()
+
+
+# counts the connections a mode opens and how many are open at once
+class ConnectionCounter:
+    def __init__(self, connect):
+        self.connect_fn = connect
+        self.lock = threading.Lock()
+        self.opened = self.open = self.peak = 0
+
+    def connect(self):
+        connection = self.connect_fn()
+        with self.lock:
+            self.opened += 1
+            self.open += 1
+            self.peak = max(self.peak, self.open)
+
+        return connection
+
+    def close(self, connection):
+        connection.close()
+        with self.lock:
+            self.open -= 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare persistent connections per worker thread (CONN_MAX_AGE), a new connection per request and the '
+        'connection pool: requests/s, latency, connections opened and at most open, failed requests; '
+        'against the PostgreSQL default database or a simulated server (--simulate)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='worker processes (simulated, one pool each)')
+        parser.add_argument('--threads', type=int, default=8, help='request threads per worker')
+        parser.add_argument('--requests', type=int, default=50, help='requests per thread')
+        parser.add_argument('--queries', type=int, default=3, help='queries per request')
+        parser.add_argument('--work-ms', type=float, default=2, help='time a request spends outside the database')
+        parser.add_argument('--pool-size', type=int, default=4, help='connections per worker pool')
+        parser.add_argument('--mode', action='append', dest='modes', choices=MODES, help='only this mode (repeatable)')
+        parser.add_argument('--simulate', action='store_true', help='use a simulated server instead of the default database')
+        parser.add_argument('--max-connections', type=int, default=40, help='simulated server connection limit')
+        parser.add_argument('--connect-ms', type=float, default=20, help='simulated connection time')
+        parser.add_argument('--query-ms', type=float, default=1, help='simulated query time')
+
+    def handle(self, *args, **options):
+        if options['simulate']:
+            server = FakeServer(options['max_connections'], options['connect_ms'], options['query_ms'])
+            connect = server.connect
+            errors = (TooManyConnections, PoolTimeout)
+            target = (
+                f'simulated server (max {options["max_connections"]} connections, '
+                f'{options["connect_ms"]} ms connect, {options["query_ms"]} ms query)'
+            )
+        elif connections['default'].vendor == 'postgresql':
+            connect = RealConnection
+            errors = (connections['default'].Database.Error, PoolTimeout)
+            target = 'PostgreSQL (default database)'
+        else:
+            raise CommandError('Benchmark the pool against PostgreSQL (DATABASE_URL) or use --simulate')
+
+        self.stdout.write(
+            f'{options["workers"]} workers x {options["threads"]} threads x {options["requests"]} requests, '
+            f'{options["queries"]} queries and {options["work_ms"]} ms of work each, against {target}'
+        )
+
+        for mode in options['modes'] or MODES:
+            self.write_result(mode, self.run_mode(mode, connect, errors, options))
+
+    def run_mode(self, mode, connect, errors, options):
+        counter = ConnectionCounter(connect)
+        pools = [
+            ConnectionPool(counter.connect, close=counter.close, max_size=options['pool_size'], name=f'worker{worker}')
+            for worker in range(options['workers'])
+        ]
+        timings = []
+        failures = []
+        lock = threading.Lock()
+
+        def request(worker, state):
+            if mode == 'pool':
+                connection = pools[worker].get()
+                try:
+                    self.serve(connection, options)
+                finally:
+                    pools[worker].put(connection)
+            elif mode == 'reconnect':
+                connection = counter.connect()
+                try:
+                    self.serve(connection, options)
+                finally:
+                    counter.close(connection)
+            else:
+                # opened by the thread's first request, kept for the next ones
+                if state.get('connection') is None:
+                    state['connection'] = counter.connect()
+                self.serve(state['connection'], options)
+
+        def thread(worker):
+            state = {}
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                try:
+                    request(worker, state)
+                except errors:
+                    with lock:
+                        failures.append(1)
+                    continue
+                with lock:
+                    timings.append((time.perf_counter() - start) * 1000)
+            if state.get('connection') is not None:
+                counter.close(state['connection'])
+
+        threads = [
+            threading.Thread(target=thread, args=(worker,))
+            for worker in range(options['workers'])
+            for _ in range(options['threads'])
+        ]
+        start = time.perf_counter()
+        for item in threads:
+            item.start()
+        for item in threads:
+            item.join()
+        elapsed = time.perf_counter() - start
+
+        stats = [pool.stats() for pool in pools]
+        for pool in pools:
+            pool.close()
+
+        return {
+            'requests_per_s': len(timings) / elapsed,
+            'p50_ms': percentile(timings, 50) if timings else 0.0,
+            'p95_ms': percentile(timings, 95) if timings else 0.0,
+            'failed': len(failures),
+            'opened': counter.opened,
+            'peak_open': counter.peak,
+            'pool_waits': sum(item['waits'] for item in stats) if mode == 'pool' else 0,
+        }
+
+    def serve(self, connection, options):
+        for _ in range(options['queries']):
+            connection.query()
+        time.sleep(options['work_ms'] / 1000)
+
+    def write_result(self, mode, result):
+        self.stdout.write(
+            f'{mode:<11} {result["requests_per_s"]:8.0f} req/s  p50 {result["p50_ms"]:7.2f}  p95 {result["p95_ms"]:7.2f} ms  '
+            f'{result["failed"]:5} failed  {result["opened"]:5} connections opened, {result["peak_open"]:3} open at most  '
+            f'{result["pool_waits"]} pool waits'
+        )
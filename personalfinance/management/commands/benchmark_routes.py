@@ -0,0 +1,236 @@
+import json
+import time
+import tracemalloc
+from statistics import median_low
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from knox.models import AuthToken
+
+from personalfinance import urls
+from personalfinance.benchmarks import percentile, seed_users
+from personalfinance.cache import DATA_SCOPES, set_data_version
+from personalfinance.models import Budget, Pot, Transaction
+
+
+PASSWORD = 'benchmark-routes-password'
+
+IMPORT_CSV = (
+    'date,name,category,amount,recurring,avatar\n'
+    + ''.join(f'2024-07-{day:02}T10:00:00Z,Savory Bites Bistro,Dining Out,-{day}.50,false,./assets/images/avatars/savory-bites-bistro.jpg\n' for day in range(1, 21))
+).encode()
+
+
+def json_body(data):
+    return {'data': json.dumps(data), 'content_type': 'application/json'}
+
+
+# requests for every route of personalfinance/urls.py -> { route pattern: [(method, path, client kwargs)] }
+# one request per method, results are named '<METHOD> <pattern>'
+# callables in the kwargs are called for every request (uploads can only be read once)
+def route_requests(user):
+    budget = Budget.objects.filter(user=user).first()
+    pot, other_pot = Pot.objects.filter(user=user).order_by('total')[:2]
+    row = Transaction.objects.filter(user=user).first()
+
+    transaction_data = {
+        'avatar': row.avatar, 'name': row.name, 'category': row.category,
+        'date': row.date.isoformat(), 'amount': row.amount, 'recurring': row.recurring,
+    }
+
+    return {
+        'overview': [('get', '/finance-api/overview', {})],
+        'users': [('post', '/finance-api/users', json_body({'username': 'benchmark-routes-new', 'email': 'benchmark@example.com', 'password': PASSWORD}))],
+        'login': [('post', '/finance-api/login', json_body({'username': user.username, 'password': PASSWORD}))],
+        'logout': [('post', '/finance-api/logout', {})],
+        'budgets': [
+            ('get', '/finance-api/budgets', {}),
+            ('post', '/finance-api/budgets', json_body({'category': 'Benchmark', 'maximum': '500', 'theme': '#277C78'})),
+        ],
+        'pots': [
+            ('get', '/finance-api/pots', {}),
+            ('post', '/finance-api/pots', json_body({'name': 'Benchmark', 'target': '500', 'total': '0', 'theme': '#277C78'})),
+        ],
+        'pots/<int:pot_id>': [
+            ('get', f'/finance-api/pots/{pot.id}', {}),
+            ('put', f'/finance-api/pots/{pot.id}', json_body({'name': pot.name, 'target': str(pot.target / 100), 'theme': pot.theme})),
+            ('delete', f'/finance-api/pots/{pot.id}', {}),
+        ],
+        'pots/withdraw/<int:pot_id>': [('put', f'/finance-api/pots/withdraw/{other_pot.id}', json_body({'amount': '0.01'}))],
+        'pots/add/<int:pot_id>': [('put', f'/finance-api/pots/add/{pot.id}', json_body({'amount': '0.01'}))],
+        'pots/transfer': [
+            ('post', '/finance-api/pots/transfer', json_body({'transfers': [{'from': other_pot.id, 'to': pot.id, 'amount': '0.01'}]})),
+        ],
+        'budgets/<int:budget_id>': [
+            ('get', f'/finance-api/budgets/{budget.id}', {}),
+            ('put', f'/finance-api/budgets/{budget.id}', json_body({'category': budget.category, 'maximum': '750', 'theme': budget.theme})),
+            ('delete', f'/finance-api/budgets/{budget.id}', {}),
+        ],
+        'budgets/<str:category>': [('get', f'/finance-api/budgets/{budget.category}', {})],
+        'budgets/new/<str:category>': [('get', f'/finance-api/budgets/new/{budget.category}', {})],
+        'batch': [
+            ('post', '/finance-api/batch', json_body({'operations': [
+                {'op': 'create', 'model': 'transaction', 'data': {**transaction_data, 'amount': '-12.50'}},
+                {'op': 'update', 'model': 'budget', 'id': budget.id, 'data': {'category': budget.category, 'maximum': '800', 'theme': budget.theme}},
+                {'op': 'delete', 'model': 'transaction', 'id': row.id},
+            ]})),
+        ],
+        'transactions/create': [('post', '/finance-api/transactions/create', json_body({**transaction_data, 'amount': '-12.50'}))],
+        'transactions/import': [
+            ('post', '/finance-api/transactions/import', {'data': lambda: {'file': SimpleUploadedFile('import.csv', IMPORT_CSV)}}),
+        ],
+        'transactions/export/<str:fmt>/<str:search_term>/<str:category>/<str:sort_by>': [
+            ('get', '/finance-api/transactions/export/csv/empty/All/Latest', {}),
+        ],
+        'transactions/<int:t_id>': [
+            ('put', f'/finance-api/transactions/{row.id}', json_body(transaction_data)),
+            ('delete', f'/finance-api/transactions/{row.id}', {}),
+        ],
+        'transactions/recurring': [('get', '/finance-api/transactions/recurring', {})],
+        'transactions/search/<str:search_term>/<str:sort_by>/<int:page>': [
+            ('get', '/finance-api/transactions/search/Bistro/Relevance/1', {}),
+        ],
+        'transactions/<str:search_term>/<str:category>/<str:sort_by>/<int:page>': [
+            ('get', f'/finance-api/transactions/empty/{budget.category}/Highest/5', {}),
+        ],
+    }
+
+
+def send(client, method, path, kwargs):
+    kwargs = {key: value() if callable(value) else value for key, value in kwargs.items()}
+    response = getattr(client, method)(path, **kwargs)
+    # streamed responses (export) are produced while they are read
+    if response.streaming:
+        b''.join(response.streaming_content)
+
+    return response
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every route of the finance api through the test client: p50/p95/p99 latency, queries and '
+        'allocations per request (rolled back afterwards), optionally saved as JSON and compared with an earlier run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50, help='timed requests per route and method')
+        parser.add_argument('--transactions', type=int, default=5000, help='transactions of the benchmark user')
+        parser.add_argument('--route', action='append', dest='routes', help='only routes containing this text (repeatable)')
+        parser.add_argument('--cached', action='store_true', help='let the response cache answer repeated gets')
+        parser.add_argument('--output', help='save the results to this JSON file')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+
+    def handle(self, *args, **options):
+        patterns = [str(pattern.pattern) for pattern in urls.urlpatterns]
+        if options['routes']:
+            patterns = [pattern for pattern in patterns if any(route in pattern for route in options['routes'])]
+
+        # the test client sends Host: testserver
+        with override_settings(ALLOWED_HOSTS=['testserver']), transaction.atomic():
+            user = seed_users(1, transactions=options['transactions'], prefix='benchmark-routes-', password=PASSWORD)[0]
+            token = AuthToken.objects.create(user)[1]
+            client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+
+            requests = route_requests(user)
+            missing = [pattern for pattern in patterns if pattern not in requests]
+            if missing:
+                raise CommandError(f'No benchmark request for {", ".join(missing)}, add one to route_requests')
+
+            results = {}
+            for pattern in patterns:
+                for method, path, kwargs in requests[pattern]:
+                    name = f'{method.upper()} {pattern}'
+                    results[name] = self.run_route(client, user, method, path, kwargs, options)
+                    self.write_result(name, results[name])
+
+            # leave the database untouched
+            transaction.set_rollback(True)
+
+        report = {
+            'date': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'transactions': options['transactions'],
+            'cached': options['cached'],
+            'routes': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Saved results to {options["output"]}'))
+
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file), report)
+
+    def run_route(self, client, user, method, path, kwargs, options):
+        timings = []
+        query_counts = []
+
+        # warm up (token cache, search backend)
+        self.request(client, user, method, path, kwargs, options)
+
+        for _ in range(options['iterations']):
+            elapsed, queries, response = self.request(client, user, method, path, kwargs, options)
+            timings.append(elapsed)
+            query_counts.append(queries)
+
+        # allocations of one more request (tracing slows everything down, not timed)
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        self.request(client, user, method, path, kwargs, options)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'path': path,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries': median_low(query_counts),
+            'peak_alloc_kb': round((peak - start) / 1024, 1),
+        }
+
+    # one request, its writes rolled back -> (ms, queries, response)
+    def request(self, client, user, method, path, kwargs, options):
+        if not options['cached']:
+            # every get computes its response
+            for scope in (None, *DATA_SCOPES):
+                set_data_version(user.id, scope)
+
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = send(client, method, path, kwargs)
+                elapsed = (time.perf_counter() - start) * 1000
+            transaction.set_rollback(True)
+
+        return elapsed, len(queries), response
+
+    def write_result(self, name, result):
+        self.stdout.write(
+            f'{name:<80} {result["status"]}  p50 {result["p50_ms"]:8.2f}  p95 {result["p95_ms"]:8.2f}  '
+            f'p99 {result["p99_ms"]:8.2f} ms  {result["queries"]:3} queries  {result["peak_alloc_kb"]:9.1f} KB'
+        )
+
+    def compare(self, before, after):
+        self.stdout.write(f'\nCompared with {before["date"]} ({before["database"]}, {before["transactions"]} transactions)')
+
+        for name, result in after['routes'].items():
+            old = before['routes'].get(name)
+            if old is None:
+                self.stdout.write(f'{name:<80} new')
+                continue
+
+            change = (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0.0
+            self.stdout.write(
+                f'{name:<80} p95 {old["p95_ms"]:8.2f} -> {result["p95_ms"]:8.2f} ms ({change:+.0f}%)  '
+                f'queries {old["queries"]} -> {result["queries"]}  '
+                f'alloc {old["peak_alloc_kb"]} -> {result["peak_alloc_kb"]} KB'
+            )
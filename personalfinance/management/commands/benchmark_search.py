@@ -0,0 +1,53 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from personalfinance.benchmarks import best_of, seed_transactions
+from personalfinance.models import Transaction
+from personalfinance.search import IContainsSearchBackend, get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Compare the search backend with icontains on a large seeded user (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='transactions of the searched user')
+        parser.add_argument('--other-rows', type=int, default=100000, help='transactions of other users')
+        parser.add_argument('--terms', nargs='+', default=['spa', 'utilities', 'ride share', 'zen', 'nomatch'])
+
+    def handle(self, *args, **options):
+        backends = {
+            'icontains': IContainsSearchBackend(),
+            type(get_search_backend()).__name__: get_search_backend(),
+        }
+
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark-search')
+            seed_transactions(user, options['rows'])
+            if options['other_rows']:
+                other = User.objects.create(username='benchmark-search-other')
+                seed_transactions(other, options['other_rows'], seed=1)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            for term in options['terms']:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'"{term}"'))
+
+                for label, backend in backends.items():
+                    # built in the timed calls, the backend may look at the database first
+                    def search(ranked=False):
+                        transactions = Transaction.objects.filter(user=user.id)
+                        return backend.rank(backend.filter(transactions, term, user.id, ranked), term)
+
+                    # what a search page costs: first page in date order plus the page count
+                    page_ms = best_of(lambda: list(search().order_by('-date', '-id')[:10]))
+                    count_ms = best_of(lambda: search().count())
+                    relevance_ms = best_of(lambda: list(search(ranked=True).order_by('-rank', '-id')[:10]))
+
+                    self.stdout.write(
+                        f'{label:>24}: {search().count()} matches, page {page_ms:.2f} ms, '
+                        f'count {count_ms:.2f} ms, relevance page {relevance_ms:.2f} ms'
+                    )
+
+            # leave the database untouched
+            transaction.set_rollback(True)
@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from personalfinance.benchmarks import best_of, seed_transactions
+from personalfinance.models import Transaction
+from personalfinance.serializers import TransactionSerializer, transaction_values
+
+
+class Command(BaseCommand):
+    help = 'Compare rows per second of the model serializer and the values serializer (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='transactions serialized per run')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark-serializers')
+            seed_transactions(user, options['rows'])
+            transactions = Transaction.objects.filter(user=user).order_by('-date', '-id')
+
+            renderer = JSONRenderer()
+            # query + serialization + json, what a list response costs
+            runs = {
+                'TransactionSerializer': lambda: renderer.render(TransactionSerializer(transactions.all(), many=True).data),
+                'transaction_values': lambda: renderer.render(transaction_values.serialize(transactions.all())),
+            }
+
+            for label, run in runs.items():
+                ms = best_of(run)
+                self.stdout.write(f'{label:>22}: {ms:.1f} ms, {options["rows"] / ms * 1000:,.0f} rows/s')
+
+            # leave the database untouched
+            transaction.set_rollback(True)
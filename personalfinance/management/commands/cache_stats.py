@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from personalfinance.cache import get_cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Print the hit and miss counters of the response cache (needs a cache shared with the web processes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='reset the counters afterwards')
+
+    def handle(self, *args, **options):
+        stats = get_cache_stats()
+        self.stdout.write(f"hits {stats['hits']}, misses {stats['misses']}, hit ratio {stats['hit_ratio']:.1%}")
+
+        if options['reset']:
+            reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
@@ -0,0 +1,74 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from personalfinance.helpers import start_of_day
+from personalfinance.models import Transaction
+from personalfinance.partitions import (
+    INTERVALS, PARTITIONS_AHEAD, interval_of, is_partitioned, next_period, partition_interval, partition_names,
+    period_start, rebuild_table, roll_partitions_forward,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Create the transaction partitions of the current and the coming months or years on PostgreSQL '
+        '(run it from cron, migrate does it too), optionally partition an existing table or show the pruned plans'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=PARTITIONS_AHEAD, help='periods to create after the current one')
+        parser.add_argument('--convert', choices=INTERVALS, help='partition the table by month or year first (copies every row)')
+        parser.add_argument('--explain', action='store_true', help='print the plan of a date windowed query of the current period')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Transaction partitions need PostgreSQL (DATABASE_URL)')
+
+        with transaction.atomic():
+            if options['convert'] and not is_partitioned(connection):
+                rebuild_table(connection, options['convert'], ahead=options['ahead'])
+                self.stdout.write(f'Partitioned the transaction table by {options["convert"]}')
+
+            if not is_partitioned(connection):
+                raise CommandError(
+                    'The transaction table is not partitioned, set DJANGO_TRANSACTION_PARTITIONS before migrating or use --convert'
+                )
+
+            created = roll_partitions_forward(connection, ahead=options['ahead'])
+
+        with connection.cursor() as cursor:
+            names = partition_names(cursor)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(created)} partitions ({", ".join(created) or "none missing"}), {len(names)} in total'
+        ))
+
+        if options['explain']:
+            self.explain(names)
+
+    # budget spending of the current period (date range aggregate): only its partition is scanned
+    def explain(self, names):
+        interval = interval_of(names) or partition_interval() or 'month'
+        start = period_start(timezone.localdate(), interval)
+        user_id = Transaction.objects.values_list('user_id', flat=True).first() or 0
+
+        queryset = (
+            Transaction.objects
+            .filter(user=user_id, date__gte=start_of_day(start), date__lt=start_of_day(next_period(start, interval)))
+            .values('category')
+            .annotate(total=Sum('amount'))
+            .order_by()
+        )
+        plan = queryset.explain()
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Spending of user {user_id} since {start}'))
+        for line in plan.splitlines():
+            self.stdout.write(f'    {line}')
+
+        # 'Seq Scan on <partition>', 'Index Scan using <index> on <partition>'
+        scanned = [name for name in names if re.search(rf'\bon {name}\b', plan)]
+        self.stdout.write(f'Scans {len(scanned)} of {len(names)} partitions: {", ".join(scanned)}')
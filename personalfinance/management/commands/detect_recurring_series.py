@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from personalfinance.models import RecurringSeries
+from personalfinance.recurring import detect_all_series
+
+
+class Command(BaseCommand):
+    help = (
+        'Detect the weekly, monthly and yearly series of every user\'s transactions (same normalized name and amount) '
+        'and link their transactions, in one pass over the transaction table ordered by user'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='only this user id (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='transactions fetched per round trip')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        users, changed = detect_all_series(options['users'], chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {users} users in {time.perf_counter() - start:.1f}s, {changed} with changed series '
+            f'({RecurringSeries.objects.count()} series in total)'
+        ))
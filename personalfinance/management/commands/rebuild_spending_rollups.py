@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from personalfinance.spending import rebuild_spending_rollups, verify_spending_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly spending rollups from the transaction table, or verify them with --verify'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='limit to a user id (repeatable)')
+        parser.add_argument('--verify', action='store_true', help='only compare the rollups with the transaction table')
+
+    def handle(self, *args, **options):
+        users = options['users']
+
+        if not options['verify']:
+            count = rebuild_spending_rollups(users)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} rollups'))
+
+        mismatches = verify_spending_rollups(users)
+        for (user_id, category, month), stored, expected in mismatches:
+            self.stdout.write(f'user {user_id} {category} {month:%Y-%m}: stored {stored}, expected {expected}')
+
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} rollups do not match the transaction table')
+
+        self.stdout.write(self.style.SUCCESS('Rollups match the transaction table'))
@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from personalfinance.benchmarks import seed_users
+
+
+class Command(BaseCommand):
+    help = 'Seed users with realistic transactions, budgets and pots (bulk inserts, kept in the database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='users to create')
+        parser.add_argument('--transactions', type=int, default=1000, help='transactions per user')
+        parser.add_argument('--budgets', type=int, default=4, help='budgets per user (distinct categories, at most 10)')
+        parser.add_argument('--pots', type=int, default=3, help='pots per user (at most 8)')
+        parser.add_argument('--days', type=int, default=3 * 365, help='transactions are spread over the last DAYS days')
+        parser.add_argument('--prefix', default='seed-user-', help='usernames are PREFIX0, PREFIX1, ...')
+        parser.add_argument('--password', help='password of every seeded user (unusable if not given)')
+        parser.add_argument('--seed', type=int, default=0, help='random seed, the same seed gives the same data')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'There are already users named {prefix}*, use another --prefix')
+
+        with transaction.atomic():
+            users = seed_users(
+                options['users'],
+                transactions=options['transactions'],
+                budgets=options['budgets'],
+                pots=options['pots'],
+                prefix=prefix,
+                password=options['password'],
+                days=options['days'],
+                seed=options['seed'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users ({users[0].username} .. {users[-1].username}) '
+            f'with {options["transactions"]} transactions, {options["budgets"]} budgets and {options["pots"]} pots each'
+        ) if users else 'Nothing to seed')
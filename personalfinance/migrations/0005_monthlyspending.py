@@ -0,0 +1,56 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+# fill the rollups from the existing transactions
+def backfill_monthly_spending(apps, schema_editor):
+    Transaction = apps.get_model('personalfinance', 'Transaction')
+    MonthlySpending = apps.get_model('personalfinance', 'MonthlySpending')
+
+    rows = (
+        Transaction.objects
+        .annotate(month=TruncMonth('date', output_field=DateField()))
+        .values('user', 'category', 'month')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+
+    MonthlySpending.objects.bulk_create(
+        (
+            MonthlySpending(user_id=row['user'], category=row['category'], month=row['month'], total=row['total'], count=row['count'])
+            for row in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('personalfinance', '0004_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=50)),
+                ('month', models.DateField()),
+                ('total', models.BigIntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='MonthlySpending', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyspending',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'month'), name='monthly_spending_unique'),
+        ),
+        migrations.RunPython(backfill_monthly_spending, migrations.RunPython.noop),
+    ]
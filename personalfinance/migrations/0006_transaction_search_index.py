@@ -0,0 +1,89 @@
+from django.db import migrations
+
+try:
+    from django.contrib.postgres.operations import TrigramExtension
+except ImportError:
+    # no PostgreSQL driver installed, the database isn't PostgreSQL
+    TrigramExtension = None
+
+
+# the schema as of this migration (later changes to personalfinance.search don't apply to it)
+FTS_TABLE = 'personalfinance_transaction_fts'
+
+SQLITE_FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(name, content='personalfinance_transaction', content_rowid='id', tokenize='trigram')",
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON personalfinance_transaction BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON personalfinance_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF name ON personalfinance_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END''',
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_FTS_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+# trigram GIN index on the expression icontains compiles to (UPPER(name) LIKE UPPER(%term%))
+POSTGRES_INDEX_SQL = 'CREATE INDEX IF NOT EXISTS transaction_name_trgm_idx ON personalfinance_transaction USING gin ((UPPER("name"::text)) gin_trgm_ops)'
+
+POSTGRES_DROP_INDEX_SQL = 'DROP INDEX IF EXISTS transaction_name_trgm_idx'
+
+
+def sqlite_has_trigram_tokenizer(cursor):
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.trigram_check USING fts5(name, tokenize='trigram')")
+    except Exception:
+        return False
+    cursor.execute('DROP TABLE temp.trigram_check')
+
+    return True
+
+
+def create_search_index(apps, schema_editor):
+    conn = schema_editor.connection
+
+    with conn.cursor() as cursor:
+        # SQLite builds without the trigram tokenizer (before 3.34) search with icontains
+        if conn.vendor == 'sqlite' and sqlite_has_trigram_tokenizer(cursor):
+            for sql in SQLITE_FTS_SQL:
+                cursor.execute(sql)
+
+        if conn.vendor == 'postgresql':
+            cursor.execute(POSTGRES_INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    conn = schema_editor.connection
+
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            for sql in SQLITE_DROP_FTS_SQL:
+                cursor.execute(sql)
+
+        if conn.vendor == 'postgresql':
+            cursor.execute(POSTGRES_DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personalfinance', '0005_monthlyspending'),
+    ]
+
+    operations = [
+        # PostgreSQL: CREATE EXTENSION pg_trgm unless it is installed already, which needs a superuser
+        # (or, from PostgreSQL 13 where pg_trgm is a trusted extension, a role with CREATE on the database)
+        # without it a superuser runs CREATE EXTENSION pg_trgm once before migrate
+        *([TrigramExtension()] if TrigramExtension else []),
+        # FTS5 trigram shadow table on SQLite, pg_trgm GIN index on PostgreSQL
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.16 on 2026-10-18 19:53
+
+import logging
+
+from django.db import migrations, models
+
+
+logger = logging.getLogger('personalfinance.migrations')
+
+
+# rows the constraints would refuse: negative totals become 0, totals over the target raise the target
+# (the saved money is kept), every changed pot is reported
+def fix_pot_totals(apps, schema_editor):
+    Pot = apps.get_model('personalfinance', 'Pot')
+    pots = Pot.objects.using(schema_editor.connection.alias)
+
+    negative = list(pots.filter(total__lt=0).values_list('id', 'total'))
+    if negative:
+        logger.warning('pots with a negative total set to 0 (id, total): %s', negative)
+        pots.filter(total__lt=0).update(total=0)
+
+    over_target = list(pots.filter(total__gt=models.F('target')).values_list('id', 'total', 'target'))
+    if over_target:
+        logger.warning('pots over their target, target raised to the total (id, total, target): %s', over_target)
+        pots.filter(total__gt=models.F('target')).update(target=models.F('total'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personalfinance', '0006_transaction_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fix_pot_totals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='pot',
+            constraint=models.CheckConstraint(check=models.Q(('total__gte', 0)), name='pot_total_non_negative'),
+        ),
+        migrations.AddConstraint(
+            model_name='pot',
+            constraint=models.CheckConstraint(check=models.Q(('total__lte', models.F('target'))), name='pot_total_within_target'),
+        ),
+    ]
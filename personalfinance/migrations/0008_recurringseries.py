@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-18 20:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('personalfinance', '0007_pot_total_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('amount', models.IntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('category', models.CharField(max_length=50)),
+                ('cadence', models.CharField(choices=[('weekly', 'Weekly'), ('monthly', 'Monthly'), ('yearly', 'Yearly')], max_length=10)),
+                ('first_date', models.DateTimeField()),
+                ('last_date', models.DateTimeField()),
+                ('next_date', models.DateField()),
+                ('occurrences', models.IntegerField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='RecurringSeries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='personalfinance.recurringseries'),
+        ),
+        migrations.AddConstraint(
+            model_name='recurringseries',
+            constraint=models.UniqueConstraint(fields=('user', 'key', 'amount'), name='recurring_series_unique'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from personalfinance.partitions import partition_transactions, unpartition_transactions
+
+
+def create_partitions(apps, schema_editor):
+    partition_transactions(schema_editor.connection)
+
+
+def drop_partitions(apps, schema_editor):
+    unpartition_transactions(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personalfinance', '0008_recurringseries'),
+    ]
+
+    operations = [
+        # PostgreSQL with PERSONALFINANCE_TRANSACTION_PARTITIONS only: the transaction table copied into a table
+        # partitioned by range of date (nothing to do elsewhere), later partitions are added on migrate
+        migrations.RunPython(create_partitions, drop_partitions),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 22:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('personalfinance', '0009_transaction_partitions'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='transaction_user_recurring_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('recurring', True), ('series__isnull', False), _connector='OR'), fields=['user', 'amount'], name='transaction_user_recurring_idx'),
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.db import models
 from django.contrib.auth.models import User
 
 
+# flagged by the user or part of a detected series (the condition of the recurring index, the views filter on it)
+RECURRING = models.Q(recurring=True) | models.Q(series__isnull=False)
+
 # transaction model
 class Transaction(models.Model):
     avatar = models.TextField()
@@ -11,6 +14,18 @@ class Transaction(models.Model):
     amount = models.IntegerField()
     recurring = models.BooleanField(default=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='Transactions')
+    # detected recurring series (personalfinance/recurring.py), set by detection only
+    series = models.ForeignKey('RecurringSeries', null=True, blank=True, on_delete=models.SET_NULL, related_name='transactions')
+
+    class Meta:
+        # composite indexes matching the view filters and get_sort_str orderings
+        indexes = [
+            models.Index(fields=['user', '-date'], name='transaction_user_date_idx'),
+            models.Index(fields=['user', 'category', '-date'], name='transaction_user_cat_date_idx'),
+            models.Index(fields=['user', 'amount'], condition=RECURRING, name='transaction_user_recurring_idx'),
+            models.Index(fields=['user', 'name'], name='transaction_user_name_idx'),
+            models.Index(fields=['user', 'amount'], name='transaction_user_amount_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -35,6 +50,56 @@ class Pot(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='Pots')
     theme = models.CharField(max_length=7)
 
+    class Meta:
+        # the database refuses totals outside [0, target] (add, withdraw and transfer update in SQL)
+        constraints = [
+            models.CheckConstraint(check=models.Q(total__gte=0), name='pot_total_non_negative'),
+            models.CheckConstraint(check=models.Q(total__lte=models.F('target')), name='pot_total_within_target'),
+        ]
+
     def __str__(self):
         return self.name
 
+
+
+
+# monthly spending rollup (user, category, month) kept in sync with transactions
+class MonthlySpending(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='MonthlySpending')
+    category = models.CharField(max_length=50)
+    month = models.DateField()
+    total = models.BigIntegerField(default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'month'], name='monthly_spending_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.category} {self.month:%Y-%m}'
+
+
+# recurring series found in a user's transactions: same normalized name and amount at a regular cadence
+class RecurringSeries(models.Model):
+    CADENCES = [('weekly', 'Weekly'), ('monthly', 'Monthly'), ('yearly', 'Yearly')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='RecurringSeries')
+    key = models.CharField(max_length=100)
+    amount = models.IntegerField()
+    # name and category of the latest occurrence
+    name = models.CharField(max_length=100)
+    category = models.CharField(max_length=50)
+    cadence = models.CharField(max_length=10, choices=CADENCES)
+    first_date = models.DateTimeField()
+    last_date = models.DateTimeField()
+    next_date = models.DateField()
+    occurrences = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key', 'amount'], name='recurring_series_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.cadence})'
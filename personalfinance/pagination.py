@@ -0,0 +1,127 @@
+import base64
+import json
+import math
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .serializers import transaction_values
+
+
+PAGE_SIZE = 10
+# most pages a capped count will look for
+MAX_COUNTED_PAGES = 100
+
+
+# ordering with a unique tiebreaker on id -> ['-date', '-id']
+def keyset_ordering(sort):
+    return [sort, '-id' if sort.startswith('-') else 'id']
+
+
+# opaque cursor from the sort value and id of the last row of a page
+def encode_cursor(value, row_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+
+    data = json.dumps([value, row_id]).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor, field):
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    if field == 'date':
+        value = parse_datetime(value)
+        if value is None:
+            raise ValueError('Invalid cursor')
+
+    return value, row_id
+
+
+# page of rows after the cursor -> (rows, next cursor or None)
+# every page costs one index range scan no matter how deep it is
+# with values (a ValuesSerializer) the rows are its serialized dicts instead of model instances
+def keyset_page(queryset, sort, cursor=None, page_size=PAGE_SIZE, values=None):
+    field = sort.lstrip('-')
+    lookup = 'lt' if sort.startswith('-') else 'gt'
+
+    queryset = queryset.order_by(*keyset_ordering(sort))
+
+    if cursor:
+        value, row_id = decode_cursor(cursor, field)
+        # (field, id) strictly after the cursor in the page ordering
+        queryset = queryset.filter(
+            Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': row_id})
+        )
+
+    if values:
+        rows = values.serialize(queryset[:page_size + 1])
+    else:
+        rows = list(queryset[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1] if values else vars(rows[-1])
+        next_cursor = encode_cursor(last[field], last['id'])
+
+    return rows, next_cursor
+
+
+# number of rows counted up to a limit -> (count, capped?)
+def capped_count(queryset, page_size=PAGE_SIZE, max_pages=None):
+    limit = page_size * (max_pages or MAX_COUNTED_PAGES)
+    count = queryset.order_by()[:limit + 1].count()
+
+    return min(count, limit), count > limit
+
+
+def capped_num_pages(queryset, page_size=PAGE_SIZE, max_pages=None):
+    count, capped = capped_count(queryset, page_size, max_pages)
+
+    return math.ceil(count / page_size), capped
+
+
+# paginator that stops counting after MAX_COUNTED_PAGES pages
+class CappedPaginator(Paginator):
+    @cached_property
+    def count(self):
+        count, self.capped = capped_count(self.object_list, self.per_page)
+        return count
+
+
+# page of transactions for the list and search views
+# ?cursor=<next_cursor> switches to keyset paging (the page number is ignored, empty for the first page)
+# ?count=capped counts at most MAX_COUNTED_PAGES pages instead of every row
+def paginate_transactions(transactions, sort, page, params):
+    capped = params.get('count') == 'capped'
+
+    if 'cursor' in params:
+        rows, next_cursor = keyset_page(transactions, sort, params.get('cursor'), values=transaction_values)
+        data = {
+            'page_list': rows,
+            'next_cursor': next_cursor,
+        }
+        if capped:
+            data['num_pages'], data['num_pages_capped'] = capped_num_pages(transactions)
+
+        return data
+
+    paginator_class = CappedPaginator if capped else Paginator
+    paginator = paginator_class(transactions.order_by(*keyset_ordering(sort)), PAGE_SIZE)
+    page_obj = paginator.page(page)
+
+    data = {
+        'page_list': transaction_values.serialize(page_obj.object_list),
+        'num_pages': paginator.num_pages,
+    }
+    if capped:
+        data['num_pages_capped'] = paginator.capped
+
+    return data
@@ -0,0 +1,220 @@
+import re
+
+from django.conf import settings
+from django.utils import timezone
+
+from .helpers import next_month, start_of_day
+
+
+# PostgreSQL only: the transaction table partitioned by range of date, one partition per month or year
+# (PERSONALFINANCE_TRANSACTION_PARTITIONS), plus a default partition for dates without one
+TABLE = 'personalfinance_transaction'
+DEFAULT_PARTITION = f'{TABLE}_default'
+SEQUENCE = f'{TABLE}_id_seq'
+INTERVALS = ('month', 'year')
+
+# partitions created ahead of the current month or year
+PARTITIONS_AHEAD = 3
+
+# personalfinance_transaction_2024 (year), personalfinance_transaction_2024_07 (month)
+PARTITION_NAME = re.compile(rf'^{TABLE}_(\d{{4}})(?:_(\d{{2}}))?$')
+
+
+def quote(name):
+    return f'"{name}"'
+
+
+def partition_interval():
+    interval = getattr(settings, 'PERSONALFINANCE_TRANSACTION_PARTITIONS', '')
+    return interval if interval in INTERVALS else None
+
+
+# first day of the period a day falls in
+def period_start(day, interval):
+    return day.replace(month=1, day=1) if interval == 'year' else day.replace(day=1)
+
+
+def next_period(day, interval):
+    return day.replace(year=day.year + 1) if interval == 'year' else next_month(day)
+
+
+# start of the period `ahead` periods after the one of day
+def last_period(day, interval, ahead):
+    last = period_start(day, interval)
+    for _ in range(ahead):
+        last = next_period(last, interval)
+
+    return last
+
+
+def partition_name(start, interval):
+    return f'{TABLE}_{start:%Y}' if interval == 'year' else f'{TABLE}_{start:%Y_%m}'
+
+
+# periods from the one of first to the one of last (both included) -> [(name, start, end)]
+def partition_periods(first, last, interval):
+    periods = []
+    start = period_start(first, interval)
+
+    while start <= last:
+        end = next_period(start, interval)
+        periods.append((partition_name(start, interval), start, end))
+        start = end
+
+    return periods
+
+
+# interval of existing partition names, None if there are none
+def interval_of(names):
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            return 'month' if match.group(2) else 'year'
+
+    return None
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE])
+        return cursor.fetchone() is not None
+
+
+def partition_names(cursor):
+    cursor.execute(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname',
+        [TABLE],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def bound(day):
+    return f"'{start_of_day(day).isoformat()}'"
+
+
+# a partition for [start, end), rows of the range already in the default partition move into it
+def create_partition(cursor, name, start, end):
+    cursor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} WHERE "date" >= %s AND "date" < %s RETURNING *) '
+        f'INSERT INTO {quote(name)} SELECT * FROM moved',
+        [start_of_day(start), start_of_day(end)],
+    )
+    # the table's indexes are created on the partition
+    cursor.execute(f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} FOR VALUES FROM ({bound(start)}) TO ({bound(end)})')
+
+
+# partitions of the current period and PARTITIONS_AHEAD after it -> names of the new ones
+# (nothing to do unless the table is partitioned)
+def roll_partitions_forward(connection, ahead=PARTITIONS_AHEAD, today=None):
+    if not is_partitioned(connection):
+        return []
+
+    with connection.cursor() as cursor:
+        existing = partition_names(cursor)
+        interval = interval_of(existing) or partition_interval() or 'month'
+        today = today or timezone.localdate()
+
+        created = []
+        for name, start, end in partition_periods(today, last_period(today, interval, ahead), interval):
+            if name not in existing:
+                create_partition(cursor, name, start, end)
+                created.append(name)
+
+    return created
+
+
+# definitions of the table's secondary indexes and foreign keys (recreated on the new table)
+def table_definitions(cursor, table):
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+        "(SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p')",
+        [table, table],
+    )
+    indexes = [re.sub(r' ON (ONLY )?\S+ USING ', f' ON {quote(TABLE)} USING ', row[0]) for row in cursor.fetchall()]
+
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+
+    return indexes, foreign_keys
+
+
+# ids come from SEQUENCE owned by the table, whatever made them before (serial, identity)
+def drop_id_sequence(cursor, table):
+    cursor.execute("SELECT attidentity FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'id'", [table])
+    if cursor.fetchone()[0]:
+        cursor.execute(f'ALTER TABLE {quote(table)} ALTER COLUMN "id" DROP IDENTITY')
+        return
+
+    cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])
+    sequence = cursor.fetchone()[0]
+    cursor.execute(f'ALTER TABLE {quote(table)} ALTER COLUMN "id" DROP DEFAULT')
+    if sequence:
+        cursor.execute(f'DROP SEQUENCE {sequence}')
+
+
+# copy the transaction table into a new one, partitioned by interval (None: a plain table again)
+# the primary key of a partitioned table must contain the partition key: (id, date)
+def rebuild_table(connection, interval, ahead=PARTITIONS_AHEAD):
+    old = f'{TABLE}_old'
+
+    with connection.cursor() as cursor:
+        indexes, foreign_keys = table_definitions(cursor, TABLE)
+
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(old)}')
+        cursor.execute(f'ALTER TABLE {quote(old)} RENAME CONSTRAINT {quote(TABLE + "_pkey")} TO {quote(old + "_pkey")}')
+        drop_id_sequence(cursor, old)
+
+        partition_by = ' PARTITION BY RANGE ("date")' if interval else ''
+        cursor.execute(f'CREATE TABLE {quote(TABLE)} (LIKE {quote(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partition_by}')
+        primary_key = '"id", "date"' if interval else '"id"'
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY ({primary_key})')
+
+        if interval:
+            cursor.execute(f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT')
+            cursor.execute(f'SELECT MIN("date") FROM {quote(old)}')
+            first = cursor.fetchone()[0]
+            today = timezone.localdate()
+            first = timezone.localtime(first).date() if first else today
+
+            for name, start, end in partition_periods(first, last_period(today, interval, ahead), interval):
+                cursor.execute(f'CREATE TABLE {quote(name)} PARTITION OF {quote(TABLE)} FOR VALUES FROM ({bound(start)}) TO ({bound(end)})')
+
+        cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(old)}')
+        # partitions of the old table go with it
+        cursor.execute(f'DROP TABLE {quote(old)}')
+
+        for sql in indexes:
+            cursor.execute(sql)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}')
+
+        cursor.execute(f'CREATE SEQUENCE {quote(SEQUENCE)} OWNED BY {quote(TABLE)}."id"')
+        cursor.execute(f"ALTER TABLE {quote(TABLE)} ALTER COLUMN \"id\" SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f'SELECT setval(%s, COALESCE(MAX("id"), 0) + 1, false) FROM {quote(TABLE)}', [SEQUENCE])
+        cursor.execute(f'ANALYZE {quote(TABLE)}')
+
+
+# partition the transaction table (PostgreSQL with PERSONALFINANCE_TRANSACTION_PARTITIONS) -> True if it was
+def partition_transactions(connection):
+    interval = partition_interval()
+    if connection.vendor != 'postgresql' or interval is None or is_partitioned(connection):
+        return False
+
+    rebuild_table(connection, interval)
+    return True
+
+
+def unpartition_transactions(connection):
+    if not is_partitioned(connection):
+        return False
+
+    rebuild_table(connection, None)
+    return True
@@ -0,0 +1,246 @@
+import json
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger('personalfinance.pool')
+
+# defaults of the POOL settings (api/settings.py)
+MAX_SIZE = 10
+# seconds a checkout waits for a free connection before PoolTimeout
+TIMEOUT = 10
+# idle connections are closed after this many seconds, every connection after MAX_LIFETIME
+MAX_IDLE = 300
+MAX_LIFETIME = 3600
+# connections idle for longer are checked before they are handed out
+CHECK_AFTER = 30
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = self.released_at = time.monotonic()
+
+
+# thread-safe pool of database connections, created on demand up to max_size
+# connect() -> new connection, check(connection) -> False if it's unusable,
+# reset(connection) cleans a returned connection (raises if it can't be reused), close(connection)
+# waiting checkouts are served in no particular order, idle connections are reused most recent first
+class ConnectionPool:
+    def __init__(self, connect, check=None, reset=None, close=None, max_size=MAX_SIZE, timeout=TIMEOUT,
+                 max_idle=MAX_IDLE, max_lifetime=MAX_LIFETIME, check_after=CHECK_AFTER, name='default'):
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.close_connection = close or (lambda connection: connection.close())
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self.name = name
+
+        self.condition = threading.Condition()
+        self.idle = []
+        # id(connection) -> PooledConnection of the checked out connections
+        self.in_use = {}
+        # connections being opened (counted in the size)
+        self.opening = 0
+        self.waiting = 0
+        self.closed = False
+
+        self.counters = dict.fromkeys(
+            ('checkouts', 'waits', 'timeouts', 'created', 'discarded', 'failed_checks', 'peak_in_use'), 0
+        )
+        self.wait_ms = 0.0
+
+    @property
+    def size(self):
+        return len(self.idle) + len(self.in_use) + self.opening
+
+    # a connection for the caller (put it back with put), waits up to timeout seconds when all are in use
+    # (in total: a connection that fails its check is discarded and the checkout goes on until the deadline)
+    def get(self):
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            pooled = self.acquire(deadline)
+
+            # checked outside the lock, the other threads go on meanwhile
+            if self.check is None or time.monotonic() - pooled.released_at <= self.check_after:
+                break
+            if self.check(pooled.connection):
+                break
+
+            with self.condition:
+                self.counters['failed_checks'] += 1
+            self.discard(pooled)
+
+        with self.condition:
+            self.in_use[id(pooled.connection)] = pooled
+            self.counters['checkouts'] += 1
+            self.counters['peak_in_use'] = max(self.counters['peak_in_use'], len(self.in_use))
+
+        return pooled.connection
+
+    # an idle connection or a new one once there is room, PoolTimeout after the deadline
+    def acquire(self, deadline):
+        waited_since = None
+
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise PoolTimeout(f'Connection pool {self.name} is closed')
+
+                pooled = self.take_idle()
+                if pooled is not None:
+                    break
+
+                if self.size < self.max_size:
+                    self.opening += 1
+                    break
+
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    self.counters['waits'] += 1
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters['timeouts'] += 1
+                    self.wait_ms += (time.monotonic() - waited_since) * 1000
+                    stats = self.stats()
+                    logger.error('pool timeout %s', json.dumps(stats))
+                    raise PoolTimeout(
+                        f'No free connection in pool {self.name} after {self.timeout}s ({self.max_size} in use)'
+                    )
+
+                self.waiting += 1
+                try:
+                    self.condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+            if waited_since is not None:
+                self.wait_ms += (time.monotonic() - waited_since) * 1000
+
+        return pooled if pooled is not None else self.open()
+
+    # most recently released idle connection that is still fresh (caller holds the lock)
+    def take_idle(self):
+        now = time.monotonic()
+
+        while self.idle:
+            pooled = self.idle.pop()
+            if now - pooled.released_at <= self.max_idle and now - pooled.created_at <= self.max_lifetime:
+                return pooled
+            self.close_quietly(pooled)
+
+        return None
+
+    def open(self):
+        try:
+            pooled = PooledConnection(self.connect())
+        except Exception:
+            with self.condition:
+                self.opening -= 1
+                self.condition.notify()
+            raise
+
+        with self.condition:
+            self.opening -= 1
+            self.counters['created'] += 1
+
+        return pooled
+
+    # give a connection back, reusable=False closes it (errors, broken connections)
+    def put(self, connection, reusable=True):
+        with self.condition:
+            pooled = self.in_use.pop(id(connection), None)
+        if pooled is None:
+            # not from this pool (or put back twice)
+            self.close_connection(connection)
+            return
+
+        if reusable and self.reset is not None:
+            try:
+                self.reset(connection)
+            except Exception:
+                reusable = False
+
+        if not reusable or self.closed or time.monotonic() - pooled.created_at > self.max_lifetime:
+            self.discard(pooled)
+            return
+
+        with self.condition:
+            pooled.released_at = time.monotonic()
+            self.idle.append(pooled)
+            self.condition.notify()
+
+    def discard(self, pooled):
+        with self.condition:
+            self.counters['discarded'] += 1
+            # a waiting checkout may open a new one
+            self.condition.notify()
+
+        self.close_quietly(pooled)
+
+    def close_quietly(self, pooled):
+        try:
+            self.close_connection(pooled.connection)
+        except Exception:
+            pass
+
+    # close the idle connections, checked out ones are closed when they come back
+    def close(self):
+        with self.condition:
+            self.closed = True
+            idle, self.idle = self.idle, []
+            self.condition.notify_all()
+
+        for pooled in idle:
+            self.close_quietly(pooled)
+
+    # saturation metrics: in_use / max_size, checkouts that had to wait and for how long, timeouts
+    def stats(self):
+        with self.condition:
+            return {
+                'name': self.name,
+                'max_size': self.max_size,
+                'size': self.size,
+                'in_use': len(self.in_use),
+                'idle': len(self.idle),
+                'waiting': self.waiting,
+                'saturation': round(len(self.in_use) / self.max_size, 3),
+                'wait_ms': round(self.wait_ms, 1),
+                **self.counters,
+            }
+
+
+# one pool per database alias and process (forked workers open their own connections)
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, **options):
+    key = (alias, os.getpid())
+
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(connect, name=alias, **options)
+
+        return pools[key]
+
+
+# stats of the pools of this process
+def pool_stats():
+    pid = os.getpid()
+    with pools_lock:
+        current = [pool for (alias, pool_pid), pool in pools.items() if pool_pid == pid]
+
+    return [pool.stats() for pool in current]
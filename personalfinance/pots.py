@@ -0,0 +1,78 @@
+from django.db import transaction
+from django.db.models import F
+
+from .cache import bump_data_version
+from .models import Pot
+
+
+# pot errors with the PotSerializer messages
+class PotError(Exception):
+    def __init__(self, errors, message=None):
+        super().__init__(message or errors)
+        self.errors = errors
+        self.message = message
+
+
+def pot_errors(total, target):
+    errors = {}
+    if total < 0:
+        errors['total'] = ['Total can\'t be negative']
+    if total > target:
+        errors['value'] = ['Total can\'t be higher than target']
+
+    return errors
+
+
+# add amount (x100, negative to withdraw) to a pot in one conditional UPDATE
+# -> the updated pot, raises PotError if the pot doesn't exist or would leave [0, target]
+@transaction.atomic
+def move_pot_total(pot_id, user_id, amount):
+    # total + amount in [0, target], checked by the database against the current row
+    updated = (
+        Pot.objects
+        .filter(id=pot_id, user=user_id, total__gte=-amount, total__lte=F('target') - amount)
+        .update(total=F('total') + amount)
+    )
+
+    # the updated row stays locked until commit, this read sees our total
+    pot = Pot.objects.filter(id=pot_id, user=user_id).first()
+    if pot is None:
+        raise PotError({}, 'Object with pot id does not exist')
+    if not updated:
+        raise PotError(pot_errors(pot.total + amount, pot.target))
+
+    # update() skips the save signals
+    bump_data_version(user_id, scopes=())
+
+    return pot
+
+
+# move money between pots of a user in one transaction
+# transfers: [(from pot id, to pot id, amount x100)] -> updated pots, raises PotError (nothing is moved)
+@transaction.atomic
+def transfer_between_pots(user_id, transfers):
+    deltas = {}
+    for from_id, to_id, amount in transfers:
+        if amount <= 0 or from_id == to_id:
+            raise PotError({}, 'Please enter valid transfers')
+        deltas[from_id] = deltas.get(from_id, 0) - amount
+        deltas[to_id] = deltas.get(to_id, 0) + amount
+
+    # rows locked in id order so concurrent transfers can't deadlock
+    pots = list(Pot.objects.select_for_update().filter(id__in=list(deltas), user=user_id).order_by('id'))
+    if len(pots) != len(deltas):
+        raise PotError({}, 'Object with pot id does not exist')
+
+    errors = {}
+    for pot in pots:
+        pot.total += deltas[pot.id]
+        if pot_errors(pot.total, pot.target):
+            errors[pot.id] = pot_errors(pot.total, pot.target)
+    if errors:
+        raise PotError(errors)
+
+    # rows are locked, plain updates of the totals
+    Pot.objects.bulk_update(pots, ['total'])
+    bump_data_version(user_id, scopes=())
+
+    return pots
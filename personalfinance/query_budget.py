@@ -0,0 +1,164 @@
+import json
+import logging
+import math
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections, router
+
+
+logger = logging.getLogger('personalfinance.query_budget')
+
+# statements shown when a method goes over its budget
+LOGGED_QUERIES = 20
+
+
+# budget of the view method running (extend_query_budget, check_query_budget)
+# the query threads of an async view count into it too (sync_to_async copies the context)
+running_budget = ContextVar('personalfinance_query_budget', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# counts the queries of every database connection of the current thread
+class QueryCounter:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for alias in connections:
+            self.stack.enter_context(connections[alias].execute_wrapper(self))
+
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+
+# queries counted for a view method and the most it may run (grown by the writes of bulk endpoints)
+class RunningBudget:
+    def __init__(self, name, request, max_queries):
+        self.name = name
+        self.request = request
+        self.max_queries = max_queries
+        self.counter = QueryCounter()
+        self.reported = False
+
+    # over budget once: reported by the first check
+    def check(self):
+        if len(self.counter.queries) > self.max_queries and not self.reported:
+            self.reported = True
+            over_budget(self.name, self.request, self.counter.queries, self.max_queries)
+
+
+@contextmanager
+def running(budget):
+    token = running_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        running_budget.reset(token)
+
+
+# most queries a view method may run (auth excluded: DRF authenticates before the method)
+# over budget: a warning with the statements, QueryBudgetExceeded with PERSONALFINANCE_QUERY_BUDGET_STRICT (tests)
+# budgets must not depend on the amount of data, a query per row (N+1) always goes over
+# (bulk writes extend it by the statements they need, see extend_query_budget)
+def query_budget(max_queries):
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            budget = RunningBudget(f'{type(self).__name__}.{method.__name__}', request, max_queries)
+            with running(budget), budget.counter:
+                response = method(self, request, *args, **kwargs)
+
+            # streamed responses (export) query while they are read
+            if getattr(response, 'streaming', False):
+                response.streaming_content = counted_stream(response.streaming_content, budget)
+            else:
+                budget.check()
+
+            return response
+
+        wrapper.query_budget = max_queries
+        return wrapper
+
+    return decorator
+
+
+# budget of an async view method: the queries of the query threads started in the block
+# (run them through count_async_queries), checked when the block is done
+@contextmanager
+def async_query_budget(name, request, max_queries):
+    budget = RunningBudget(name, request, max_queries)
+    with running(budget):
+        yield budget
+
+    budget.check()
+
+
+# count the queries of this thread into the budget of the async view method that started it, if any
+@contextmanager
+def count_async_queries():
+    budget = running_budget.get()
+    if budget is None:
+        yield
+        return
+
+    # the counter of several threads at once: only their own connections' wrappers
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(budget.counter))
+        yield
+
+
+# writes whose statements grow with the payload (a rollup per category and month, an insert per batch)
+# allow that many more queries to the running view method
+def extend_query_budget(queries):
+    budget = running_budget.get()
+    if budget is not None:
+        budget.max_queries += queries
+
+
+# check the running budget now: inside the atomic block of a write, over budget (strict) rolls it back
+# instead of raising after the commit
+def check_query_budget():
+    budget = running_budget.get()
+    if budget is not None:
+        budget.check()
+
+
+# statements of a bulk_create or bulk_update of objs (fields: the written fields, the pk twice more for
+# bulk_update), the backend caps the rows of a statement
+def bulk_statements(model, objs, fields):
+    ops = connections[router.db_for_write(model)].ops
+    return math.ceil(len(objs) / max(ops.bulk_batch_size(fields, objs), 1))
+
+
+def counted_stream(content, budget):
+    with budget.counter:
+        yield from content
+
+    budget.check()
+
+
+def over_budget(name, request, queries, max_queries):
+    message = f'{name} ran {len(queries)} queries, its budget is {max_queries}'
+
+    if getattr(settings, 'PERSONALFINANCE_QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(message + ':\n' + '\n'.join(queries))
+
+    logger.warning('%s %s', message, json.dumps({
+        'method': request.method,
+        'path': request.get_full_path(),
+        'sql': queries[:LOGGED_QUERIES],
+    }))
@@ -0,0 +1,284 @@
+import calendar
+import math
+import re
+from datetime import timedelta
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Case, F, Value, When, Window
+from django.db.models.functions import ExtractDay, RowNumber
+from django.utils import timezone
+
+from .cache import bump_data_version
+from .helpers import start_of_day
+from .models import RECURRING, RecurringSeries, Transaction
+from .query_budget import extend_query_budget
+from .serializers import transaction_values
+
+
+# unpaid bills due within this many days are due soon
+DUE_SOON_DAYS = 5
+
+# a cadence needs at least this many occurrences
+MIN_OCCURRENCES = 3
+# share of the intervals that must match the cadence (a late or missed payment is fine)
+MIN_MATCHING_INTERVALS = 0.75
+# cadence -> (days between occurrences, tolerance in days)
+CADENCES = {'weekly': (7, 1), 'monthly': (30, 3), 'yearly': (365, 7)}
+# transactions linked to a series per update
+LINK_BATCH_SIZE = 500
+
+# left out of normalized names
+NAME_SUFFIXES = {'www', 'com', 'net', 'org', 'co', 'uk', 'inc', 'ltd', 'llc', 'gmbh'}
+
+ROW_FIELDS = ['id', 'name', 'category', 'amount', 'date', 'series_id']
+
+
+# latest occurrence of every recurring bill of a user (one per detected series, one per name for the flagged
+# rows outside a series), with the cadence and next date of its series
+# paid: the latest occurrence is in the current month, due_day: day of the month it is paid on
+def latest_recurring_bills(user_id, today):
+    month = start_of_day(today.replace(day=1))
+
+    return (
+        Transaction.objects
+        .filter(RECURRING, user=user_id, amount__lt=0)
+        .annotate(occurrence=Window(
+            RowNumber(),
+            partition_by=[F('series'), Case(When(series__isnull=True, then=F('name')))],
+            order_by=[F('date').desc(), F('id').desc()],
+        ))
+        .filter(occurrence=1)
+        .annotate(
+            paid=Case(When(date__gte=month, then=Value(True)), default=Value(False), output_field=BooleanField()),
+            due_day=ExtractDay('date'),
+            cadence=F('series__cadence'),
+            next_date=F('series__next_date'),
+        )
+    )
+
+
+# bill of latest_recurring_bills -> (paid, due date), the due date of a paid bill is its latest occurrence
+# series: due on their next date, paid once this month's (this week's for weekly series) occurrence is there
+# flagged rows outside a series are monthly: due on the day of the month of their latest occurrence
+def bill_due_date(bill, today):
+    paid, due_day, next_date = bill.pop('paid'), bill.pop('due_day'), bill.pop('next_date')
+
+    if next_date is None:
+        # paid on the 31st -> due on the last day of shorter months
+        return paid, today.replace(day=min(due_day, calendar.monthrange(today.year, today.month)[1]))
+
+    if bill['cadence'] == 'weekly':
+        paid = next_date > today
+        return paid, next_date - timedelta(days=CADENCES['weekly'][0]) if paid else next_date
+
+    paid = paid and next_date > today
+    return paid, today.replace(day=due_day) if paid else next_date
+
+
+# recurring bills summary -> { bills: [latest occurrence with cadence, status and due_date], paid, upcoming, due_soon, total }
+# status: paid, due_soon (not paid and due within DUE_SOON_DAYS days or overdue) or upcoming
+# upcoming totals every bill not paid yet (the due soon ones included)
+def get_recurring_summary(user_id, today=None):
+    today = today or timezone.localdate()
+    due_soon_until = today + timedelta(days=DUE_SOON_DAYS)
+
+    bills = transaction_values.serialize(latest_recurring_bills(user_id, today), extra=['paid', 'due_day', 'cadence', 'next_date'])
+    totals = {name: {'total': 0, 'count': 0} for name in ('paid', 'upcoming', 'due_soon', 'total')}
+
+    for bill in bills:
+        paid, due_date = bill_due_date(bill, today)
+
+        if paid:
+            status = 'paid'
+        elif due_date <= due_soon_until:
+            status = 'due_soon'
+        else:
+            status = 'upcoming'
+
+        bill['status'] = status
+        bill['due_date'] = due_date.isoformat()
+
+        for name in {'total', 'paid'} if status == 'paid' else {'total', 'upcoming', status}:
+            totals[name]['total'] += bill['amount']
+            totals[name]['count'] += 1
+
+    bills.sort(key=itemgetter('due_date', 'name'))
+
+    return {'bills': bills, **totals}
+
+
+# 'NETFLIX.COM 0423', 'Netflix Inc' -> 'netflix' (no digits, punctuation, domains or company suffixes)
+# (cached, the same few names come back on every row of a user)
+@lru_cache(maxsize=10000)
+def normalize_name(name):
+    words = [word for word in re.sub(r'[^a-z]+', ' ', name.lower()).split() if word not in NAME_SUFFIXES]
+    return ' '.join(words) or name.lower().strip()
+
+
+def local_date(date):
+    return timezone.localtime(date).date() if timezone.is_aware(date) else date.date()
+
+
+# dates in order -> 'weekly', 'monthly', 'yearly' or None
+def detect_cadence(dates):
+    if len(dates) < MIN_OCCURRENCES:
+        return None
+
+    days = [local_date(date) for date in dates]
+    intervals = [(later - earlier).days for earlier, later in zip(days, days[1:])]
+
+    for cadence, (length, tolerance) in CADENCES.items():
+        matching = sum(1 for interval in intervals if abs(interval - length) <= tolerance)
+        if matching >= MIN_MATCHING_INTERVALS * len(intervals):
+            return cadence
+
+    return None
+
+
+# same day n months later (the last day of shorter months)
+def add_months(day, months):
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def next_date(date, cadence):
+    day = local_date(date)
+
+    if cadence == 'weekly':
+        return day + timedelta(days=7)
+
+    return add_months(day, 1 if cadence == 'monthly' else 12)
+
+
+# rows (ROW_FIELDS) of a group in date order -> field values of its series, None if it isn't periodic
+def series_values(rows):
+    cadence = detect_cadence([row[4] for row in rows])
+    if cadence is None:
+        return None
+
+    first, last = rows[0], rows[-1]
+
+    return {
+        'name': last[1],
+        'category': last[2],
+        'cadence': cadence,
+        'first_date': first[4],
+        'last_date': last[4],
+        'next_date': next_date(last[4], cadence),
+        'occurrences': len(rows),
+    }
+
+
+# write the series of one (key, amount) group and link its rows -> True if anything changed
+def save_group(user_id, key, amount, rows, series):
+    values = series_values(rows) if rows else None
+    changed = False
+    unlinked = None
+    # written statements, the query budget of the view grows with the series of the payload
+    statements = 0
+
+    if values is None:
+        target = None
+        if series is not None:
+            # its rows are unlinked by the delete (SET_NULL)
+            RecurringSeries.objects.filter(pk=series.pk).delete()
+            unlinked, changed = series.pk, True
+            statements += 1
+    elif series is None:
+        try:
+            with transaction.atomic():
+                series = RecurringSeries.objects.create(user_id=user_id, key=key, amount=amount, **values)
+            statements += 3
+        except IntegrityError:
+            # created by a concurrent detection in the meantime
+            series = RecurringSeries.objects.get(user=user_id, key=key, amount=amount)
+            RecurringSeries.objects.filter(pk=series.pk).update(**values)
+            statements += 5
+        target, changed = series.pk, True
+    else:
+        target = series.pk
+        if any(getattr(series, field) != value for field, value in values.items()):
+            RecurringSeries.objects.filter(pk=series.pk).update(**values)
+            changed = True
+            statements += 1
+
+    ids = [row[0] for row in rows if row[5] != target and (unlinked is None or row[5] != unlinked)]
+    for start in range(0, len(ids), LINK_BATCH_SIZE):
+        # update() skips the save signals (no detection again)
+        Transaction.objects.filter(id__in=ids[start:start + LINK_BATCH_SIZE]).update(series=target)
+
+    extend_query_budget(statements + math.ceil(len(ids) / LINK_BATCH_SIZE))
+
+    return changed or bool(ids)
+
+
+# sort and scan: rows (ROW_FIELDS) of a user sorted by (normalized name, amount, date), each run of
+# equal (name, amount) is a group checked for a cadence
+# existing: { (key, amount): series } of the user, groups: only these (key, amount) groups
+def save_user_series(user_id, rows, existing, groups=None):
+    rows = sorted(((normalize_name(row[1]), row[3], row[4], row) for row in rows), key=itemgetter(0, 1, 2))
+    changed = False
+
+    for (key, amount), group in groupby(rows, key=itemgetter(0, 1)):
+        if groups is not None and (key, amount) not in groups:
+            continue
+        changed |= save_group(user_id, key, amount, [row[3] for row in group], existing.pop((key, amount), None))
+
+    # series whose rows are all gone (renamed, new amount)
+    for (key, amount), series in existing.items():
+        if groups is None or (key, amount) in groups:
+            changed |= save_group(user_id, key, amount, [], series)
+
+    return changed
+
+
+# detect (and link) the series of a user's transactions, groups: only these (key, amount) groups
+# -> True if a series or a link changed
+def detect_user_series(user_id, groups=None):
+    rows = Transaction.objects.filter(user=user_id)
+    series = RecurringSeries.objects.filter(user=user_id)
+
+    if groups is not None:
+        amounts = {amount for key, amount in groups}
+        rows = rows.filter(amount__in=amounts)
+        series = series.filter(amount__in=amounts)
+
+    existing = {(item.key, item.amount): item for item in series}
+
+    return save_user_series(user_id, list(rows.values_list(*ROW_FIELDS)), existing, groups)
+
+
+# every user's series in one pass over the transaction table ordered by user (streamed,
+# one user's rows in memory at a time) -> (users, users with changes)
+def detect_all_series(user_ids=None, chunk_size=5000):
+    rows = Transaction.objects.order_by('user_id')
+    series = RecurringSeries.objects.all()
+    if user_ids is not None:
+        rows = rows.filter(user__in=user_ids)
+        series = series.filter(user__in=user_ids)
+
+    existing = {}
+    for item in series.iterator(chunk_size=chunk_size):
+        existing.setdefault(item.user_id, {})[(item.key, item.amount)] = item
+
+    users = changed_users = 0
+    for user_id, user_rows in groupby(rows.values_list('user_id', *ROW_FIELDS).iterator(chunk_size=chunk_size), key=itemgetter(0)):
+        users += 1
+        with transaction.atomic():
+            if save_user_series(user_id, [row[1:] for row in user_rows], existing.pop(user_id, {})):
+                bump_data_version(user_id)
+                changed_users += 1
+
+    # users without transactions left
+    for user_id, user_series in existing.items():
+        with transaction.atomic():
+            if save_user_series(user_id, [], user_series):
+                bump_data_version(user_id)
+                changed_users += 1
+
+    return users, changed_users
@@ -0,0 +1,104 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+
+# reads stay on the primary this long after a user's write (longer than the replication lag)
+PIN_SECONDS = 5
+
+# True while a get method of a personalfinance view reads from the replicas
+# (copied into the threads of sync_to_async, the async views' queries follow it)
+replica_reads = ContextVar('personalfinance_replica_reads', default=False)
+
+
+# replicas only with a cache shared by the workers (PERSONALFINANCE_SHARED_CACHE): the pin of a write
+# in a local memory cache is not seen by the worker serving the user's next request, it would read a lagging replica
+def replica_aliases():
+    replicas = getattr(settings, 'PERSONALFINANCE_REPLICAS', [])
+    if replicas and not getattr(settings, 'PERSONALFINANCE_SHARED_CACHE', False):
+        raise ImproperlyConfigured('Read replicas need a cache shared by the workers')
+
+    return replicas
+
+
+def choose_replica():
+    return random.choice(replica_aliases())
+
+
+def pin_key(user_id):
+    return f'pf:primary:{user_id}'
+
+
+# read your writes: the users' reads go to the primary for PERSONALFINANCE_REPLICA_PIN_SECONDS
+# (in the shared cache, the next request may be served by another worker)
+def pin_to_primary(*user_ids):
+    if replica_aliases():
+        timeout = getattr(settings, 'PERSONALFINANCE_REPLICA_PIN_SECONDS', PIN_SECONDS)
+        cache.set_many({pin_key(user_id): True for user_id in user_ids}, timeout)
+
+
+def is_pinned(user_id):
+    return cache.get(pin_key(user_id)) is not None
+
+
+# reads of the block go to a replica unless there are none or the user wrote in the pin window
+@contextmanager
+def reads_for_user(user_id):
+    if not replica_aliases() or is_pinned(user_id):
+        yield False
+        return
+
+    token = replica_reads.set(True)
+    try:
+        yield True
+    finally:
+        replica_reads.reset(token)
+
+
+def replica_stream(content):
+    token = replica_reads.set(True)
+    try:
+        yield from content
+    finally:
+        replica_reads.reset(token)
+
+
+# get methods of the personalfinance views read from the replicas (streamed rows of the export too)
+def read_from_replica(method):
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        with reads_for_user(request.user.id) as replica:
+            response = method(self, request, *args, **kwargs)
+
+        if replica and getattr(response, 'streaming', False):
+            response.streaming_content = replica_stream(response.streaming_content)
+
+        return response
+
+    return wrapper
+
+
+# personalfinance reads inside read_from_replica go to a random replica, everything else to the primary:
+# writes, reads of writing requests, authentication (users, knox tokens), sessions and the admin
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'personalfinance' and replica_reads.get():
+            return choose_replica()
+
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    # replicas hold the same rows
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    # replicas get their schema from the primary
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
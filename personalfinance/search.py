@@ -0,0 +1,154 @@
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Case, ExpressionWrapper, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Length
+from django.utils.module_loading import import_string
+
+
+# trigram indexes can only serve terms of at least 3 characters
+MIN_TRIGRAM_LENGTH = 3
+
+# terms with more matches (of every user) than this are filtered with icontains on SQLite, see SQLiteFTSSearchBackend
+FTS_MAX_MATCHES = 500
+
+FTS_TABLE = 'personalfinance_transaction_fts'
+
+# FTS5 shadow table over transaction names, kept in sync by triggers (bulk writes included)
+SQLITE_FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(name, content='personalfinance_transaction', content_rowid='id', tokenize='trigram')",
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON personalfinance_transaction BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON personalfinance_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF name ON personalfinance_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name);
+    END''',
+]
+
+SQLITE_FTS_TRIGGERS = [f'{FTS_TABLE}_insert', f'{FTS_TABLE}_delete', f'{FTS_TABLE}_update']
+
+
+def sqlite_has_trigram_tokenizer(conn):
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.trigram_check USING fts5(name, tokenize='trigram')")
+        except Exception:
+            return False
+        cursor.execute('DROP TABLE temp.trigram_check')
+
+    return True
+
+
+# create (or repair) the SQLite search index, returns True if there is one
+# (migration 0006 creates it, and the pg_trgm index on PostgreSQL)
+def install_search_index(conn):
+    if conn.vendor != 'sqlite' or not sqlite_has_trigram_tokenizer(conn):
+        return False
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            SQLITE_FTS_TRIGGERS,
+        )
+        complete = cursor.fetchone()[0] == len(SQLITE_FTS_TRIGGERS)
+
+        for sql in SQLITE_FTS_SQL:
+            cursor.execute(sql)
+        # triggers are dropped whenever a migration remakes the transaction table
+        if not complete:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    return True
+
+
+# plain substring search, can't use an index
+# filter(transactions, term, user_id, ranked): transactions are the rows of user_id, ranked when they are
+# ordered by rank
+class IContainsSearchBackend:
+    def filter(self, transactions, term, user_id, ranked=False):
+        return transactions.filter(name__icontains=term)
+
+    # names starting with the term first, then by how much of the name the term covers
+    def rank(self, transactions, term):
+        return transactions.annotate(
+            rank=ExpressionWrapper(
+                Case(When(name__istartswith=term, then=Value(1.0)), default=Value(0.0))
+                + Value(float(len(term))) / Cast(Length('name'), FloatField()),
+                output_field=FloatField(),
+            )
+        )
+
+
+# trigram GIN index serves the icontains filter, similarity ranks the matches
+class PostgresTrigramSearchBackend(IContainsSearchBackend):
+    def rank(self, transactions, term):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        return transactions.annotate(rank=TrigramSimilarity('name', term))
+
+
+# FTS5 trigram shadow table, same substring semantics as icontains
+# (bm25 needs the match per row, which costs a full text query for every result)
+# the full text query reads every match of every user before the page is sorted, icontains walks the user's
+# rows in the page order and stops at a full page: the index is only used for terms with at most
+# FTS_MAX_MATCHES matches and for the rank order, which reads every match either way
+# (benchmark_search, 100k rows of the user: 'nomatch' date page 1.5 ms instead of 106 ms and 'spa' relevance page
+# 14 ms instead of 111 ms; the 'spa' date page took 12.7 ms instead of 1.7 ms with the index, now icontains)
+class SQLiteFTSSearchBackend(IContainsSearchBackend):
+    def match(self, term):
+        # quoted phrase -> substring match
+        return '"' + term.replace('"', '""') + '"'
+
+    # more than FTS_MAX_MATCHES matches in the table (stops counting there)
+    def is_common(self, transactions, term):
+        with connections[transactions.db].cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s)',
+                [self.match(term), FTS_MAX_MATCHES + 1],
+            )
+            return cursor.fetchone()[0] > FTS_MAX_MATCHES
+
+    # the matches of the user only (CROSS JOIN: the full text query runs once, then the rows by id)
+    def filter(self, transactions, term, user_id, ranked=False):
+        if len(term) < MIN_TRIGRAM_LENGTH or (not ranked and self.is_common(transactions, term)):
+            return super().filter(transactions, term, user_id, ranked)
+
+        return transactions.filter(
+            id__in=RawSQL(
+                f'SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} CROSS JOIN personalfinance_transaction matched '
+                f'ON matched.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH %s AND matched.user_id = %s',
+                [self.match(term), user_id],
+            )
+        )
+
+
+_backend = None
+
+
+# search backend from PERSONALFINANCE_SEARCH_BACKEND or the database in use
+def get_search_backend():
+    global _backend
+
+    if _backend is None:
+        path = getattr(settings, 'PERSONALFINANCE_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresTrigramSearchBackend()
+        elif connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+            _backend = SQLiteFTSSearchBackend()
+        else:
+            _backend = IContainsSearchBackend()
+
+    return _backend
+
+
+# search and rank transactions by name, ranked: ordered by rank
+def search_transactions(transactions, term, user_id, ranked=False):
+    backend = get_search_backend()
+
+    return backend.rank(backend.filter(transactions, term, user_id, ranked), term)
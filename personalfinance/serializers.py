@@ -1,15 +1,26 @@
 from django.contrib.auth.models import Group, User
 from django.contrib.auth import authenticate
-from rest_framework import serializers
+from django.utils.functional import cached_property
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
 from .models import Budget, Pot, Transaction
+from .timing import timed
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+# model serializer with its output counted as serializer time (Server-Timing)
+class TimedModelSerializer(serializers.ModelSerializer):
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+
+class TransactionSerializer(TimedModelSerializer):
     class Meta:
         model = Transaction
         fields = '__all__'
-        extra_kwargs = {'user': {'write_only': True}, 'date': {'error_messages': {'required': 'Please enter a valid date', 'invalid': 'Please enter a valid date.'}}}
+        extra_kwargs = {'user': {'write_only': True}, 'series': {'read_only': True}, 'date': {'error_messages': {'required': 'Please enter a valid date', 'invalid': 'Please enter a valid date.'}}}
         
 
     def validate(self, data):
@@ -34,7 +45,19 @@ class TransactionSerializer(serializers.ModelSerializer):
         return super().validate(data)    
 
 
-class BudgetSerializer(serializers.ModelSerializer):
+# bulk import rows: same rules, user is set by the import
+class TransactionImportSerializer(TransactionSerializer):
+    class Meta(TransactionSerializer.Meta):
+        fields = ['avatar', 'name', 'category', 'date', 'amount', 'recurring']
+
+
+# batch operations: same rules, user is set by the batch (no user lookup per row)
+class BatchTransactionSerializer(TransactionSerializer):
+    class Meta(TransactionSerializer.Meta):
+        fields = ['id', 'avatar', 'name', 'category', 'date', 'amount', 'recurring']
+
+
+class BudgetSerializer(TimedModelSerializer):
     class Meta:
         model = Budget
         fields = '__all__'
@@ -58,7 +81,7 @@ class BudgetSerializer(serializers.ModelSerializer):
         return super().validate(data)        
 
 
-class PotSerializer(serializers.ModelSerializer):
+class PotSerializer(TimedModelSerializer):
     class Meta:
         model = Pot
         fields = '__all__'
@@ -82,6 +105,90 @@ class PotSerializer(serializers.ModelSerializer):
         return super().validate(data)
 
 
+class BatchBudgetSerializer(BudgetSerializer):
+    class Meta(BudgetSerializer.Meta):
+        fields = ['id', 'category', 'maximum', 'theme']
+
+
+class BatchPotSerializer(PotSerializer):
+    class Meta(PotSerializer.Meta):
+        fields = ['id', 'name', 'target', 'total', 'theme']
+
+
+# read-only list serialization from .values_list() tuples, same output as the model serializer
+# (no model instances, only the fields whose value differs from the database value are converted)
+class ValuesSerializer:
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def fields(self):
+        return [field for field in self.serializer_class().fields.values() if not field.write_only]
+
+    @cached_property
+    def names(self):
+        return [field.field_name for field in self.fields]
+
+    @cached_property
+    def sources(self):
+        return [field.source for field in self.fields]
+
+    @cached_property
+    def nullable(self):
+        model = self.serializer_class.Meta.model
+        return [model._meta.get_field(source).null for source in self.sources]
+
+    # value -> representation, None when the database value is already the representation
+    def mapper(self, field):
+        if isinstance(field, (serializers.IntegerField, serializers.CharField, serializers.BooleanField, serializers.FloatField, serializers.PrimaryKeyRelatedField)):
+            return None
+
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+            if output_format and output_format.lower() == ISO_8601 and tz is not None:
+                def to_iso(value):
+                    value = value.astimezone(tz).isoformat()
+                    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+                return to_iso
+
+        return field.to_representation
+
+    # (index, mapper) of the fields to convert, compiled per call (the current timezone may change)
+    def converters(self):
+        converters = []
+        for index, (field, nullable) in enumerate(zip(self.fields, self.nullable)):
+            mapper = self.mapper(field)
+            if mapper and nullable:
+                mapper = (lambda fn: lambda value: None if value is None else fn(value))(mapper)
+            if mapper:
+                converters.append((index, mapper))
+
+        return converters
+
+    # extra: annotations of the queryset added to the rows as they are
+    def serialize(self, queryset, extra=()):
+        names = [*self.names, *extra]
+        converters = self.converters()
+        # fetched before the serializer timer starts
+        rows = list(queryset.values_list(*self.sources, *extra))
+
+        with timed('serialize'):
+            if not converters:
+                return [dict(zip(names, row)) for row in rows]
+
+            data = []
+            for row in rows:
+                row = list(row)
+                for index, mapper in converters:
+                    row[index] = mapper(row[index])
+                data.append(dict(zip(names, row)))
+
+        return data
+
+
 class CreateUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -126,4 +233,9 @@ class LoginSerializer(serializers.Serializer):
         user = authenticate(**data)
         if user and user.is_active:
             return user
-        raise serializers.ValidationError("Invalid Details.")
\ No newline at end of file
+        raise serializers.ValidationError("Invalid Details.")
+
+
+transaction_values = ValuesSerializer(TransactionSerializer)
+budget_values = ValuesSerializer(BudgetSerializer)
+pot_values = ValuesSerializer(PotSerializer)
\ No newline at end of file
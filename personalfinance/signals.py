@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+from knox.models import AuthToken
+
+from .archive import remove_user_archive
+from .authentication import evict_tokens
+from .cache import DATA_SCOPES, bump_data_version
+from .models import Budget, Pot, Transaction
+from .partitions import roll_partitions_forward
+from .recurring import detect_user_series, normalize_name
+from .search import FTS_TABLE, install_search_index
+from .spending import update_spending_rollups
+
+
+# keep the monthly spending rollups in sync with transaction writes
+@receiver(pre_save, sender=Transaction)
+def remember_rollup_row(sender, instance, raw=False, **kwargs):
+    # values the row had before an update
+    instance._rollup_row = None
+    instance._was_recurring = False
+    instance._series_group = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+
+    row = (
+        Transaction.objects
+        .filter(pk=instance.pk)
+        .values_list('user_id', 'category', 'date', 'amount', 'recurring', 'name', 'series_id')
+        .first()
+    )
+    if row:
+        instance._rollup_row = row[:4]
+        instance._was_recurring = row[4] or row[6] is not None
+        instance._series_group = (normalize_name(row[5]), row[3])
+
+
+@receiver(post_save, sender=Transaction)
+def add_rollup_row(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    previous = getattr(instance, '_rollup_row', None)
+    if previous:
+        update_spending_rollups([previous], sign=-1)
+
+    update_spending_rollups([(instance.user_id, instance.category, instance.date, instance.amount)])
+
+
+@receiver(post_delete, sender=Transaction)
+def remove_rollup_row(sender, instance, **kwargs):
+    update_spending_rollups([(instance.user_id, instance.category, instance.date, instance.amount)], sign=-1)
+
+
+# recurring series detection of the transaction's group (and of the group it left)
+# deletes are picked up by the next detection of the series
+@receiver(post_save, sender=Transaction)
+def detect_transaction_series(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    groups = {(normalize_name(instance.name), instance.amount)}
+    previous = getattr(instance, '_series_group', None)
+    if previous:
+        groups.add(previous)
+
+    if detect_user_series(instance.user_id, groups):
+        bump_data_version(instance.user_id)
+        # linked by an update(), the saved instance still has the old series
+        instance.series_id = Transaction.objects.filter(pk=instance.pk).values_list('series_id', flat=True).first()
+
+
+# cached responses of the user are stale after any write
+@receiver(post_save, sender=Transaction)
+@receiver(post_save, sender=Budget)
+@receiver(post_save, sender=Pot)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=Budget)
+@receiver(post_delete, sender=Pot)
+def bump_user_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    # recurring responses only change with recurring transactions
+    scopes = ()
+    if sender is Transaction and (instance.recurring or instance.series_id or getattr(instance, '_was_recurring', False)):
+        scopes = DATA_SCOPES
+
+    previous = getattr(instance, '_rollup_row', None)
+    if previous:
+        bump_data_version(instance.user_id, previous[0], scopes=scopes)
+    else:
+        bump_data_version(instance.user_id, scopes=scopes)
+
+
+# a new user may reuse the id (and cached responses) of a deleted one
+@receiver(post_save, sender=get_user_model())
+def start_user_version(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        bump_data_version(instance.pk)
+
+
+# archived transactions go with their user (once the delete is committed)
+@receiver(post_delete, sender=get_user_model())
+def delete_user_archive(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: remove_user_archive(user_id))
+
+
+# cached tokens stop working on logout (the token row is deleted) and when the user changes
+@receiver(post_delete, sender=AuthToken)
+def evict_deleted_token(sender, instance, **kwargs):
+    evict_tokens(instance.digest)
+
+
+@receiver(post_save, sender=get_user_model())
+def evict_user_tokens(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+
+    evict_tokens(*AuthToken.objects.filter(user=instance).values_list('digest', flat=True))
+
+
+# migrations that remake the SQLite transaction table drop the search triggers
+@receiver(post_migrate)
+def repair_search_index(sender, using='default', **kwargs):
+    if sender.name != 'personalfinance':
+        return
+
+    conn = connections[using]
+    if conn.vendor == 'sqlite' and FTS_TABLE in conn.introspection.table_names():
+        install_search_index(conn)
+
+
+# every migrate adds the transaction partitions of the coming months (or years) on PostgreSQL
+@receiver(post_migrate)
+def add_transaction_partitions(sender, using='default', **kwargs):
+    if sender.name == 'personalfinance':
+        roll_partitions_forward(connections[using])
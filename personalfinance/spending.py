@@ -0,0 +1,224 @@
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .archive import archived_rollups, archived_spending, archived_summary
+from .cache import bump_data_version
+from .helpers import next_month, start_of_day
+from .models import MonthlySpending, Transaction
+from .query_budget import extend_query_budget
+from .recurring import RECURRING
+
+
+# most statements of a rollup write: an update, or an update and an insert in a savepoint
+ROLLUP_STATEMENTS = 4
+
+
+# first day of the month a transaction date falls in
+def month_of(date):
+    if isinstance(date, str):
+        date = parse_datetime(date)
+    if isinstance(date, datetime):
+        if timezone.is_aware(date):
+            date = timezone.localtime(date)
+        date = date.date()
+
+    return date.replace(day=1)
+
+
+# add (sign=1) or remove (sign=-1) rows of (user_id, category, date, amount) from the monthly rollups
+def update_spending_rollups(rows, sign=1):
+    # combine rows that hit the same rollup
+    deltas = {}
+    for user_id, category, date, amount in rows:
+        key = (user_id, category, month_of(date))
+        total, count = deltas.get(key, (0, 0))
+        deltas[key] = (total + sign * int(amount), count + sign)
+
+    # the query budget of the view grows with the rollups written (categories and months of the payload)
+    extend_query_budget(ROLLUP_STATEMENTS * len(deltas))
+
+    for (user_id, category, month), (total, count) in deltas.items():
+        rollup = MonthlySpending.objects.filter(user=user_id, category=category, month=month)
+
+        # atomic increment on the database side
+        if rollup.update(total=F('total') + total, count=F('count') + count):
+            if count < 0:
+                rollup.filter(count__lte=0).delete()
+            continue
+
+        # nothing to remove from (e.g. rollups already deleted with their user)
+        if count <= 0:
+            continue
+
+        try:
+            # first transaction of this category and month
+            with transaction.atomic():
+                MonthlySpending.objects.create(user_id=user_id, category=category, month=month, total=total, count=count)
+        except IntegrityError:
+            # created by a concurrent request in the meantime
+            rollup.update(total=F('total') + total, count=F('count') + count)
+
+
+# rollup values computed from the raw transaction table and the archive -> { (user_id, category, month): (total, count) }
+def compute_spending_rollups(user_ids=None):
+    transactions = Transaction.objects.all()
+    if user_ids is not None:
+        transactions = transactions.filter(user__in=user_ids)
+
+    rows = (
+        transactions
+        .annotate(month=TruncMonth('date', output_field=DateField()))
+        .values('user', 'category', 'month')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+
+    rollups = archived_rollups(user_ids)
+    for row in rows:
+        key = (row['user'], row['category'], row['month'])
+        total, count = rollups.get(key, (0, 0))
+        rollups[key] = (total + row['total'], count + row['count'])
+
+    return rollups
+
+
+# recreate the rollups of the given users (all users if None) from the raw table
+def rebuild_spending_rollups(user_ids=None, batch_size=1000):
+    expected = compute_spending_rollups(user_ids)
+
+    with transaction.atomic():
+        rollups = MonthlySpending.objects.all()
+        if user_ids is not None:
+            rollups = rollups.filter(user__in=user_ids)
+        # budget spending of these users may change
+        rebuilt_users = set(rollups.values_list('user', flat=True)) | {user_id for user_id, _, _ in expected}
+        rollups.delete()
+
+        MonthlySpending.objects.bulk_create(
+            [
+                MonthlySpending(user_id=user_id, category=category, month=month, total=total, count=count)
+                for (user_id, category, month), (total, count) in expected.items()
+            ],
+            batch_size=batch_size,
+        )
+        bump_data_version(*rebuilt_users)
+
+    return len(expected)
+
+
+# compare stored rollups with the raw table -> list of (key, stored, expected)
+def verify_spending_rollups(user_ids=None):
+    expected = compute_spending_rollups(user_ids)
+
+    rollups = MonthlySpending.objects.all()
+    if user_ids is not None:
+        rollups = rollups.filter(user__in=user_ids)
+
+    stored = {
+        (row['user'], row['category'], row['month']): (row['total'], row['count'])
+        for row in rollups.values('user', 'category', 'month', 'total', 'count')
+    }
+
+    return [
+        (key, stored.get(key), expected.get(key))
+        for key in sorted(set(stored) | set(expected), key=str)
+        if stored.get(key) != expected.get(key)
+    ]
+
+
+# split a period into whole months (read from the rollups) and the partial days around them
+# -> (first month, end month, [raw datetime ranges])
+def split_period(start, end):
+    first_month = month_of(start)
+    if start_of_day(first_month) < start:
+        first_month = next_month(first_month)
+    end_month = month_of(end)
+
+    if first_month >= end_month:
+        return None, None, [(start, end)]
+
+    raw_ranges = []
+    if start < start_of_day(first_month):
+        raw_ranges.append((start, start_of_day(first_month)))
+    if start_of_day(end_month) < end:
+        raw_ranges.append((start_of_day(end_month), end))
+
+    return first_month, end_month, raw_ranges
+
+
+# calculate budget spending -> { category: sum of transaction amounts }
+# period: optional (start, end) datetimes, end exclusive (see helpers.get_spending_period)
+def get_budget_spending(user_id, categories, period=None):
+    budget_spending = {}
+    # every budget category starts at 0 (categories without transactions)
+    for category in categories:
+        budget_spending[f'{category}'] = 0
+
+    if not budget_spending:
+        return budget_spending
+
+    rollups = MonthlySpending.objects.filter(user=user_id, category__in=list(budget_spending))
+    raw_ranges = []
+
+    if period:
+        first_month, end_month, raw_ranges = split_period(*period)
+        if first_month:
+            rollups = rollups.filter(month__gte=first_month, month__lt=end_month)
+        else:
+            rollups = None
+
+    # whole months: single grouped query over the monthly rollups of the budget categories
+    if rollups is not None:
+        totals = rollups.values('category').annotate(total=Sum('total')).order_by()
+        for row in totals:
+            budget_spending[row['category']] += row['total']
+
+    # partial months: date range aggregate on the (user, category, date) index and the archived days
+    for range_start, range_end in raw_ranges:
+        for category, total in archived_spending(user_id, budget_spending, range_start, range_end).items():
+            budget_spending[category] += total
+
+        totals = (
+            Transaction.objects
+            .filter(user=user_id, category__in=list(budget_spending), date__gte=range_start, date__lt=range_end)
+            .values('category')
+            .annotate(total=Sum('amount'))
+            .order_by()
+        )
+        for row in totals:
+            budget_spending[row['category']] += row['total']
+
+    return budget_spending
+
+
+# overview totals -> { income, expenses, recurring_bills: { total, count }, balance }
+# two aggregates served by the (user, amount) indexes instead of shipping every row, plus the archived totals
+def get_transaction_summary(user_id):
+    transactions = Transaction.objects.filter(user=user_id)
+
+    totals = transactions.aggregate(
+        income_total=Coalesce(Sum('amount', filter=Q(amount__gt=0)), 0),
+        income_count=Count('amount', filter=Q(amount__gt=0)),
+        expenses_total=Coalesce(Sum('amount', filter=Q(amount__lt=0)), 0),
+        expenses_count=Count('amount', filter=Q(amount__lt=0)),
+    )
+    recurring = transactions.filter(RECURRING).aggregate(
+        recurring_total=Coalesce(Sum('amount'), 0),
+        recurring_count=Count('amount'),
+    )
+    totals.update(recurring)
+
+    for name, value in archived_summary(user_id).items():
+        totals[name] += value
+
+    return {
+        'income': {'total': totals['income_total'], 'count': totals['income_count']},
+        'expenses': {'total': totals['expenses_total'], 'count': totals['expenses_count']},
+        'recurring_bills': {'total': totals['recurring_total'], 'count': totals['recurring_count']},
+        'balance': totals['income_total'] + totals['expenses_total'],
+    }
@@ -1 +1,511 @@
-from django.test import TestCase
\ No newline at end of file
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.db import connection
+from django.test import TestCase, override_settings
+from personalfinance.archive import archived_rollups, period_path, read_period, stage_period, staged_files, user_dir
+from personalfinance.models import Budget, MonthlySpending, Pot, RecurringSeries, Transaction
+from personalfinance.partitions import interval_of, last_period, partition_periods, partition_transactions, roll_partitions_forward
+from personalfinance.pool import ConnectionPool, PoolTimeout
+from personalfinance.recurring import RECURRING, detect_cadence, normalize_name
+from personalfinance.spending import get_budget_spending, get_transaction_summary, rebuild_spending_rollups, verify_spending_rollups
+
+from django.contrib.auth import get_user_model
+User = get_user_model()
+
+
+# monthly spending rollups
+class MonthlySpendingTest(TestCase):
+    def setUp(self):
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-07-29T11:55:29Z', amount=-10000, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Nimbus Data Storage', category='Bills', date='2024-07-21T10:05:42Z', amount=-999, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='EcoFuel Energy', category='Bills', date='2024-08-02T13:20:14Z', amount=-3500, recurring=False, user=self.test_user1)
+
+    def get_rollup(self, category, month):
+        return MonthlySpending.objects.filter(user=self.test_user1, category=category, month=month).values_list('total', 'count').first()
+
+    def test_create_adds_to_rollup(self):
+        self.assertEqual(self.get_rollup('Bills', date(2024, 7, 1)), (-10999, 2))
+        self.assertEqual(self.get_rollup('Bills', date(2024, 8, 1)), (-3500, 1))
+
+    def test_update_moves_amount_between_rollups(self):
+        transaction = Transaction.objects.get(name='EcoFuel Energy')
+        transaction.category = 'Shopping'
+        transaction.amount = -4000
+        transaction.save()
+
+        self.assertIsNone(self.get_rollup('Bills', date(2024, 8, 1)))
+        self.assertEqual(self.get_rollup('Shopping', date(2024, 8, 1)), (-4000, 1))
+
+    def test_delete_removes_from_rollup(self):
+        Transaction.objects.get(name='Nimbus Data Storage').delete()
+
+        self.assertEqual(self.get_rollup('Bills', date(2024, 7, 1)), (-10000, 1))
+
+    def test_verify_command_detects_drift(self):
+        # out of sync (queryset updates skip the rollups)
+        Transaction.objects.filter(name='EcoFuel Energy').update(amount=-100)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_spending_rollups', '--verify', stdout=StringIO())
+
+        call_command('rebuild_spending_rollups', stdout=StringIO())
+        self.assertEqual(self.get_rollup('Bills', date(2024, 8, 1)), (-100, 1))
+        call_command('rebuild_spending_rollups', '--verify', stdout=StringIO())
+
+    def test_deleting_user_removes_rollups(self):
+        self.test_user1.delete()
+
+        self.assertEqual(MonthlySpending.objects.count(), 0)
+
+
+# recurring series detection
+class RecurringSeriesTest(TestCase):
+    def setUp(self):
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+
+    def create(self, name, day, amount=-1599, user=None):
+        return Transaction.objects.create(avatar='/imgurl', name=name, category='Entertainment', date=f'{day}T09:00:00Z', amount=amount, recurring=False, user=user or self.test_user1)
+
+    def dates(self, *days):
+        return [datetime.fromisoformat(f'{day}T09:00:00+00:00') for day in days]
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name('NETFLIX.COM 0423'), 'netflix')
+        self.assertEqual(normalize_name('Netflix Inc.'), 'netflix')
+        self.assertEqual(normalize_name('  Spark  Electric '), 'spark electric')
+
+    def test_detect_cadence(self):
+        self.assertEqual(detect_cadence(self.dates('2024-07-01', '2024-07-08', '2024-07-15', '2024-07-22')), 'weekly')
+        # 28 to 31 days apart
+        self.assertEqual(detect_cadence(self.dates('2024-01-31', '2024-02-29', '2024-03-31', '2024-04-30')), 'monthly')
+        self.assertEqual(detect_cadence(self.dates('2021-03-02', '2022-03-02', '2023-03-01')), 'yearly')
+        # a missed payment
+        self.assertEqual(detect_cadence(self.dates('2024-01-05', '2024-02-05', '2024-04-05', '2024-05-05', '2024-06-05')), 'monthly')
+
+        self.assertIsNone(detect_cadence(self.dates('2024-01-05', '2024-02-05')))
+        self.assertIsNone(detect_cadence(self.dates('2024-01-05', '2024-01-19', '2024-03-30')))
+
+    def test_series_detected_on_new_transactions(self):
+        self.create('Netflix', '2024-05-03')
+        self.create('Netflix', '2024-06-03')
+        self.assertEqual(RecurringSeries.objects.count(), 0)
+
+        transaction = self.create('NETFLIX.COM 0703', '2024-07-03')
+        # same name, other amount: another group
+        self.create('Netflix', '2024-07-20', amount=-999)
+
+        series = RecurringSeries.objects.get()
+        self.assertEqual((series.cadence, series.amount, series.occurrences), ('monthly', -1599, 3))
+        self.assertEqual(series.name, 'NETFLIX.COM 0703')
+        self.assertEqual(series.next_date, date(2024, 8, 3))
+        self.assertEqual(transaction.series_id, series.id)
+        self.assertEqual(series.transactions.count(), 3)
+
+        self.create('Netflix', '2024-08-03')
+        series.refresh_from_db()
+        self.assertEqual((series.occurrences, series.next_date), (4, date(2024, 9, 3)))
+
+    def test_series_removed_when_rows_leave_it(self):
+        for day in ('2024-05-03', '2024-06-03', '2024-07-03'):
+            transaction = self.create('Netflix', day)
+
+        transaction.amount = -1799
+        transaction.save()
+
+        self.assertEqual(RecurringSeries.objects.count(), 0)
+        self.assertFalse(Transaction.objects.filter(series__isnull=False).exists())
+
+    # the partial index covers the rows of detected series as well as the flagged ones
+    def test_recurring_bills_use_recurring_index(self):
+        plan = Transaction.objects.filter(RECURRING, user=self.test_user1, amount__lt=0).explain()
+        self.assertIn('transaction_user_recurring_idx', plan)
+
+    def test_detect_command(self):
+        test_user2 = User.objects.create_user(username='testuser2', password='1X<ISRUkw+tuK')
+
+        # bulk inserts skip the signals
+        Transaction.objects.bulk_create([
+            Transaction(avatar='/imgurl', name=name, category='Bills', date=f'{day}T09:00:00Z', amount=amount, user=user)
+            for user in (self.test_user1, test_user2)
+            for name, amount, days in (
+                ('Spark Electric', -9500, ('2024-04-12', '2024-05-13', '2024-06-12', '2024-07-11')),
+                ('Gym Weekly', -800, ('2024-07-01', '2024-07-08', '2024-07-15')),
+                ('Corner Shop', -350, ('2024-07-02', '2024-07-05', '2024-07-25')),
+            )
+            for day in days
+        ])
+
+        out = StringIO()
+        call_command('detect_recurring_series', '--chunk-size', '4', stdout=out)
+        self.assertIn('Checked 2 users', out.getvalue())
+        self.assertIn('2 with changed series', out.getvalue())
+
+        self.assertEqual(
+            sorted(RecurringSeries.objects.filter(user=test_user2).values_list('name', 'cadence', 'occurrences')),
+            [('Gym Weekly', 'weekly', 3), ('Spark Electric', 'monthly', 4)],
+        )
+        self.assertEqual(Transaction.objects.filter(series__isnull=False).count(), 14)
+        self.assertFalse(Transaction.objects.filter(name='Corner Shop', series__isnull=False).exists())
+
+        # nothing left to change
+        out = StringIO()
+        call_command('detect_recurring_series', '--user', str(test_user2.id), stdout=out)
+        self.assertIn('Checked 1 users', out.getvalue())
+        self.assertIn('0 with changed series', out.getvalue())
+
+
+# columnar archive of old transactions
+class ArchiveTest(TestCase):
+    def setUp(self):
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+        archive_settings = override_settings(PERSONALFINANCE_ARCHIVE_DIR=archive_dir)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2022-03-10T11:55:29Z', amount=-1000, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Savory Bites Bistro', category='Dining Out', date='2022-03-20T19:10:00Z', amount=-2500, recurring=False, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Salary', category='General', date='2022-11-05T08:00:00Z', amount=50000, recurring=False, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2023-01-15T11:55:29Z', amount=-1200, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='EcoFuel Energy', category='Bills', date='2024-07-02T13:20:14Z', amount=-3000, recurring=False, user=self.test_user1)
+
+    # the files are promoted once the delete is committed
+    def archive(self, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_transactions', *args, stdout=StringIO())
+
+    def spending(self):
+        # partial months are read from the raw rows
+        period = (datetime(2022, 3, 15, tzinfo=timezone.utc), datetime(2023, 1, 20, tzinfo=timezone.utc))
+        return get_budget_spending(self.test_user1.id, ['Bills', 'Dining Out', 'General'], period)
+
+    def test_archive_moves_old_transactions(self):
+        summary = get_transaction_summary(self.test_user1.id)
+        spending = self.spending()
+        rows = list(Transaction.objects.filter(date__lt=datetime(2024, 1, 1, tzinfo=timezone.utc)).order_by('date').values_list('id', 'name', 'date', 'amount', 'recurring'))
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('archive_transactions', '--before', '2024-01-15', stdout=out)
+        self.assertIn('Archived 4 transactions before 2024-01-01 of 1 users into 2 files', out.getvalue())
+
+        self.assertEqual(list(Transaction.objects.values_list('name', flat=True)), ['EcoFuel Energy'])
+        self.assertTrue(os.path.exists(period_path(self.test_user1.id, 2022)))
+        self.assertEqual(
+            [(row[0], row[2], row[4], row[5], row[6]) for row in read_period(self.test_user1.id, 2022) + read_period(self.test_user1.id, 2023)],
+            rows,
+        )
+
+        # totals read the archive too
+        self.assertEqual(get_transaction_summary(self.test_user1.id), summary)
+        self.assertEqual(self.spending(), spending)
+        self.assertEqual(spending, {'Bills': -1200, 'Dining Out': -2500, 'General': 50000})
+
+        # rollups rebuilt from the hot table and the archive
+        self.assertEqual(archived_rollups()[(self.test_user1.id, 'Bills', date(2022, 3, 1))], (-1000, 1))
+        self.assertEqual(verify_spending_rollups(), [])
+        rebuild_spending_rollups()
+        self.assertEqual(verify_spending_rollups(), [])
+        self.assertEqual(self.spending(), spending)
+
+    def test_archive_runs_merge(self):
+        self.archive('--before', '2023-01-01')
+        self.assertEqual(len(read_period(self.test_user1.id, 2022)), 3)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+        # added after the first run
+        Transaction.objects.create(avatar='/imgurl', name='Late Entry', category='Bills', date='2022-12-30T10:00:00Z', amount=-700, recurring=False, user=self.test_user1)
+        summary = get_transaction_summary(self.test_user1.id)
+        self.assertEqual(summary['expenses'], {'total': -8400, 'count': 5})
+
+        self.archive('--before', '2024-01-15', '--user', str(self.test_user1.id))
+        self.assertEqual([row[2] for row in read_period(self.test_user1.id, 2022)], ['Aqua Flow Utilities', 'Savory Bites Bistro', 'Salary', 'Late Entry'])
+        self.assertEqual(get_transaction_summary(self.test_user1.id), summary)
+        self.assertEqual(verify_spending_rollups(), [])
+
+    def test_archive_nothing_to_move(self):
+        out = StringIO()
+        call_command('archive_transactions', '--before', '2020-01-01', stdout=out)
+        self.assertIn('Archived 0 transactions', out.getvalue())
+        self.assertEqual(Transaction.objects.count(), 5)
+
+        with self.assertRaises(CommandError):
+            call_command('archive_transactions', '--before', '2024-13-01', stdout=StringIO())
+
+    # the files are the only copy of the archived rows
+    def test_archive_needs_archive_dir(self):
+        for archive_dir in ('', os.path.join(tempfile.gettempdir(), 'missing-personalfinance-archive')):
+            with override_settings(PERSONALFINANCE_ARCHIVE_DIR=archive_dir), self.assertRaises(CommandError):
+                call_command('archive_transactions', '--before', '2024-01-15', stdout=StringIO())
+
+        self.assertEqual(Transaction.objects.count(), 5)
+
+    def test_files_replaced_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            call_command('archive_transactions', '--before', '2024-01-15', stdout=StringIO())
+
+        # a failed commit would leave the rows in the table only
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(read_period(self.test_user1.id, 2022), [])
+        self.assertEqual(
+            [path for path, temporary in staged_files()],
+            [period_path(self.test_user1.id, 2022), period_path(self.test_user1.id, 2023)],
+        )
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(read_period(self.test_user1.id, 2022)), 3)
+        self.assertEqual(staged_files(), [])
+
+    # the rows are deleted, the staged files are their only copy: the command stops and the next run recovers them
+    def test_failed_promote_is_recovered(self):
+        with mock.patch('personalfinance.management.commands.archive_transactions.os.replace', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError), self.captureOnCommitCallbacks(execute=True):
+                call_command('archive_transactions', '--before', '2024-01-15', stdout=StringIO())
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(len(staged_files()), 2)
+
+        # a new run would stage over them from the old files
+        with self.assertRaises(CommandError):
+            call_command('archive_transactions', '--before', '2024-01-15', stdout=StringIO())
+
+        out = StringIO()
+        call_command('archive_transactions', '--before', '2024-01-15', '--recover', stdout=out)
+        self.assertIn('Recovered', out.getvalue())
+        self.assertEqual(staged_files(), [])
+        self.assertEqual(len(read_period(self.test_user1.id, 2022)), 3)
+        self.assertEqual(len(read_period(self.test_user1.id, 2023)), 1)
+
+    # staged by a run that stopped before its delete: the rows are still in the table
+    def test_unused_staged_file_is_removed(self):
+        rows = list(Transaction.objects.filter(date__year=2022).values_list('id', 'avatar', 'name', 'category', 'date', 'amount', 'recurring', 'series'))
+        temporary = stage_period(period_path(self.test_user1.id, 2022), rows)
+
+        out = StringIO()
+        call_command('archive_transactions', '--before', '2020-01-01', '--recover', stdout=out)
+        self.assertIn('Removed', out.getvalue())
+        self.assertFalse(os.path.exists(temporary))
+        self.assertEqual(read_period(self.test_user1.id, 2022), [])
+        self.assertEqual(Transaction.objects.count(), 5)
+
+    # series ids are not archived (detection recreates series from the hot rows), their rows stay recurring
+    def test_archived_series_rows_are_recurring(self):
+        for month in (4, 5, 6):
+            Transaction.objects.create(avatar='/imgurl', name='Netflix', category='Entertainment', date=f'2022-0{month}-15T10:00:00Z', amount=-1599, recurring=False, user=self.test_user1)
+        self.assertEqual(Transaction.objects.filter(series__isnull=False).count(), 3)
+        summary = get_transaction_summary(self.test_user1.id)
+
+        self.archive('--before', '2023-01-01')
+        netflix = [row for row in read_period(self.test_user1.id, 2022) if row[2] == 'Netflix']
+        self.assertEqual([(row[6], row[7]) for row in netflix], [(True, None)] * 3)
+        self.assertEqual(get_transaction_summary(self.test_user1.id), summary)
+
+    def test_deleting_user_removes_archive(self):
+        self.archive('--before', '2024-01-15')
+        self.assertTrue(os.path.isdir(user_dir(self.test_user1.id)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_user1.delete()
+
+        self.assertFalse(os.path.exists(user_dir(self.test_user1.id)))
+
+
+# date range partitions of the transaction table (PostgreSQL only)
+class TransactionPartitionTest(TestCase):
+    def test_partition_periods(self):
+        self.assertEqual(
+            [(name, start, end) for name, start, end in partition_periods(date(2024, 11, 15), date(2025, 1, 1), 'month')],
+            [
+                ('personalfinance_transaction_2024_11', date(2024, 11, 1), date(2024, 12, 1)),
+                ('personalfinance_transaction_2024_12', date(2024, 12, 1), date(2025, 1, 1)),
+                ('personalfinance_transaction_2025_01', date(2025, 1, 1), date(2025, 2, 1)),
+            ],
+        )
+        self.assertEqual(
+            [name for name, start, end in partition_periods(date(2023, 6, 1), date(2024, 1, 1), 'year')],
+            ['personalfinance_transaction_2023', 'personalfinance_transaction_2024'],
+        )
+
+        self.assertEqual(last_period(date(2024, 11, 15), 'month', 3), date(2025, 2, 1))
+        self.assertEqual(last_period(date(2024, 11, 15), 'year', 1), date(2025, 1, 1))
+
+    def test_interval_of(self):
+        self.assertEqual(interval_of(['personalfinance_transaction_default', 'personalfinance_transaction_2024_07']), 'month')
+        self.assertEqual(interval_of(['personalfinance_transaction_default', 'personalfinance_transaction_2024']), 'year')
+        self.assertIsNone(interval_of(['personalfinance_transaction_default']))
+
+    @override_settings(PERSONALFINANCE_TRANSACTION_PARTITIONS='month')
+    def test_sqlite_is_not_partitioned(self):
+        self.assertFalse(partition_transactions(connection))
+        self.assertEqual(roll_partitions_forward(connection), [])
+
+        with self.assertRaises(CommandError):
+            call_command('create_partitions', stdout=StringIO())
+
+
+# in-process connection pool (fake connections, the backend needs PostgreSQL)
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.usable = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(TestCase):
+    def make_pool(self, **options):
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        return ConnectionPool(connect, check=lambda connection: connection.usable, name='test', **options)
+
+    def test_connections_are_reused(self):
+        pool = self.make_pool(max_size=2)
+
+        first = pool.get()
+        pool.put(first)
+        self.assertIs(pool.get(), first)
+        second = pool.get()
+
+        self.assertEqual(len(self.opened), 2)
+        stats = pool.stats()
+        self.assertEqual((stats['in_use'], stats['checkouts'], stats['created'], stats['saturation']), (2, 3, 2, 1.0))
+
+    def test_checkout_waits_and_times_out(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        connection = pool.get()
+
+        with self.assertLogs('personalfinance.pool', 'ERROR'), self.assertRaises(PoolTimeout):
+            pool.get()
+        self.assertEqual((pool.stats()['waits'], pool.stats()['timeouts']), (1, 1))
+
+        # released by another thread while waiting
+        pool.timeout = 5
+        threading.Timer(0.05, pool.put, [connection]).start()
+        self.assertIs(pool.get(), connection)
+        self.assertEqual(pool.stats()['waits'], 2)
+
+    def test_broken_connections_are_replaced(self):
+        pool = self.make_pool(check_after=0)
+
+        connection = pool.get()
+        pool.put(connection)
+        connection.usable = False
+        time.sleep(0.01)
+        replacement = pool.get()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+
+        # errors in the request
+        pool.put(replacement, reusable=False)
+        self.assertTrue(replacement.closed)
+        self.assertEqual((pool.stats()['size'], pool.stats()['discarded']), (0, 2))
+
+    # more failed checks in a row than the recursion limit (the database restarted under a large pool)
+    def test_many_broken_connections_are_replaced(self):
+        pool = self.make_pool(max_size=1500, check_after=0)
+
+        connections = [pool.get() for _ in range(1500)]
+        for connection in connections:
+            pool.put(connection)
+            connection.usable = False
+        time.sleep(0.01)
+
+        replacement = pool.get()
+        self.assertNotIn(replacement, connections)
+        self.assertEqual((pool.stats()['failed_checks'], pool.stats()['size']), (1500, 1))
+
+    def test_reset_failure_discards_connection(self):
+        pool = self.make_pool()
+
+        def reset(connection):
+            raise RuntimeError('server closed the connection')
+
+        pool.reset = reset
+        connection = pool.get()
+        pool.put(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['idle'], 0)
+
+    def test_idle_and_old_connections_are_closed(self):
+        pool = self.make_pool(max_idle=0.01)
+        connection = pool.get()
+        pool.put(connection)
+        time.sleep(0.02)
+        self.assertIsNot(pool.get(), connection)
+        self.assertTrue(connection.closed)
+
+        pool = self.make_pool(max_lifetime=0)
+        connection = pool.get()
+        time.sleep(0.01)
+        pool.put(connection)
+        self.assertTrue(connection.closed)
+
+    def test_concurrent_checkouts_stay_within_max_size(self):
+        pool = self.make_pool(max_size=3)
+        errors = []
+
+        def work():
+            try:
+                for _ in range(20):
+                    connection = pool.get()
+                    time.sleep(0.001)
+                    pool.put(connection)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = pool.stats()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(self.opened), 3)
+        self.assertEqual((stats['checkouts'], stats['in_use'], stats['peak_in_use']), (160, 0, 3))
+
+        pool.close()
+        self.assertTrue(all(connection.closed for connection in self.opened))
+
+
+# seeded benchmark data
+class SeedDataTest(TestCase):
+    def test_seed_data_command(self):
+        call_command('seed_data', '--users', '2', '--transactions', '50', '--budgets', '3', '--pots', '2', '--password', 'seed-password', stdout=StringIO())
+
+        users = User.objects.filter(username__startswith='seed-user-').order_by('username')
+        self.assertEqual([user.username for user in users], ['seed-user-0', 'seed-user-1'])
+        self.assertTrue(users[0].check_password('seed-password'))
+
+        for user in users:
+            self.assertEqual(Transaction.objects.filter(user=user).count(), 50)
+            self.assertEqual(Budget.objects.filter(user=user).values('category').distinct().count(), 3)
+            self.assertEqual(Pot.objects.filter(user=user).count(), 2)
+        self.assertFalse(Pot.objects.filter(total__gt=F('target')).exists())
+
+        # bulk inserts, rollups rebuilt afterwards
+        self.assertEqual(verify_spending_rollups([user.id for user in users]), [])
+
+        # same prefix twice
+        with self.assertRaises(CommandError):
+            call_command('seed_data', '--users', '1', stdout=StringIO())
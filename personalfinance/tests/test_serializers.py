@@ -1 +1,48 @@
-from django.test import TestCase
\ No newline at end of file
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from personalfinance.models import Budget, Transaction, Pot
+from personalfinance.serializers import (
+    BudgetSerializer, PotSerializer, TransactionSerializer, budget_values, pot_values, transaction_values
+)
+
+from django.contrib.auth import get_user_model
+User = get_user_model()
+
+
+# values serializers -> same json as the model serializers
+class ValuesSerializerTest(TestCase):
+    def setUp(self):
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+
+        Transaction.objects.create(avatar='/imgurl', name='James Thompson', category='General', date='2024-07-12T13:40:46Z', amount=10000, recurring=False, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow "Utilities" é', category='Bills', date='2024-07-29T11:55:29.123456Z', amount=-10000, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Nimbus Data Storage', category='Bills', date='2024-07-31T23:30:00+02:00', amount=-999, recurring=True, user=self.test_user1)
+        Budget.objects.create(category='Bills', maximum=70000.5, theme='#626070', user=self.test_user1)
+        Budget.objects.create(category='Shopping', maximum=0, theme='#277C78', user=self.test_user1)
+        Pot.objects.create(name='Savings', target=200000, total=15000, theme='#277C78', user=self.test_user1)
+
+    def assertSameJSON(self, values, serializer_class, queryset):
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(values.serialize(queryset)),
+            renderer.render(serializer_class(queryset, many=True).data),
+        )
+
+    def test_transactions(self):
+        transactions = Transaction.objects.order_by('-date', '-id')
+        self.assertSameJSON(transaction_values, TransactionSerializer, transactions.all())
+        self.assertSameJSON(transaction_values, TransactionSerializer, transactions.all()[:2])
+        self.assertSameJSON(transaction_values, TransactionSerializer, transactions.filter(amount__gt=10000))
+
+    def test_transactions_in_other_timezone(self):
+        with timezone.override('America/New_York'):
+            self.assertSameJSON(transaction_values, TransactionSerializer, Transaction.objects.order_by('id'))
+
+    def test_budgets_and_pots(self):
+        self.assertSameJSON(budget_values, BudgetSerializer, Budget.objects.order_by('id'))
+        self.assertSameJSON(pot_values, PotSerializer, Pot.objects.order_by('id'))
+
+    def test_write_only_fields_are_left_out(self):
+        self.assertEqual(transaction_values.names, ['id', 'avatar', 'name', 'category', 'date', 'amount', 'recurring', 'series'])
+        self.assertNotIn('user', pot_values.names)
@@ -1,6 +1,38 @@
-from django.test import TestCase
-from rest_framework.test import APIClient
+import csv
+import json
+import shutil
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+from django.test import AsyncRequestFactory, Client, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from knox.models import AuthToken
+from rest_framework.test import APIClient, APIRequestFactory
+from personalfinance import urls
+from personalfinance.async_views import AsyncBudgetListView, AsyncIndexView, AsyncPotListView, AsyncTransactionListView
+from personalfinance.benchmarks import seed_users
+from personalfinance.cache import get_cache_stats
+from personalfinance.management.commands.benchmark_routes import PASSWORD as BENCHMARK_PASSWORD, route_requests, send
+from personalfinance.pots import PotError, move_pot_total
+from personalfinance.query_budget import QueryBudgetExceeded, query_budget
+from personalfinance.recurring import detect_user_series
+from personalfinance.routers import ReplicaRouter, pin_key, pin_to_primary, reads_for_user
 from personalfinance.models import Budget, Transaction, Pot
+from personalfinance.serializers import TransactionSerializer
+from personalfinance.search import FTS_TABLE, SQLiteFTSSearchBackend, get_search_backend
+from personalfinance.views import IndexView
 
 from django.contrib.auth import get_user_model
 User = get_user_model()
@@ -39,7 +71,7 @@ class IndexViewTest(TestCase):
         client = APIClient()
         client.force_authenticate(self.test_user1)
         
-        response = client.get('/finance-api/overview')
+        response = client.get('/finance-api/overview?from=2024-07-01&to=2024-07-31')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data), 7)
         self.assertEqual(len(response.data['budgets']), 3)
@@ -50,6 +82,57 @@ class IndexViewTest(TestCase):
         self.assertEqual(len(response.data['recurring_bills']), 2)
         self.assertEqual(response.data['budget_spending']['Shopping'], -3500)
         self.assertEqual(response.data['budget_spending']['Bills'], -10999)             
+        # budget without transactions
+        self.assertEqual(response.data['budget_spending']['Entertainment'], 0)
+
+    def test_budget_spending_ignores_other_users(self):
+        test_user2 = User.objects.create_user(username='testuser2', password='1X<ISRUkw+tuK')
+        Transaction.objects.create(avatar='/imgurl', name='EcoFuel Energy', category='Shopping', date='2024-07-30T13:20:14Z', amount=-5000, recurring=False, user=test_user2)
+
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/overview?from=2024-07-01&to=2024-07-31')
+        self.assertEqual(response.data['budget_spending']['Shopping'], -3500)
+
+    def test_get_summary(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/overview?summary=1&from=2024-07-01&to=2024-07-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary'], {
+            'income': {'total': 10000, 'count': 1},
+            'expenses': {'total': -14499, 'count': 3},
+            'recurring_bills': {'total': -10999, 'count': 2},
+            'balance': -4499,
+        })
+        self.assertEqual(len(response.data['recent_transactions']), 4)
+        self.assertEqual(len(response.data['pots']), 1)
+        self.assertEqual(response.data['budget_spending']['Bills'], -10999)
+        # no full lists
+        self.assertNotIn('income', response.data)
+        self.assertNotIn('expenses', response.data)
+        self.assertNotIn('recurring_bills', response.data)
+
+    def test_get_summary_with_lists(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/overview?summary=true&include=expenses,recurring_bills,unknown')
+        self.assertEqual(len(response.data['expenses']), 3)
+        self.assertEqual(len(response.data['recurring_bills']), 2)
+        self.assertNotIn('income', response.data)
+
+    def test_get_summary_without_transactions(self):
+        test_user2 = User.objects.create_user(username='testuser2', password='1X<ISRUkw+tuK')
+
+        client = APIClient()
+        client.force_authenticate(test_user2)
+
+        response = client.get('/finance-api/overview?summary=1')
+        self.assertEqual(response.data['summary']['balance'], 0)
+        self.assertEqual(response.data['summary']['income'], {'total': 0, 'count': 0})
 
 # budget list view
 class BudgetListViewTest(TestCase):
@@ -83,6 +166,17 @@ class BudgetListViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data), 2)
 
+    def test_get_budget_spending(self):
+        Transaction.objects.create(avatar='/imgurl', name='Pixel Playground', category='Entertainment', date='2024-07-11T18:45:38Z', amount=-1000, recurring=False, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Cinema', category='Entertainment', date='2024-07-14T18:45:38Z', amount=-1500, recurring=False, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Savory Bites Bistro', category='Dining Out', date='2024-07-15T18:45:38Z', amount=-5500, recurring=False, user=self.test_user1)
+
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/budgets?from=2024-07-01&to=2024-07-31')
+        self.assertEqual(response.data['budget_spending'], {'Entertainment': -2500, 'Personal care': 0})
+
 
     # post -> create new budget
     def test_post_with_invalid_data(self):
@@ -282,9 +376,43 @@ class NewBudgetSpendingViewTest(TestCase):
         client = APIClient()
         client.force_authenticate(self.test_user1)
 
-        response = client.get('/finance-api/budgets/new/Bills')
+        response = client.get('/finance-api/budgets/new/Bills?from=2024-07-01&to=2024-07-31')
         self.assertEqual(response.data['Bills'], -24049)      
 
+    # spending period
+    def test_defaults_to_current_month(self):
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date=timezone.now(), amount=-100, recurring=True, user=self.test_user1)
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/budgets/new/Bills')
+        self.assertEqual(response.data['Bills'], -100)
+
+    def test_partial_month_period(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/budgets/new/Bills?from=2024-07-21&to=2024-07-29')
+        self.assertEqual(response.data['Bills'], -10999)
+
+    def test_period_across_months(self):
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-06-29T11:55:29Z', amount=-100, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-08-29T11:55:29Z', amount=-200, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-09-01T11:55:29Z', amount=-400, recurring=True, user=self.test_user1)
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/budgets/new/Bills?from=2024-06-15&to=2024-08-31')
+        self.assertEqual(response.data['Bills'], -24349)
+
+    def test_invalid_period(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/budgets/new/Bills?from=2024-07-31&to=2024-07-01')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Please enter a valid date range')
+
 
 # pot list view
 class PotListViewTest(TestCase):
@@ -352,7 +480,627 @@ class PotListViewTest(TestCase):
         self.assertEqual(response.status_code, 201)
 
 
+# cached overview, budgets, pots and recurring responses (one process in the tests)
+@override_settings(PERSONALFINANCE_RESPONSE_CACHE=True)
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.test_user2 = User.objects.create_user(username='testuser2', password='1X<ISRUkw+tuK')
+
+        Pot.objects.create(name='Savings', target=200000, total=15000, theme='#277C78', user=self.test_user1)
+        Budget.objects.create(category='Bills', maximum=70000, theme='#626070', user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-07-29T11:55:29Z', amount=-10000, recurring=True, user=self.test_user1)
+
+    def test_second_request_is_cached(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        for url in ['/finance-api/overview', '/finance-api/budgets', '/finance-api/pots', '/finance-api/transactions/recurring']:
+            first = client.get(url)
+            self.assertEqual(first['X-Cache'], 'MISS')
+
+            with self.assertNumQueries(0):
+                second = client.get(url)
+            self.assertEqual(second['X-Cache'], 'HIT')
+            self.assertEqual(second.data, first.data)
+
+        self.assertEqual(get_cache_stats(), {'hits': 4, 'misses': 4, 'hit_ratio': 0.5})
+
+    def test_query_params_are_part_of_the_key(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        client.get('/finance-api/budgets?from=2024-07-01&to=2024-07-31')
+        response = client.get('/finance-api/budgets')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['budget_spending']['Bills'], 0)
+
+        response = client.get('/finance-api/budgets?from=2024-07-01&to=2024-07-31')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['budget_spending']['Bills'], -10000)
+
+    def test_writes_invalidate(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        client.get('/finance-api/pots')
+        client.put('/finance-api/pots/add/1', {'amount': 10})
+        response = client.get('/finance-api/pots')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data[0]['total'], 16000)
+
+        client.get('/finance-api/transactions/recurring')
+        client.delete('/finance-api/transactions/1')
+        response = client.get('/finance-api/transactions/recurring')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data), 0)
+
+        client.get('/finance-api/budgets')
+        Budget.objects.get(id=1).delete()
+        response = client.get('/finance-api/budgets')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['budgets']), 0)
+
+    def test_import_invalidates(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        client.get('/finance-api/transactions/recurring')
+        upload = SimpleUploadedFile('statement.csv', b'avatar,name,category,date,amount,recurring\n/imgurl,EcoFuel Energy,Bills,2024-07-30T13:20:14Z,-35,true\n')
+        client.post('/finance-api/transactions/import', {'file': upload})
+
+        response = client.get('/finance-api/transactions/recurring')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data), 2)
+
+    def test_users_are_cached_separately(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+        client.get('/finance-api/pots')
+
+        client.force_authenticate(self.test_user2)
+        response = client.get('/finance-api/pots')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data), 0)
+
+        # other users' writes keep the cache
+        Pot.objects.create(name='Gift', target=15000, total=11000, theme='#82C9D7', user=self.test_user2)
+        client.force_authenticate(self.test_user1)
+        self.assertEqual(client.get('/finance-api/pots')['X-Cache'], 'HIT')
+
+    def test_errors_are_not_cached(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        client.get('/finance-api/budgets?from=2024-08-01&to=2024-07-01')
+        response = client.get('/finance-api/budgets?from=2024-08-01&to=2024-07-01')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+
+# every worker process has its own local memory cache (the test settings): a write bumps the data version
+# in the cache of its worker only
+class PerProcessCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.pot = Pot.objects.create(name='Savings', target=200000, total=15000, theme='#277C78', user=self.test_user1)
+
+    def test_write_in_another_worker(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+        etag = client.get('/finance-api/pots').get('ETag')
+
+        other_worker = LocMemCache('other-worker', {})
+        with mock.patch('personalfinance.cache.cache', other_worker), mock.patch('personalfinance.routers.cache', other_worker):
+            client.put(f'/finance-api/pots/add/{self.pot.id}', {'amount': 10})
+
+        response = client.get('/finance-api/pots', HTTP_IF_NONE_MATCH=etag or '*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['total'], 16000)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('X-Cache', response)
+
+
+# etag / last-modified on read endpoints
+@override_settings(PERSONALFINANCE_RESPONSE_CACHE=True)
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.test_user2 = User.objects.create_user(username='testuser2', password='1X<ISRUkw+tuK')
+
+        Pot.objects.create(name='Savings', target=200000, total=15000, theme='#277C78', user=self.test_user1)
+        Budget.objects.create(category='Bills', maximum=70000, theme='#626070', user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-07-29T11:55:29Z', amount=-10000, recurring=True, user=self.test_user1)
+
+    def test_if_none_match_returns_304_without_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        urls = [
+            '/finance-api/overview', '/finance-api/budgets', '/finance-api/budgets/1', '/finance-api/budgets/Bills',
+            '/finance-api/budgets/new/Bills', '/finance-api/pots', '/finance-api/pots/1',
+            '/finance-api/transactions/recurring', '/finance-api/transactions/empty/All/Latest/1',
+            '/finance-api/transactions/search/aqua/Latest/1', '/finance-api/transactions/export/csv/empty/All/Latest',
+        ]
+        for url in urls:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Cache-Control'], 'private, no-cache')
+            self.assertIn('Last-Modified', response)
+
+            with self.assertNumQueries(0):
+                response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+    def test_write_changes_etag(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        etag = client.get('/finance-api/pots')['ETag']
+        client.put('/finance-api/pots/add/1', {'amount': 10})
+
+        response = client.get('/finance-api/pots', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[0]['total'], 16000)
+
+    def test_etag_depends_on_url_and_user(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        etag = client.get('/finance-api/transactions/empty/All/Latest/1')['ETag']
+        self.assertNotEqual(client.get('/finance-api/transactions/empty/All/Oldest/1')['ETag'], etag)
+        self.assertNotEqual(client.get('/finance-api/transactions/empty/All/Latest/1?count=capped')['ETag'], etag)
+
+        client.force_authenticate(self.test_user2)
+        response = client.get('/finance-api/transactions/empty/All/Latest/1', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_modified_since(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        last_modified = client.get('/finance-api/budgets')['Last-Modified']
+        self.assertEqual(client.get('/finance-api/budgets', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(client.get('/finance-api/budgets', HTTP_IF_MODIFIED_SINCE='Mon, 01 Jan 2024 00:00:00 GMT').status_code, 200)
+        # If-None-Match wins
+        response = client.get('/finance-api/budgets', HTTP_IF_MODIFIED_SINCE=last_modified, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_errors_have_no_etag(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/budgets/100')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response)
+
+
+# token authentication with cached tokens
+@override_settings(PERSONALFINANCE_AUTH_CACHE=True)
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.auth_token, self.token = AuthToken.objects.create(self.test_user1)
+
+        Budget.objects.create(category='Bills', maximum=70000, theme='#626070', user=self.test_user1)
+
+    def test_second_request_skips_token_queries(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+        # token, user, other tokens of the user, budget
+        with self.assertNumQueries(4):
+            response = client.get('/finance-api/budgets/1')
+        self.assertEqual(response.status_code, 200)
+
+        # budget only
+        with self.assertNumQueries(1):
+            response = client.get('/finance-api/budgets/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['category'], 'Bills')
+
+    # local memory cache of each worker process: logouts couldn't evict the tokens of the others
+    @override_settings(PERSONALFINANCE_AUTH_CACHE=False)
+    def test_not_cached_without_shared_cache(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+        client.get('/finance-api/budgets/1')
+        with self.assertNumQueries(4):
+            response = client.get('/finance-api/budgets/1')
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token[:-1]}x')
+
+        self.assertEqual(client.get('/finance-api/budgets/1').status_code, 401)
+
+        client.credentials(HTTP_AUTHORIZATION='Token not-hex')
+        self.assertEqual(client.get('/finance-api/budgets/1').status_code, 401)
+
+    def test_logout_evicts_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        client.get('/finance-api/budgets/1')
+
+        response = client.post('/finance-api/logout')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(client.get('/finance-api/budgets/1').status_code, 401)
+
+    def test_inactive_user_is_evicted(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        client.get('/finance-api/budgets/1')
+
+        self.test_user1.is_active = False
+        self.test_user1.save()
+        self.assertEqual(client.get('/finance-api/budgets/1').status_code, 401)
+
+    def test_expired_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        client.get('/finance-api/budgets/1')
+
+        with mock.patch('django.utils.timezone.now', return_value=self.auth_token.expiry + timedelta(seconds=1)):
+            self.assertEqual(client.get('/finance-api/budgets/1').status_code, 401)
+        self.assertFalse(AuthToken.objects.filter(digest=self.auth_token.digest).exists())
+
+
 # pot detail view
+# query budgets of every view method, pinned on a user with realistic data
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_user1 = seed_users(1, transactions=1000, prefix='testuser', password=BENCHMARK_PASSWORD)[0]
+
+    def test_every_view_method_has_a_budget(self):
+        for pattern in urls.urlpatterns:
+            view_class = pattern.callback.view_class
+            for method in ('get', 'post', 'put', 'delete'):
+                if hasattr(view_class, method):
+                    self.assertTrue(hasattr(getattr(view_class, method), 'query_budget'), f'{view_class.__name__}.{method}')
+
+    def test_every_route_within_budget(self):
+        token = AuthToken.objects.create(self.test_user1)[1]
+        client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+
+        # over budget raises QueryBudgetExceeded (strict in tests)
+        for pattern, requests in route_requests(self.test_user1).items():
+            for method, path, kwargs in requests:
+                with transaction.atomic():
+                    response = send(client, method, path, kwargs)
+                    transaction.set_rollback(True)
+
+                self.assertLess(response.status_code, 400, f'{method} {path}')
+
+    def test_query_per_row_goes_over_budget(self):
+        view = NPlusOneView()
+        request = APIRequestFactory().get('/finance-api/budgets')
+
+        with self.assertRaises(QueryBudgetExceeded):
+            view.get(request)
+
+        with override_settings(PERSONALFINANCE_QUERY_BUDGET_STRICT=False):
+            with self.assertLogs('personalfinance.query_budget', 'WARNING') as logs:
+                view.get(request)
+
+        message = logs.records[0].getMessage()
+        self.assertIn('NPlusOneView.get ran 5 queries, its budget is 2', message)
+        self.assertIn('personalfinance_transaction', message)
+
+
+class NPlusOneView:
+    @query_budget(2)
+    def get(self, request):
+        # spending of every budget, one query each
+        return [
+            Transaction.objects.filter(category=budget.category).count()
+            for budget in Budget.objects.filter(user__username='testuser0')
+        ]
+
+
+# Server-Timing header and request log lines
+# get views read from the replicas, a user's own writes pin them to the primary
+@override_settings(PERSONALFINANCE_REPLICAS=['replica1', 'replica2'], PERSONALFINANCE_SHARED_CACHE=True, PERSONALFINANCE_RESPONSE_CACHE=True)
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.pot = Pot.objects.create(name='Savings', target=200000, total=15000, theme='#277C78', user=self.test_user1)
+        # bumped by the writes above
+        cache.delete(pin_key(self.test_user1.id))
+
+    def test_router(self):
+        router = ReplicaRouter()
+
+        self.assertEqual(router.db_for_read(Pot), 'default')
+        with reads_for_user(self.test_user1.id) as replica:
+            self.assertTrue(replica)
+            self.assertIn(router.db_for_read(Pot), ['replica1', 'replica2'])
+            # authentication and tokens always read from the primary
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_read(AuthToken), 'default')
+            self.assertEqual(router.db_for_write(Pot), 'default')
+
+        self.assertTrue(router.allow_migrate('default', 'personalfinance'))
+        self.assertFalse(router.allow_migrate('replica1', 'personalfinance'))
+
+    def test_pinned_after_write(self):
+        pin_to_primary(self.test_user1.id)
+
+        with reads_for_user(self.test_user1.id) as replica:
+            self.assertFalse(replica)
+            self.assertEqual(ReplicaRouter().db_for_read(Pot), 'default')
+
+        # other users still read from the replicas
+        with reads_for_user(self.test_user1.id + 1) as replica:
+            self.assertTrue(replica)
+
+    # the pin would only be seen by the worker of the write
+    @override_settings(PERSONALFINANCE_SHARED_CACHE=False)
+    def test_refused_without_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            with reads_for_user(self.test_user1.id):
+                pass
+
+    @override_settings(PERSONALFINANCE_REPLICAS=[])
+    def test_without_replicas(self):
+        pin_to_primary(self.test_user1.id)
+        self.assertIsNone(cache.get(pin_key(self.test_user1.id)))
+
+        with reads_for_user(self.test_user1.id) as replica:
+            self.assertFalse(replica)
+            self.assertEqual(ReplicaRouter().db_for_read(Pot), 'default')
+
+    # the test database stands in for the replicas, the chosen replica is recorded
+    def test_pot_add_then_list_reads_the_primary(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        with mock.patch('personalfinance.routers.choose_replica', return_value='default') as choose_replica:
+            response = client.get('/finance-api/pots')
+            self.assertEqual(response.data[0]['total'], 15000)
+            self.assertTrue(choose_replica.called)
+
+            choose_replica.reset_mock()
+            response = client.put(f'/finance-api/pots/add/{self.pot.id}', {'amount': 100}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(choose_replica.called)
+
+            response = client.get('/finance-api/pots')
+            self.assertEqual(response.data[0]['total'], 25000)
+            self.assertFalse(choose_replica.called)
+
+            # back to the replicas once the pin expires
+            cache.delete(pin_key(self.test_user1.id))
+            client.get(f'/finance-api/pots/{self.pot.id}')
+            self.assertTrue(choose_replica.called)
+
+    # a lagging replica read must not be served under the current version until the next write
+    def test_replica_reads_not_cached_or_etagged(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        with mock.patch('personalfinance.routers.choose_replica', return_value='default'):
+            response = client.get('/finance-api/pots')
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertNotIn('ETag', response)
+
+            response = client.get('/finance-api/pots')
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertNotIn('ETag', response)
+
+            # read from the primary: cached, and its hits get the etag from the replicas too
+            pin_to_primary(self.test_user1.id)
+            response = client.get('/finance-api/pots')
+            self.assertIn('ETag', response)
+            cache.delete(pin_key(self.test_user1.id))
+            response = client.get('/finance-api/pots')
+            self.assertEqual(response['X-Cache'], 'HIT')
+            self.assertIn('ETag', response)
+
+    def test_export_stream_reads_the_replica(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Swift Ride Share', category='Transportation', date='2024-07-02T19:50:05Z', amount=-1650, recurring=False, user=self.test_user1)
+        cache.delete(pin_key(self.test_user1.id))
+
+        with mock.patch('personalfinance.routers.choose_replica', return_value='default') as choose_replica:
+            response = client.get('/finance-api/transactions/export/csv/empty/All/Latest')
+            choose_replica.reset_mock()
+            # rows are read while the response is streamed
+            lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(choose_replica.called)
+
+
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+
+        Budget.objects.create(category='Bills', maximum=70000, theme='#626070', user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-07-29T11:55:29Z', amount=-10000, recurring=True, user=self.test_user1)
+
+    def get_client(self):
+        client = APIClient()
+        client.force_authenticate(user=self.test_user1)
+        return client
+
+    def timings(self, response):
+        return dict(metric.split(';', 1) for metric in response['Server-Timing'].split(', '))
+
+    def log_line(self, record):
+        message = record.getMessage()
+        return json.loads(message[message.index('{'):])
+
+    def test_disabled_by_default(self):
+        response = self.get_client().get('/finance-api/budgets')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    @override_settings(PERSONALFINANCE_SERVER_TIMING=True)
+    def test_header_and_log_line(self):
+        with self.assertLogs('personalfinance.timing', 'INFO') as logs:
+            with self.assertNumQueries(2):
+                response = self.get_client().get('/finance-api/budgets?from=2024-07-01')
+
+        timings = self.timings(response)
+        self.assertIn('desc="2 queries"', timings['db'])
+        self.assertIn('serialize', timings)
+        self.assertIn('total', timings)
+
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        line = self.log_line(logs.records[0])
+        self.assertEqual(line['path'], '/finance-api/budgets?from=2024-07-01')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['queries'], 2)
+        self.assertNotIn('sql', line)
+
+    @override_settings(PERSONALFINANCE_SERVER_TIMING=True, PERSONALFINANCE_SLOW_REQUEST_QUERIES=2)
+    def test_slow_request_logged_with_sql(self):
+        with self.assertLogs('personalfinance.timing', 'WARNING') as logs:
+            self.get_client().get('/finance-api/budgets')
+
+        line = self.log_line(logs.records[0])
+        self.assertEqual(len(line['sql']), 2)
+        self.assertTrue(any('personalfinance_budget' in query['sql'] for query in line['sql']))
+
+    @override_settings(PERSONALFINANCE_SERVER_TIMING=True)
+    def test_model_serializer_time(self):
+        budget = Budget.objects.get(category='Bills')
+
+        with self.assertLogs('personalfinance.timing', 'INFO'):
+            response = self.get_client().get(f'/finance-api/budgets/{budget.id}')
+
+        self.assertIn('serialize', self.timings(response))
+
+
+# async read views: same responses as the sync views, queries on other connections
+class AsyncReadViewTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.auth_token, self.token = AuthToken.objects.create(self.test_user1)
+
+        Budget.objects.create(category='Bills', maximum=70000, theme='#626070', user=self.test_user1)
+        Budget.objects.create(category='Shopping', maximum=70000, theme='#626070', user=self.test_user1)
+        Pot.objects.create(name='Savings', target=200000, total=15000, theme='#277C78', user=self.test_user1)
+        for day in range(1, 26):
+            Transaction.objects.create(avatar='/imgurl', name=f'Shop {day}', category='Shopping', date=f'2024-07-{day:02}T10:00:00Z', amount=-100 * day, recurring=day % 5 == 0, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='James Thompson', category='General', date='2024-07-12T13:40:46Z', amount=10000, recurring=False, user=self.test_user1)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+    def async_get(self, view_class, path, *args, **headers):
+        headers.setdefault('Authorization', f'Token {self.token}')
+        request = AsyncRequestFactory().get(path, headers=headers)
+        kwargs = dict(zip(['search_term', 'category', 'sort_by', 'page'], args))
+
+        return async_to_sync(view_class.as_view())(request, **kwargs)
+
+    def assertSameResponse(self, view_class, path, *args):
+        cache.clear()
+        response = self.async_get(view_class, path, *args)
+        cache.clear()
+        expected = self.client.get(path)
+
+        self.assertEqual(response.status_code, expected.status_code)
+        # the test client drops the body of 204 responses
+        if expected.status_code != 204:
+            self.assertEqual(response.content, expected.content)
+            self.assertEqual(response['Content-Type'], expected['Content-Type'])
+
+        return response
+
+    def test_same_responses_as_sync_views(self):
+        self.assertSameResponse(AsyncIndexView, '/finance-api/overview?from=2024-07-01&to=2024-07-31')
+        self.assertSameResponse(AsyncIndexView, '/finance-api/overview?summary=1&include=expenses')
+        self.assertSameResponse(AsyncIndexView, '/finance-api/overview?from=2024-07-31&to=2024-07-01')
+        self.assertSameResponse(AsyncBudgetListView, '/finance-api/budgets?from=2024-07-01')
+        self.assertSameResponse(AsyncPotListView, '/finance-api/pots')
+
+    def test_same_transaction_pages_as_sync_view(self):
+        for path, args in [
+            ('/finance-api/transactions/empty/All/Latest/1', ('empty', 'All', 'Latest', 1)),
+            ('/finance-api/transactions/empty/Shopping/Highest/3', ('empty', 'Shopping', 'Highest', 3)),
+            ('/finance-api/transactions/empty/All/Latest/2?count=capped', ('empty', 'All', 'Latest', 2)),
+            ('/finance-api/transactions/Shop/All/A-to-Z/1?cursor=&count=capped', ('Shop', 'All', 'A-to-Z', 1)),
+            ('/finance-api/transactions/empty/Bills/Latest/1', ('empty', 'Bills', 'Latest', 1)),
+        ]:
+            self.assertSameResponse(AsyncTransactionListView, path, *args)
+
+        # out of range pages
+        response = self.assertSameResponse(AsyncTransactionListView, '/finance-api/transactions/empty/All/Latest/4', 'empty', 'All', 'Latest', 4)
+        self.assertEqual(response.status_code, 204)
+        self.assertSameResponse(AsyncTransactionListView, '/finance-api/transactions/empty/All/Latest/0', 'empty', 'All', 'Latest', 0)
+
+    def test_cursor_pages(self):
+        response = self.async_get(AsyncTransactionListView, '/finance-api/transactions/empty/All/Latest/1?cursor=', 'empty', 'All', 'Latest', 1)
+        data = json.loads(response.content)
+        self.assertEqual(len(data['page_list']), 10)
+
+        response = self.async_get(AsyncTransactionListView, f'/finance-api/transactions/empty/All/Latest/1?cursor={data["next_cursor"]}', 'empty', 'All', 'Latest', 1)
+        self.assertEqual(json.loads(response.content)['page_list'][0]['name'], 'Shop 15')
+
+    @override_settings(PERSONALFINANCE_RESPONSE_CACHE=True)
+    def test_shares_cache_and_etags_with_sync_views(self):
+        response = self.async_get(AsyncIndexView, '/finance-api/overview')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(self.async_get(AsyncIndexView, '/finance-api/overview')['X-Cache'], 'HIT')
+
+        expected = self.client.get('/finance-api/overview')
+        self.assertEqual(expected['X-Cache'], 'HIT')
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+        response = self.async_get(AsyncIndexView, '/finance-api/overview', **{'If-None-Match': expected['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        # a write makes both stale
+        Pot.objects.create(name='Holiday', target=100000, total=0, theme='#277C78', user=self.test_user1)
+        response = self.async_get(AsyncIndexView, '/finance-api/overview', **{'If-None-Match': expected['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['pots']), 2)
+
+    def test_authentication(self):
+        response = self.async_get(AsyncPotListView, '/finance-api/pots', Authorization='')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+        response = self.async_get(AsyncPotListView, '/finance-api/pots', Authorization=f'Token {self.token[:-1]}x')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content), {'detail': 'Invalid token.'})
+
+    # queries of the query threads count against the sync view's budget
+    def test_query_budget(self):
+        self.assertEqual(self.async_get(AsyncIndexView, '/finance-api/overview').status_code, 200)
+
+        cache.clear()
+        with mock.patch.object(IndexView.get, 'query_budget', 2), self.assertRaises(QueryBudgetExceeded):
+            self.async_get(AsyncIndexView, '/finance-api/overview')
+
+    def test_writes_go_to_sync_view(self):
+        request = AsyncRequestFactory().post(
+            '/finance-api/pots', {'name': 'Holiday', 'target': '1000', 'total': '0', 'theme': '#277C78'},
+            headers={'Authorization': f'Token {self.token}'},
+        )
+        response = async_to_sync(AsyncPotListView.as_view())(request)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Pot.objects.filter(name='Holiday', user=self.test_user1).exists())
+
+
 class PotDetailViewTest(TestCase):
     def setUp(self):
         self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
@@ -548,17 +1296,153 @@ class PotAddViewTest(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.data['value'][0], 'Total can\'t be higher than target') 
 
+    def test_invalid_amount(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
 
-# transaction list view
-class TransactionListViewTest(TestCase):
-    def setUp(self):
-        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
-        
-        # create 11 object to test pagination
-        Transaction.objects.create(avatar='/imgurl', name='James Thompson', category='Bills', date='2024-07-12T13:40:46Z', amount=-9550, recurring=False, user=self.test_user1)
-        Transaction.objects.create(avatar='/imgurl', name='EcoFuel Energy', category='Bills', date='2024-07-30T13:20:14Z', amount=-3500, recurring=True, user=self.test_user1)
-        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-07-29T11:55:29Z', amount=-10000, recurring=True, user=self.test_user1)
-        Transaction.objects.create(avatar='/imgurl', name='Swift Ride Share', category='Transportation', date='2024-07-02T19:50:05Z', amount=-1650, recurring=False, user=self.test_user1)
+        response = client.put('/finance-api/pots/add/1', {'amount': 'ten'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['amount'][0], 'Please enter a valid amount')
+
+    def test_pot_of_other_user(self):
+        test_user2 = User.objects.create_user(username='testuser2', password='1X<ISRUkw+tuK')
+        client = APIClient()
+        client.force_authenticate(test_user2)
+
+        response = client.put('/finance-api/pots/add/1', {'amount': 10})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Object with pot id does not exist')
+        self.assertEqual(Pot.objects.get(id=1).total, 15000)
+
+    def test_database_refuses_total_above_target(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Pot.objects.filter(id=1).update(total=F('target') + 1)
+
+
+class PotTransferViewTest(TestCase):
+    def setUp(self):
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+
+        Pot.objects.create(name='Savings', target=200000, total=15000, theme='#277C78', user=self.test_user1)
+        Pot.objects.create(name='Gift', target=15000, total=11000, theme='#82C9D7', user=self.test_user1)
+        Pot.objects.create(name='Holiday', target=100000, total=0, theme='#F2CDAC', user=self.test_user1)
+
+    # user not logged in
+    def test_user_not_logged_in(self):
+        client = APIClient()
+
+        response = client.post('/finance-api/pots/transfer')
+        self.assertEqual(response.status_code, 401)
+
+    def test_post_moves_totals(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        data = {'transfers': [{'from': 1, 'to': 2, 'amount': 40}, {'from': 1, 'to': 3, 'amount': 100.5}]}
+
+        response = client.post('/finance-api/pots/transfer', data, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({pot['id']: pot['total'] for pot in response.data}, {1: 950, 2: 15000, 3: 10050})
+        self.assertEqual(Pot.objects.get(id=1).total, 950)
+
+    def test_post_is_all_or_nothing(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        # the second transfer puts Gift above its target
+        data = {'transfers': [{'from': 1, 'to': 3, 'amount': 10}, {'from': 1, 'to': 2, 'amount': 50}]}
+
+        response = client.post('/finance-api/pots/transfer', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data[2]['value'][0], 'Total can\'t be higher than target')
+        self.assertEqual([pot.total for pot in Pot.objects.order_by('id')], [15000, 11000, 0])
+
+    def test_post_with_invalid_data(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        for data in [{}, {'transfers': []}, {'transfers': [{'from': 1, 'to': 2}]}, {'transfers': [{'from': 1, 'to': 1, 'amount': 5}]}, {'transfers': [{'from': 1, 'to': 2, 'amount': -5}]}]:
+            response = client.post('/finance-api/pots/transfer', data, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['message'], 'Please enter valid transfers')
+
+    def test_post_to_pot_of_other_user(self):
+        test_user2 = User.objects.create_user(username='testuser2', password='1X<ISRUkw+tuK')
+        Pot.objects.create(name='Other', target=100000, total=0, theme='#F2CDAC', user=test_user2)
+
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.post('/finance-api/pots/transfer', {'transfers': [{'from': 1, 'to': 4, 'amount': 10}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Object with pot id does not exist')
+        self.assertEqual(Pot.objects.get(id=1).total, 15000)
+
+
+# many threads adding to and withdrawing from one pot (real transactions, one connection per thread)
+class PotConcurrencyTest(TransactionTestCase):
+    def setUp(self):
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.pot = Pot.objects.create(name='Savings', target=10000, total=0, theme='#277C78', user=self.test_user1)
+
+    def hammer(self, amounts):
+        results = []
+        lock = threading.Lock()
+
+        def worker(amount):
+            try:
+                while True:
+                    try:
+                        move_pot_total(self.pot.id, self.test_user1.id, amount)
+                        result = amount
+                    except PotError:
+                        result = None
+                    except OperationalError:
+                        # SQLite: another thread holds the write lock, try again
+                        continue
+                    break
+                with lock:
+                    results.append(result)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(amount,)) for amount in amounts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_no_lost_updates(self):
+        results = self.hammer([300] * 40 + [-100] * 40)
+
+        # every successful add and withdrawal is in the total
+        succeeded = [amount for amount in results if amount is not None]
+        self.pot.refresh_from_db()
+        self.assertEqual(self.pot.total, sum(succeeded))
+        self.assertTrue(0 <= self.pot.total <= self.pot.target)
+
+    def test_target_is_never_exceeded(self):
+        results = self.hammer([100] * 150)
+
+        self.pot.refresh_from_db()
+        self.assertEqual(self.pot.total, 10000)
+        # exactly the additions that fit
+        self.assertEqual(len([amount for amount in results if amount is not None]), 100)
+
+
+# transaction list view
+class TransactionListViewTest(TestCase):
+    def setUp(self):
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        
+        # create 11 object to test pagination
+        Transaction.objects.create(avatar='/imgurl', name='James Thompson', category='Bills', date='2024-07-12T13:40:46Z', amount=-9550, recurring=False, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='EcoFuel Energy', category='Bills', date='2024-07-30T13:20:14Z', amount=-3500, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-07-29T11:55:29Z', amount=-10000, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Swift Ride Share', category='Transportation', date='2024-07-02T19:50:05Z', amount=-1650, recurring=False, user=self.test_user1)
         Transaction.objects.create(avatar='/imgurl', name='Serenity Spa & Wellness', category='Personal Care', date='2024-07-03T14:00:37Z', amount=-3000, recurring=True, user=self.test_user1)
         Transaction.objects.create(avatar='/imgurl', name='Elevate Education', category='Education', date='2024-07-05T11:15:22Z', amount=-5000, recurring=True, user=self.test_user1)
         Transaction.objects.create(avatar='/imgurl', name='William Harris', category='General', date='2024-07-06T17:10:09Z', amount=2000, recurring=False, user=self.test_user1)
@@ -627,6 +1511,58 @@ class TransactionListViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.data['page_list']), 1)
 
+    # cursor pagination
+    def test_cursor_pages_match_numbered_pages(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+        # equal dates and amounts to exercise the id tiebreaker
+        Transaction.objects.create(avatar='/imgurl', name='Yuna Kim', category='Dining Out', date='2024-07-10T12:30:13Z', amount=-2750, recurring=False, user=self.test_user1)
+
+        for sort_by in ['Latest', 'Oldest', 'A-to-Z', 'Z-to-A', 'Highest', 'Lowest']:
+            numbered = []
+            for page in [1, 2]:
+                response = client.get(f'/finance-api/transactions/empty/All/{sort_by}/{page}')
+                numbered += [t['id'] for t in response.data['page_list']]
+
+            response = client.get(f'/finance-api/transactions/empty/All/{sort_by}/1?cursor=')
+            self.assertEqual(len(response.data['page_list']), 10)
+            self.assertNotIn('num_pages', response.data)
+            first = [t['id'] for t in response.data['page_list']]
+
+            response = client.get(f'/finance-api/transactions/empty/All/{sort_by}/1', {'cursor': response.data['next_cursor']})
+            self.assertIsNone(response.data['next_cursor'])
+            second = [t['id'] for t in response.data['page_list']]
+
+            self.assertEqual(first + second, numbered)
+
+    def test_cursor_with_category_and_capped_count(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/empty/Transportation/Latest/1?cursor=&count=capped')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['page_list']), 3)
+        self.assertEqual(response.data['num_pages'], 1)
+        self.assertFalse(response.data['num_pages_capped'])
+
+    def test_invalid_cursor(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/empty/All/Latest/1?cursor=notacursor')
+        self.assertEqual(response.status_code, 204)
+
+    def test_capped_page_count(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        with mock.patch('personalfinance.pagination.MAX_COUNTED_PAGES', 1):
+            response = client.get('/finance-api/transactions/empty/All/Latest/1?count=capped')
+
+        self.assertEqual(len(response.data['page_list']), 10)
+        self.assertEqual(response.data['num_pages'], 1)
+        self.assertTrue(response.data['num_pages_capped'])
+
 
 # transaction search  
 class TransactionSearchViewTest(TestCase):
@@ -687,6 +1623,65 @@ class TransactionSearchViewTest(TestCase):
         self.assertEqual(response.status_code, 204)
         self.assertEqual(len(response.data['page_list']), 0)        
 
+    # search backend
+    def test_search_backend_in_use(self):
+        self.assertIsInstance(get_search_backend(), SQLiteFTSSearchBackend)
+
+    def test_get_substring_search(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/search/IFT R/Latest/1')
+        self.assertEqual([t['name'] for t in response.data['page_list']], ['Swift Ride Share'])
+
+    def test_search_index_matches_user_rows_only(self):
+        test_user2 = User.objects.create_user(username='testuser2', password='1X<ISRUkw+tuK')
+        Transaction.objects.create(avatar='/imgurl', name='Swift Ride Share', category='Transportation', date='2024-07-03T19:50:05Z', amount=-1650, recurring=False, user=test_user2)
+
+        matches = SQLiteFTSSearchBackend().filter(Transaction.objects.all(), 'swift', test_user2.id)
+        self.assertEqual(list(matches.values_list('user', flat=True)), [test_user2.id])
+
+    # common terms use icontains, except in the rank order
+    def test_search_index_only_for_rare_terms(self):
+        backend = SQLiteFTSSearchBackend()
+        transactions = Transaction.objects.filter(user=self.test_user1)
+
+        self.assertIn(FTS_TABLE, str(backend.filter(transactions, 'swift', self.test_user1.id).query))
+        with mock.patch('personalfinance.search.FTS_MAX_MATCHES', 0):
+            self.assertNotIn(FTS_TABLE, str(backend.filter(transactions, 'swift', self.test_user1.id).query))
+            self.assertIn(FTS_TABLE, str(backend.filter(transactions, 'swift', self.test_user1.id, ranked=True).query))
+
+            client = APIClient()
+            client.force_authenticate(self.test_user1)
+            response = client.get('/finance-api/transactions/search/swift/Latest/1')
+            self.assertEqual([t['name'] for t in response.data['page_list']], ['Swift Ride Share'])
+
+    def test_search_index_follows_writes(self):
+        Transaction.objects.filter(name='Swift Ride Share').update(name='Metro Ride')
+        Transaction.objects.filter(name='William Harris').delete()
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/search/swift/Latest/1')
+        self.assertEqual(len(response.data['page_list']), 0)
+        response = client.get('/finance-api/transactions/search/metro/Latest/1')
+        self.assertEqual(len(response.data['page_list']), 1)
+        response = client.get('/finance-api/transactions/search/harris/Latest/1')
+        self.assertEqual(len(response.data['page_list']), 0)
+
+    def test_get_relevance_sort(self):
+        Transaction.objects.create(avatar='/imgurl', name='Education Fund', category='Education', date='2024-07-01T11:15:22Z', amount=-500, recurring=False, user=self.test_user1)
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/search/education/Relevance/1')
+        self.assertEqual(len(response.data['page_list']), 2)
+        # prefix match first
+        self.assertEqual(response.data['page_list'][0]['name'], 'Education Fund')
+
+        response = client.get('/finance-api/transactions/search/education/Relevance/1?cursor=')
+        self.assertEqual(len(response.data['page_list']), 2)
+
 
 # recurring transactions view
 class RecurringTransactionsViewTest(TestCase):
@@ -721,6 +1716,127 @@ class RecurringTransactionsViewTest(TestCase):
         response = client.get('/finance-api/transactions/recurring')
         self.assertEqual(len(response.data), 3)
 
+    def test_detected_series_are_recurring(self):
+        # monthly subscription never flagged by the user
+        for day in ('2024-05-14', '2024-06-14', '2024-07-14'):
+            Transaction.objects.create(avatar='/imgurl', name='Pixel Playground', category='Entertainment', date=f'{day}T10:00:00Z', amount=-1000, recurring=False, user=self.test_user1)
+
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/recurring')
+        rows = [row for row in response.data if row['name'] == 'Pixel Playground']
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(len({row['series'] for row in rows}), 1)
+        self.assertIsNotNone(rows[0]['series'])
+
+    @mock.patch('django.utils.timezone.localdate', return_value=date(2024, 8, 3))
+    def test_summary(self, localdate):
+        # earlier occurrence of a series and this month's payment of another
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-06-29T11:55:29Z', amount=-9000, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Elevate Education', category='Education', date='2024-08-01T11:15:22Z', amount=-5000, recurring=True, user=self.test_user1)
+
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/recurring?summary=1')
+        self.assertEqual(response.status_code, 200)
+
+        bills = response.data['bills']
+        self.assertEqual([bill['name'] for bill in bills], ['Elevate Education', 'Serenity Spa & Wellness', 'Aqua Flow Utilities'])
+        self.assertEqual([bill['status'] for bill in bills], ['paid', 'due_soon', 'upcoming'])
+        self.assertEqual([bill['due_date'] for bill in bills], ['2024-08-01', '2024-08-03', '2024-08-29'])
+        self.assertEqual(bills[2]['date'], '2024-07-29T11:55:29Z')
+
+        self.assertEqual(response.data['paid'], {'total': -5000, 'count': 1})
+        self.assertEqual(response.data['upcoming'], {'total': -13000, 'count': 2})
+        self.assertEqual(response.data['due_soon'], {'total': -3000, 'count': 1})
+        self.assertEqual(response.data['total'], {'total': -18000, 'count': 3})
+
+    @mock.patch('django.utils.timezone.localdate', return_value=date(2024, 9, 30))
+    def test_summary_due_day_past_end_of_month(self, localdate):
+        Transaction.objects.create(avatar='/imgurl', name='ByteWise', category='Lifestyle', date='2024-08-31T10:00:00Z', amount=-4900, recurring=True, user=self.test_user1)
+
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/recurring?summary=1')
+        bill = next(bill for bill in response.data['bills'] if bill['name'] == 'ByteWise')
+        self.assertEqual(bill['due_date'], '2024-09-30')
+        self.assertEqual(bill['status'], 'due_soon')
+
+    def create_series(self, name, days, amount):
+        for day in days:
+            Transaction.objects.create(avatar='/imgurl', name=name, category='Bills', date=f'{day}T10:00:00Z', amount=amount, recurring=False, user=self.test_user1)
+
+    def get_summary_bill(self, name):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/recurring?summary=1')
+        return response.data, [bill for bill in response.data['bills'] if bill['name'] == name]
+
+    @mock.patch('django.utils.timezone.localdate', return_value=date(2024, 8, 3))
+    def test_summary_weekly_series(self, localdate):
+        # one bill per series, whatever the names of its rows
+        self.create_series('Gym Weekly', ('2024-07-18', '2024-07-25'), -800)
+        self.create_series('GYM WEEKLY 0801', ('2024-08-01',), -800)
+
+        summary, bills = self.get_summary_bill('GYM WEEKLY 0801')
+        self.assertEqual(len(bills), 1)
+        self.assertEqual((bills[0]['cadence'], bills[0]['status'], bills[0]['due_date']), ('weekly', 'paid', '2024-08-01'))
+        self.assertEqual(summary['paid'], {'total': -800, 'count': 1})
+
+        # a week later the next payment is due, in the same month
+        localdate.return_value = date(2024, 8, 9)
+        summary, bills = self.get_summary_bill('GYM WEEKLY 0801')
+        self.assertEqual((bills[0]['status'], bills[0]['due_date']), ('due_soon', '2024-08-08'))
+
+    @mock.patch('django.utils.timezone.localdate', return_value=date(2024, 8, 3))
+    def test_summary_yearly_series(self, localdate):
+        self.create_series('Domain Renewal', ('2021-11-10', '2022-11-10', '2023-11-10'), -1500)
+
+        summary, bills = self.get_summary_bill('Domain Renewal')
+        self.assertEqual((bills[0]['cadence'], bills[0]['status'], bills[0]['due_date']), ('yearly', 'upcoming', '2024-11-10'))
+        # due after the bills of this month
+        self.assertEqual(summary['bills'][-1]['name'], 'Domain Renewal')
+
+        # paid this month: not due again before next year
+        localdate.return_value = date(2024, 11, 20)
+        self.create_series('Domain Renewal', ('2024-11-10',), -1500)
+        summary, bills = self.get_summary_bill('Domain Renewal')
+        self.assertEqual((bills[0]['status'], bills[0]['due_date']), ('paid', '2024-11-10'))
+
+    @override_settings(PERSONALFINANCE_RESPONSE_CACHE=True)
+    def test_cached_until_recurring_write(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/recurring?summary=1')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        # budgets, pots and one-off transactions don't touch the recurring bills
+        Budget.objects.create(category='Bills', maximum=70000, theme='#626070', user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Swift Ride Share', category='Transportation', date='2024-07-09T19:50:05Z', amount=-1650, recurring=False, user=self.test_user1)
+
+        response = client.get('/finance-api/transactions/recurring?summary=1')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        Transaction.objects.create(avatar='/imgurl', name='ByteWise', category='Lifestyle', date='2024-07-10T10:00:00Z', amount=-4900, recurring=True, user=self.test_user1)
+
+        response = client.get('/finance-api/transactions/recurring?summary=1')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['total']['count'], 4)
+
+        # a bill that stops being recurring leaves the summary
+        bill = Transaction.objects.get(name='ByteWise')
+        bill.recurring = False
+        bill.save()
+
+        response = client.get('/finance-api/transactions/recurring?summary=1')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['total']['count'], 3)
+
 
 # transaction forms
 class TransactionCreateViewTest(TestCase):
@@ -780,6 +1896,323 @@ class TransactionCreateViewTest(TestCase):
         response = client.post('/finance-api/transactions/create', data)
         self.assertEqual(response.status_code, 201)
 
+    def test_post_updates_budget_spending(self):
+        Budget.objects.create(category='Bills', maximum=70000, theme='#626070', user=self.test_user1)
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        data = {
+            'avatar': '/imgurl',
+            'name': 'Aqua Flow Utilities',
+            'category': 'Bills',
+            'date': '2024-07-29T11:55:29Z',
+            'amount': -100,
+            'recurring': True,
+        }
+
+        client.post('/finance-api/transactions/create', data)
+        client.post('/finance-api/transactions/create', data)
+
+        response = client.get('/finance-api/budgets?from=2024-07-01&to=2024-07-31')
+        self.assertEqual(response.data['budget_spending']['Bills'], -20000)
+
+    def test_post_links_recurring_series(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        data = {
+            'avatar': '/imgurl',
+            'name': 'Pixel Playground',
+            'category': 'Entertainment',
+            'amount': -10,
+            'recurring': False,
+        }
+
+        for date in ('2024-05-14T10:00:00Z', '2024-06-14T10:00:00Z'):
+            response = client.post('/finance-api/transactions/create', {**data, 'date': date})
+            self.assertIsNone(response.data['series'])
+
+        # third month in a row
+        response = client.post('/finance-api/transactions/create', {**data, 'date': '2024-07-14T10:00:00Z'})
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNotNone(response.data['series'])
+
+
+# transaction import view
+class TransactionImportViewTest(TestCase):
+    def setUp(self):
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+
+    # url
+    def test_url_exists(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/import')
+        # no get method
+        self.assertEqual(response.status_code, 405)
+
+    # user not logged in
+    def test_user_not_logged_in(self):
+        client = APIClient()
+
+        response = client.post('/finance-api/transactions/import')
+        self.assertEqual(response.status_code, 401)
+
+    def test_post_without_file(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.post('/finance-api/transactions/import')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Please upload a CSV or NDJSON file')
+
+    def test_post_csv(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        content = (
+            'avatar,name,category,date,amount,recurring\n'
+            '/imgurl,Aqua Flow Utilities,Bills,2024-07-29T11:55:29Z,-100.00,true\n'
+            '/imgurl,,Bills,2024-07-29T11:55:29Z,-10,false\n'
+            '/imgurl,Nimbus Data Storage,Bills,2024-07-21T10:05:42Z,-9.99,\n'
+            '/imgurl,James Thompson,General,not a date,100,false\n'
+        )
+        upload = SimpleUploadedFile('statement.csv', content.encode())
+
+        response = client.post('/finance-api/transactions/import', {'file': upload})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(response.data['failed'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 4])
+        self.assertIn('name', response.data['errors'][0]['errors'])
+        self.assertIn('date', response.data['errors'][1]['errors'])
+
+        self.assertEqual(Transaction.objects.get(name='Nimbus Data Storage').amount, -999)
+        # bulk inserts update the spending rollups and the search index
+        response = client.get('/finance-api/budgets/new/Bills?from=2024-07-01&to=2024-07-31')
+        self.assertEqual(response.data['Bills'], -10999)
+        response = client.get('/finance-api/transactions/search/nimbus/Latest/1')
+        self.assertEqual(len(response.data['page_list']), 1)
+
+    def test_post_ndjson(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        content = (
+            '{"avatar": "/imgurl", "name": "Aqua Flow Utilities", "category": "Bills", "date": "2024-07-29T11:55:29Z", "amount": -100, "recurring": true}\n'
+            '\n'
+            'not json\n'
+            '{"avatar": "/imgurl", "name": "Savory Bites Bistro", "category": "Dining Out", "date": "2024-07-19T20:23:11Z", "amount": "-55.5"}\n'
+        )
+        upload = SimpleUploadedFile('statement.txt', content.encode())
+
+        response = client.post('/finance-api/transactions/import', {'file': upload, 'format': 'ndjson'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(response.data['errors'], [{'row': 3, 'errors': {'non_field_errors': ['Could not parse row']}}])
+        self.assertEqual(Transaction.objects.get(name='Savory Bites Bistro').amount, -5550)
+
+    # undecodable lines and rows the csv reader rejects are row errors, the other rows are imported
+    def test_post_csv_with_bad_bytes(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        content = (
+            b'avatar,name,category,date,amount,recurring\n'
+            b'/imgurl,Caf\xe9 Latin-1,Dining Out,2024-07-29T11:55:29Z,-4.50,false\n'
+            b'/imgurl,Aqua Flow Utilities,Bills,2024-07-29T11:55:29Z,-100.00,true\n'
+            b'/imgurl,Nul\x00 Byte,Bills,2024-07-21T10:05:42Z,-9.99,false\n'
+            b'/imgurl,"' + b'x' * 200000 + b'",Bills,2024-07-21T10:05:42Z,-1,false\n'
+            b'/imgurl,Nimbus Data Storage,Bills,2024-07-21T10:05:42Z,-9.99,false\n'
+        )
+        upload = SimpleUploadedFile('statement.csv', content)
+
+        response = client.post('/finance-api/transactions/import', {'file': upload})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 3, 4])
+        self.assertEqual(
+            sorted(Transaction.objects.filter(user=self.test_user1).values_list('name', flat=True)),
+            ['Aqua Flow Utilities', 'Nimbus Data Storage']
+        )
+
+    def test_post_file_not_utf8(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        content = '{"avatar": "/imgurl", "name": "Café Rouge", "category": "Dining Out", "date": "2024-07-29T11:55:29Z", "amount": -4}\n'
+        upload = SimpleUploadedFile('statement.ndjson', (content * 2).encode('utf-16'))
+
+        response = client.post('/finance-api/transactions/import', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['imported'], 0)
+        self.assertTrue(response.data['errors'])
+        self.assertFalse(Transaction.objects.filter(user=self.test_user1).exists())
+
+    # the budget grows with the rollups of the file (a year of several categories), checked before the commit
+    def test_post_query_budget_scales_with_file(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        rows = ''.join(
+            f'/imgurl,Shop {category},{category},2024-{month:02}-10T10:00:00Z,-1,false\n'
+            for month in range(1, 13) for category in ('Bills', 'Groceries', 'Dining Out', 'Transportation', 'General')
+        )
+        upload = SimpleUploadedFile('statement.csv', ('avatar,name,category,date,amount,recurring\n' + rows).encode())
+
+        response = client.post('/finance-api/transactions/import', {'file': upload})
+        self.assertEqual(response.data['imported'], 60)
+
+        # inserts not allowed for: over budget before the commit, nothing imported
+        upload = SimpleUploadedFile('statement.csv', ('avatar,name,category,date,amount,recurring\n' + rows).encode())
+        with mock.patch('personalfinance.imports.bulk_statements', return_value=-1000), self.assertRaises(QueryBudgetExceeded):
+            client.post('/finance-api/transactions/import', {'file': upload})
+        self.assertEqual(Transaction.objects.filter(user=self.test_user1).count(), 60)
+
+    def test_post_in_batches(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        rows = ''.join(f'/imgurl,Transaction {i},General,2024-07-01T10:00:00Z,-1,false\n' for i in range(7))
+        upload = SimpleUploadedFile('statement.csv', ('avatar,name,category,date,amount,recurring\n' + rows).encode())
+
+        with mock.patch('personalfinance.imports.BATCH_SIZE', 3):
+            response = client.post('/finance-api/transactions/import', {'file': upload})
+
+        self.assertEqual(response.data['imported'], 7)
+        self.assertEqual(Transaction.objects.filter(user=self.test_user1).count(), 7)
+
+
+    # series spanning batches: groups detected on their own up to MAX_DETECTED_GROUPS, every group of the user over it
+    def test_post_detects_series_across_batches(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        rows = [f'/imgurl,Shop,General,2024-07-01T10:00:00Z,-{i + 1},false\n' for i in range(1200)]
+        for index, month in ((0, 5), (600, 6), (1199, 7)):
+            rows[index] = f'/imgurl,Netflix,Entertainment,2024-{month:02}-03T10:00:00Z,-15.99,false\n'
+        content = ('avatar,name,category,date,amount,recurring\n' + ''.join(rows)).encode()
+
+        with mock.patch('personalfinance.imports.detect_user_series', wraps=detect_user_series) as detect:
+            for max_groups in (2000, 100):
+                Transaction.objects.filter(user=self.test_user1).delete()
+                with mock.patch('personalfinance.imports.MAX_DETECTED_GROUPS', max_groups):
+                    response = client.post('/finance-api/transactions/import', {'file': SimpleUploadedFile('statement.csv', content)})
+
+                self.assertEqual(response.data['imported'], 1200)
+                self.assertEqual(Transaction.objects.filter(name='Netflix', series__isnull=False).count(), 3)
+
+        self.assertEqual(len(detect.call_args_list[0].args[1]), 1198)
+        self.assertEqual(detect.call_args_list[1].args, (self.test_user1.id, None))
+
+
+class TransactionExportViewTest(TestCase):
+    def setUp(self):
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+        self.test_user2 = User.objects.create_user(username='testuser2', password='1X<ISRUkw+tuK')
+
+        Transaction.objects.create(avatar='/imgurl', name='James Thompson', category='Bills', date='2024-07-12T13:40:46Z', amount=-9550, recurring=False, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='EcoFuel Energy', category='Bills', date='2024-07-30T13:20:14Z', amount=-3500, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Swift Ride Share', category='Transportation', date='2024-07-02T19:50:05Z', amount=-1650, recurring=False, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Savory Bites, "Bistro"', category='Dining Out', date='2024-07-19T20:23:11Z', amount=-5550, recurring=False, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Other User', category='Bills', date='2024-07-12T13:40:46Z', amount=-100, recurring=False, user=self.test_user2)
+
+    def export(self, client, url):
+        response = client.get(url)
+        return response, b''.join(response.streaming_content).decode().splitlines()
+
+    # user not logged in
+    def test_user_not_logged_in(self):
+        client = APIClient()
+
+        response = client.get('/finance-api/transactions/export/csv/empty/All/Latest')
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_format(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/transactions/export/xml/empty/All/Latest')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Please choose csv or ndjson')
+
+    def test_get_csv(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response, lines = self.export(client, '/finance-api/transactions/export/csv/empty/All/Latest')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="transactions.csv"')
+
+        rows = list(csv.reader(lines))
+        self.assertEqual(rows[0], ['id', 'avatar', 'name', 'category', 'date', 'amount', 'recurring', 'series'])
+        # other users' transactions are not exported
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][2:], ['EcoFuel Energy', 'Bills', '2024-07-30T13:20:14Z', '-3500', 'True', ''])
+        self.assertEqual(rows[2][2], 'Savory Bites, "Bistro"')
+
+    def test_get_ndjson_matches_serializer(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response, lines = self.export(client, '/finance-api/transactions/export/ndjson/empty/All/Oldest')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        expected = TransactionSerializer(Transaction.objects.filter(user=self.test_user1).order_by('date'), many=True).data
+        self.assertEqual([json.loads(line) for line in lines], json.loads(json.dumps(expected)))
+
+    def test_get_with_filters(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response, lines = self.export(client, '/finance-api/transactions/export/ndjson/empty/Bills/Highest')
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['James Thompson', 'EcoFuel Energy'])
+
+        response, lines = self.export(client, '/finance-api/transactions/export/ndjson/ride/All/Latest')
+        self.assertEqual([json.loads(line)['name'] for line in lines], ['Swift Ride Share'])
+
+    def test_get_in_chunks(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        with mock.patch('personalfinance.exports.CHUNK_SIZE', 1):
+            response, lines = self.export(client, '/finance-api/transactions/export/csv/empty/All/Latest')
+
+        self.assertEqual(len(lines), 5)
+
+    def test_get_with_archived_rows(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2022-03-10T11:55:29Z', amount=-1000, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='Savory Bites Bistro', category='Dining Out', date='2022-05-20T19:10:00Z', amount=-9900, recurring=False, user=self.test_user1)
+
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir, ignore_errors=True)
+        with override_settings(PERSONALFINANCE_ARCHIVE_DIR=archive_dir):
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('archive_transactions', '--before', '2024-01-01', stdout=StringIO())
+            self.assertEqual(Transaction.objects.filter(user=self.test_user1).count(), 4)
+
+            # older than every hot row
+            response, lines = self.export(client, '/finance-api/transactions/export/ndjson/empty/All/Latest')
+            self.assertEqual([json.loads(line)['name'] for line in lines][-3:], ['Swift Ride Share', 'Savory Bites Bistro', 'Aqua Flow Utilities'])
+            self.assertEqual(json.loads(lines[-1])['date'], '2022-03-10T11:55:29Z')
+            self.assertEqual(json.loads(lines[-1])['recurring'], True)
+
+            # after the hot rows in the other orders, newest first
+            response, lines = self.export(client, '/finance-api/transactions/export/ndjson/empty/All/Highest')
+            self.assertEqual([json.loads(line)['amount'] for line in lines], [-9550, -5550, -3500, -1650, -9900, -1000])
+
+            response, lines = self.export(client, '/finance-api/transactions/export/ndjson/empty/Bills/A-to-Z')
+            self.assertEqual([json.loads(line)['name'] for line in lines], ['EcoFuel Energy', 'James Thompson', 'Aqua Flow Utilities'])
+
+            response, lines = self.export(client, '/finance-api/transactions/export/csv/bistro/All/Relevance')
+            self.assertEqual([row[2] for row in csv.reader(lines[1:])], ['Savory Bites, "Bistro"', 'Savory Bites Bistro'])
+
 
 # transaction detail view -> update, delete
 class TransactionDetailViewTest(TestCase):
@@ -825,6 +2258,24 @@ class TransactionDetailViewTest(TestCase):
         self.assertEqual(response.data['amount'], -10000)
         self.assertEqual(response.data['recurring'], False)
 
+    def test_put_moves_budget_spending(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        data = {
+            'avatar': '/imgurl',
+            'name': 'Aqua Flow Utilities',
+            'category': 'Shopping',
+            'date': '2024-07-29T11:55:29Z',
+            'amount': -2500,
+            'recurring': True,
+        }
+
+        client.put('/finance-api/transactions/1', data)
+
+        self.assertEqual(client.get('/finance-api/budgets/new/Bills?from=2024-07-01&to=2024-07-31').data['Bills'], 0)
+        self.assertEqual(client.get('/finance-api/budgets/new/Shopping?from=2024-07-01&to=2024-07-31').data['Shopping'], -2500)
+
     def test_put_with_invalid_data(self):
         client = APIClient()
         client.force_authenticate(self.test_user1)
@@ -853,6 +2304,9 @@ class TransactionDetailViewTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['message'], 'Transaction deleted!')
 
+        response = client.get('/finance-api/budgets/new/Bills?from=2024-07-01&to=2024-07-31')
+        self.assertEqual(response.data['Bills'], 0)
+
 
     def test_delete_with_invalid_data(self):
         client = APIClient()
@@ -861,3 +2315,157 @@ class TransactionDetailViewTest(TestCase):
         response = client.delete('/finance-api/transactions/100')
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.data['message'], 'Object with transaction id does not exist')
+
+
+class BatchViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.test_user1 = User.objects.create_user(username='testuser1', password='1X<ISRUkw+tuK')
+
+        Transaction.objects.create(avatar='/imgurl', name='Aqua Flow Utilities', category='Bills', date='2024-07-29T11:55:29Z', amount=-10000, recurring=True, user=self.test_user1)
+        Transaction.objects.create(avatar='/imgurl', name='EcoFuel Energy', category='Bills', date='2024-07-30T13:20:14Z', amount=-3500, recurring=True, user=self.test_user1)
+        Budget.objects.create(category='Bills', maximum=70000, theme='#626070', user=self.test_user1)
+        Pot.objects.create(name='Savings', target=200000, total=15000, theme='#277C78', user=self.test_user1)
+
+    # url
+    def test_url_exists(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.get('/finance-api/batch')
+        # no get method
+        self.assertEqual(response.status_code, 405)
+
+    # user not logged in
+    def test_user_not_logged_in(self):
+        client = APIClient()
+
+        response = client.post('/finance-api/batch')
+        self.assertEqual(response.status_code, 401)
+
+    def test_post_without_operations(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        response = client.post('/finance-api/batch', {'operations': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Please enter a list of operations')
+
+    def test_post_operations(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        operations = [
+            {'op': 'create', 'model': 'transaction', 'data': {'avatar': '/imgurl', 'name': 'Nimbus Data Storage', 'category': 'Bills', 'date': '2024-07-21T10:05:42Z', 'amount': -9.99, 'recurring': True}},
+            {'op': 'update', 'model': 'transaction', 'id': 1, 'data': {'avatar': '/imgurl', 'name': 'Aqua Flow Utilities', 'category': 'Shopping', 'date': '2024-07-29T11:55:29Z', 'amount': -2500, 'recurring': False}},
+            {'op': 'delete', 'model': 'transaction', 'id': 2},
+            {'op': 'update', 'model': 'budget', 'id': 1, 'data': {'category': 'Bills', 'maximum': 800, 'theme': '#277C78'}},
+            {'op': 'create', 'model': 'budget', 'data': {'category': 'Shopping', 'maximum': 100, 'theme': '#82C9D7'}},
+            {'op': 'update', 'model': 'pot', 'id': 1, 'data': {'name': 'Rainy day', 'target': 3000, 'theme': '#277C78'}},
+            {'op': 'create', 'model': 'pot', 'data': {'name': 'New Laptop', 'target': 900, 'total': 315, 'theme': '#F2CDAC'}},
+        ]
+
+        response = client.post('/finance-api/batch', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201, 200, 200, 200, 201, 200, 201])
+        self.assertEqual(results[0]['data']['amount'], -999)
+        self.assertEqual(results[1]['data']['category'], 'Shopping')
+        self.assertEqual(results[2]['message'], 'Transaction deleted!')
+        self.assertEqual(results[3]['data']['maximum'], 80000)
+        # pot totals are kept on update
+        self.assertEqual(results[5]['data']['total'], 15000)
+        self.assertEqual(results[6]['data']['total'], 31500)
+
+        self.assertEqual(Transaction.objects.filter(user=self.test_user1).count(), 2)
+        self.assertEqual(Budget.objects.filter(user=self.test_user1).count(), 2)
+        self.assertEqual(Pot.objects.get(id=1).name, 'Rainy day')
+
+        # rollups and search index follow the bulk writes
+        response = client.get('/finance-api/budgets?from=2024-07-01&to=2024-07-31')
+        self.assertEqual(response.data['budget_spending'], {'Bills': -999, 'Shopping': -2500})
+        response = client.get('/finance-api/transactions/search/nimbus/Latest/1')
+        self.assertEqual(len(response.data['page_list']), 1)
+
+    def test_post_is_all_or_nothing(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        operations = [
+            {'op': 'delete', 'model': 'transaction', 'id': 1},
+            {'op': 'create', 'model': 'budget', 'data': {'category': 'Shopping', 'maximum': 100, 'theme': ''}},
+            {'op': 'update', 'model': 'pot', 'id': 100, 'data': {'name': 'Rainy day', 'target': 3000, 'theme': '#277C78'}},
+            {'op': 'delete', 'model': 'transaction', 'id': 1},
+            {'op': 'create', 'model': 'transaction', 'data': {'avatar': '/imgurl', 'name': 'Nimbus', 'category': 'Bills', 'date': '2024-07-21T10:05:42Z', 'amount': 'abc'}},
+            {'op': 'rename', 'model': 'pot'},
+        ]
+
+        response = client.post('/finance-api/batch', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        results = response.data['results']
+        self.assertEqual(results[0], {'status': 200})
+        self.assertIn('theme', results[1]['errors'])
+        self.assertEqual(results[2]['message'], 'Object with pot id does not exist')
+        # already deleted earlier in the batch
+        self.assertEqual(results[3]['message'], 'Object with transaction id does not exist')
+        self.assertEqual(results[4]['errors'], {'amount': ['Please enter a valid amount']})
+        self.assertEqual(results[5]['message'], 'Please enter a valid operation')
+
+        self.assertEqual(Transaction.objects.filter(user=self.test_user1).count(), 2)
+        self.assertEqual(Budget.objects.filter(user=self.test_user1).count(), 1)
+
+    def test_post_objects_of_other_user(self):
+        test_user2 = User.objects.create_user(username='testuser2', password='1X<ISRUkw+tuK')
+
+        client = APIClient()
+        client.force_authenticate(test_user2)
+
+        response = client.post('/finance-api/batch', {'operations': [{'op': 'delete', 'model': 'budget', 'id': 1}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Budget.objects.filter(id=1).exists())
+
+    @override_settings(PERSONALFINANCE_RESPONSE_CACHE=True)
+    def test_post_invalidates_cached_responses(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        client.get('/finance-api/pots')
+        client.post('/finance-api/batch', {'operations': [{'op': 'delete', 'model': 'pot', 'id': 1}]}, format='json')
+
+        response = client.get('/finance-api/pots')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data), 0)
+
+    # the group an updated row leaves is detected again too
+    def test_post_update_out_of_series(self):
+        for month in (4, 5, 6):
+            Transaction.objects.create(avatar='/imgurl', name='Netflix', category='Entertainment', date=f'2024-0{month}-15T10:00:00Z', amount=-1599, recurring=False, user=self.test_user1)
+        latest = Transaction.objects.get(name='Netflix', date__month=6)
+        self.assertIsNotNone(latest.series_id)
+
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+        data = {'avatar': '/imgurl', 'name': 'Netflix', 'category': 'Entertainment', 'date': '2024-06-15T10:00:00Z', 'amount': -2599, 'recurring': False}
+        response = client.post('/finance-api/batch', {'operations': [{'op': 'update', 'model': 'transaction', 'id': latest.id, 'data': data}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        # two occurrences left: no series
+        self.assertFalse(Transaction.objects.filter(name='Netflix', series__isnull=False).exists())
+
+    # same amounts as the single object views
+    def test_post_amounts_like_single_views(self):
+        client = APIClient()
+        client.force_authenticate(self.test_user1)
+
+        data = {'category': 'Shopping', 'maximum': 900.56, 'theme': '#82C9D7'}
+        single = client.post('/finance-api/budgets', data, format='json')
+        batch = client.post('/finance-api/batch', {'operations': [{'op': 'create', 'model': 'budget', 'data': {**data, 'category': 'Dining Out'}}]}, format='json')
+        self.assertEqual(single.data['maximum'], 90056)
+        self.assertEqual(batch.data['results'][0]['data']['maximum'], 90056)
+
+        # a missing amount is a validation error, not a server error
+        response = client.post('/finance-api/budgets', {'category': 'Groceries', 'theme': '#82C9D7'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'maximum': ['Please enter a valid amount']})
@@ -0,0 +1,159 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .pool import pool_stats
+
+
+logger = logging.getLogger('personalfinance.timing')
+
+# requests over either threshold are logged as warnings with their slowest queries
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_QUERIES = 30
+LOGGED_QUERIES = 10
+
+# timing of the current request, None outside of ServerTimingMiddleware
+# (copied into the threads of sync_to_async, the async views' queries count too)
+current_timing = ContextVar('personalfinance_timing', default=None)
+
+
+class RequestTiming:
+    def __init__(self):
+        # (sql, ms) of every query, appended from any thread of the request
+        self.queries = []
+        self.durations = {}
+
+    def add(self, name, ms):
+        self.durations[name] = self.durations.get(name, 0) + ms
+
+    @property
+    def db_ms(self):
+        return sum(ms for sql, ms in self.queries)
+
+
+# time a block of the current request under `name` (nothing to do outside a timed request)
+@contextmanager
+def timed(name):
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, (time.perf_counter() - start) * 1000)
+
+
+def record_query(execute, sql, params, many, context):
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.queries.append((sql, (time.perf_counter() - start) * 1000))
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def server_timing_header(timing, total_ms):
+    metrics = [f'db;dur={timing.db_ms:.1f};desc="{len(timing.queries)} queries"']
+    metrics += [f'{name};dur={ms:.1f}' for name, ms in timing.durations.items()]
+    metrics.append(f'total;dur={total_ms:.1f}')
+
+    return ', '.join(metrics)
+
+
+# query count and time, serializer time and total time of every request as a Server-Timing header
+# and a log line, slow requests are logged with their slowest queries
+# removed from the middleware chain unless PERSONALFINANCE_SERVER_TIMING is set
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERSONALFINANCE_SERVER_TIMING', False):
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'PERSONALFINANCE_SLOW_REQUEST_MS', SLOW_REQUEST_MS)
+        self.slow_queries = getattr(settings, 'PERSONALFINANCE_SLOW_REQUEST_QUERIES', SLOW_REQUEST_QUERIES)
+
+        # every connection, also the ones opened later by other threads
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all():
+            install_query_recorder(connection=connection)
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+
+        return self.finish(request, response, timing, start)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timing.reset(token)
+
+        return self.finish(request, response, timing, start)
+
+    def finish(self, request, response, timing, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        response['Server-Timing'] = server_timing_header(timing, total_ms)
+
+        line = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(timing.db_ms, 1),
+            'queries': len(timing.queries),
+            **{f'{name}_ms': round(ms, 1) for name, ms in timing.durations.items()},
+        }
+
+        # connection pool saturation of this process (pooled backend only)
+        pools = pool_stats()
+        if pools:
+            line['pools'] = [
+                {key: stats[key] for key in ('name', 'in_use', 'max_size', 'waiting', 'waits', 'timeouts')}
+                for stats in pools
+            ]
+
+        if total_ms >= self.slow_ms or len(timing.queries) >= self.slow_queries:
+            slowest = sorted(timing.queries, key=lambda query: query[1], reverse=True)[:LOGGED_QUERIES]
+            line['sql'] = [{'ms': round(ms, 2), 'sql': sql} for sql, ms in slowest]
+            logger.warning('slow request %s', json.dumps(line))
+        else:
+            logger.info('request %s', json.dumps(line))
+
+        return response
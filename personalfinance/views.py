@@ -1,22 +1,45 @@
 from django.shortcuts import render
+from django.http import StreamingHttpResponse
 from django.contrib.auth.models import Group, User
-from django.core.paginator import Paginator
+from django.db import transaction
 from rest_framework import permissions, viewsets, status
 from rest_framework.views import APIView
 from rest_framework.response import Response 
-from .serializers import TransactionSerializer, BudgetSerializer, PotSerializer
+from .serializers import TransactionSerializer, BudgetSerializer, PotSerializer, budget_values, pot_values, transaction_values
 from .models import Transaction, Budget, Pot
-from knox.auth import TokenAuthentication
-from .helpers import get_sort_str
+from .archive import archived_rows
+from .authentication import CachedTokenAuthentication
+from .batch import MAX_OPERATIONS, run_batch
+from .cache import cache_response, conditional_response
+from .helpers import parse_amount, scale_amounts, filter_transactions, get_overview_includes, get_summary_mode, get_sort_str, get_spending_period
+from .exports import CONTENT_TYPES, export_lines, export_rows
+from .imports import get_import_format, import_transactions, parse_rows
+from .pagination import paginate_transactions
+from .pots import PotError, move_pot_total, transfer_between_pots
+from .query_budget import query_budget
+from .routers import read_from_replica
+from .recurring import RECURRING, get_recurring_summary
+from .spending import get_budget_spending, get_transaction_summary
 
 # Create your views here.
 # Overview page
 class IndexView(APIView):
     # check if user is authenticated
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
 
+    # pots, budgets, spending (up to 3), recent transactions, summary (2) and the 3 lists
+    @query_budget(12)
+    @read_from_replica
+    @conditional_response
+    @cache_response
     def get(self, request, *args, **kwargs):
+        # spending period (current month by default)
+        try:
+            period = get_spending_period(request.query_params)
+        except ValueError:
+            return Response({ 'message': 'Please enter a valid date range' }, status=status.HTTP_400_BAD_REQUEST)
+
         # get content of overview page
         # pots and budget
         pots = Pot.objects.filter(user=request.user.id)
@@ -24,17 +47,12 @@ class IndexView(APIView):
         # transactions
         transactions = Transaction.objects.filter(user=request.user.id)
         
-        # calculate budget spending
-        budget_spending = {}
-        # get all budget categories
-        for budget in budgets:
-            budget_spending[f'{budget.category}'] = 0
-        
-        # using budget category loop over transactions (might have to filter further using date*)
-        for key in budget_spending:
-            for transaction in transactions:
-                if key == transaction.category:
-                    budget_spending[f'{key}'] += transaction.amount
+        # pots and budget serializing (values rows, no model instances)
+        pots_data = pot_values.serialize(pots)
+        budgets_data = budget_values.serialize(budgets)
+
+        # calculate budget spending in period
+        budget_spending = get_budget_spending(request.user.id, [budget['category'] for budget in budgets_data], period)
 
         # 5 recent transactions
         recent_transactions = transactions.order_by('-date')[:5] 
@@ -43,63 +61,65 @@ class IndexView(APIView):
         # income
         income = transactions.filter(amount__gt=0)
         # recurring bills
-        recurring_bills = transactions.filter(recurring=True)
-        
-        # pots and budget serializing
-        pots_serializer = PotSerializer(pots, many=True)
-        budgets_serializer = BudgetSerializer(budgets, many=True)
-
-        # transactions serializing  
-        recent_serializer = TransactionSerializer(recent_transactions, many=True)
-        expenses_serializer = TransactionSerializer(expenses, many=True)
-        income_serializer = TransactionSerializer(income, many=True)
-        recurring_serializer = TransactionSerializer(recurring_bills, many=True)
-
-
-        return Response({ 'pots': pots_serializer.data,
-                          'budgets': budgets_serializer.data,
-                          'income': income_serializer.data,
-                          'expenses': expenses_serializer.data,
-                          'recent_transactions': recent_serializer.data,
-                          'recurring_bills': recurring_serializer.data,
-                          'budget_spending': budget_spending
-                        }, status=status.HTTP_200_OK) 
+        recurring_bills = transactions.filter(RECURRING)
+        lists = { 'income': income, 'expenses': expenses, 'recurring_bills': recurring_bills }
+
+        data = { 'pots': pots_data,
+                 'budgets': budgets_data,
+                 'recent_transactions': transaction_values.serialize(recent_transactions),
+                 'budget_spending': budget_spending
+               }
+
+        # ?summary=1 -> totals and counts instead of every row, ?include=income,expenses adds full lists
+        if get_summary_mode(request.query_params):
+            data['summary'] = get_transaction_summary(request.user.id)
+            lists = { name: lists[name] for name in get_overview_includes(request.query_params) }
+
+        for name, queryset in lists.items():
+            data[name] = transaction_values.serialize(queryset)
+
+        return Response(data, status=status.HTTP_200_OK) 
     
 
 class BudgetListView(APIView):
     # check if user is authenticated
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
     
+    # budgets and spending (up to 3)
+    @query_budget(4)
+    @read_from_replica
+    @conditional_response
+    @cache_response
     def get(self, request, *args, **kwargs):
+        # spending period (current month by default)
+        try:
+            period = get_spending_period(request.query_params)
+        except ValueError:
+            return Response({ 'message': 'Please enter a valid date range' }, status=status.HTTP_400_BAD_REQUEST)
+
         # get all budgets of user & budget spending
         budgets = Budget.objects.filter(user = request.user.id)
-        transactions = Transaction.objects.filter(user=request.user.id)
-        # calculate budget spending
-        budget_spending = {}
-        # get all budget categories
-        for budget in budgets:
-            budget_spending[f'{budget.category}'] = 0
-        
-        # using budget category loop over transactions (migth have to filter further using date*)
-        for key in budget_spending:
-            for transaction in transactions:
-                if key == transaction.category:
-                    budget_spending[f'{key}'] += transaction.amount
-
-        serializer = BudgetSerializer(budgets, many=True)
+        budgets_data = budget_values.serialize(budgets)
+        # calculate budget spending in period
+        budget_spending = get_budget_spending(request.user.id, [budget['category'] for budget in budgets_data], period)
 
-        return Response({'budgets': serializer.data, 'budget_spending': budget_spending}, status=status.HTTP_200_OK)
+        return Response({'budgets': budgets_data, 'budget_spending': budget_spending}, status=status.HTTP_200_OK)
     
     # CREATE NEW
+    @query_budget(2)
     def post(self, request, *args, **kwargs):
         # create object from request
         data = {
             'category': request.data.get('category'), 
-            'maximum': float(request.data.get('maximum')) * 100,
+            'maximum': request.data.get('maximum'),
             'theme': request.data.get('theme'), 
             'user': request.user.id
         }
+        # amounts scaled and validated like the batch operations
+        data, errors = scale_amounts('budget', 'create', data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = BudgetSerializer(data=data)
 
@@ -113,7 +133,7 @@ class BudgetListView(APIView):
 
 class BudgetDetailView(APIView):
     # check if user is authenticated
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
     
     # helper method to get budget instance
@@ -124,6 +144,9 @@ class BudgetDetailView(APIView):
                 return None
 
     # GET
+    @query_budget(1)
+    @read_from_replica
+    @conditional_response
     def get(self, request, budget_id, *args, **kwargs):
        
         budget_instance = self.get_object(budget_id, request.user.id)
@@ -138,6 +161,7 @@ class BudgetDetailView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)        
     
     # UPDATE
+    @query_budget(3)
     def put(self, request, budget_id, *args, **kwargs):
         
         budget_instance = self.get_object(budget_id, request.user.id)
@@ -150,10 +174,13 @@ class BudgetDetailView(APIView):
         
         data = {
             'category': request.data.get('category'), 
-            'maximum': float(request.data.get('maximum')) * 100,
+            'maximum': request.data.get('maximum'),
             'theme': request.data.get('theme'), 
             'user': request.user.id
         }
+        data, errors = scale_amounts('budget', 'update', data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = BudgetSerializer(budget_instance, data=data)
 
@@ -164,6 +191,7 @@ class BudgetDetailView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     # DELETE
+    @query_budget(2)
     def delete(self, request, budget_id, *args, **kwargs):
 
         budget_instance = self.get_object(budget_id, request.user.id)
@@ -182,130 +210,132 @@ class BudgetDetailView(APIView):
         )   
 
 class BudgetSpendingView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
 
+    @query_budget(1)
+    @read_from_replica
+    @conditional_response
     def get(self, request, category, *args, **kwargs):
         spending = Transaction.objects.filter(user=request.user.id, category=category).order_by('-date')[:3]
 
-        serializer = TransactionSerializer(spending, many=True)
-
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(transaction_values.serialize(spending), status=status.HTTP_200_OK)
     
 class NewBudgetSpendingView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
 
+    # rollups and the partial months around them
+    @query_budget(3)
+    @read_from_replica
+    @conditional_response
     def get(self, request, category, *args, **kwargs):
-        spending = Transaction.objects.filter(user=request.user.id, category=category)
-
-        budget_spending = {}
-        budget_spending[category] = 0
+        # spending period (current month by default)
+        try:
+            period = get_spending_period(request.query_params)
+        except ValueError:
+            return Response({ 'message': 'Please enter a valid date range' }, status=status.HTTP_400_BAD_REQUEST)
 
-        for transaction in spending:
-            if category == transaction.category:
-                budget_spending[category] += transaction.amount
+        budget_spending = get_budget_spending(request.user.id, [category], period)
 
         return Response(budget_spending, status=status.HTTP_200_OK)             
 
 
 class TransactionListView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
 
+    @query_budget(4)
+    @read_from_replica
+    @conditional_response
     def get(self, request, search_term, category, sort_by, page, *args, **kwargs):
         try:
             # sort by
-            sort = get_sort_str(sort_by)
+            sort = get_sort_str(sort_by, search=search_term != 'empty')
 
-            transactions = Transaction.objects.filter(user=request.user.id).order_by(sort)
+            # search term and category
+            transactions = filter_transactions(request.user.id, search_term, category, sort)
 
-            # empty search and specific category
-            if search_term == 'empty' and category != 'All':
-                transactions = transactions.filter(category=category)    
-            
-            # with search term
-            if search_term != 'empty':
-                # all categories
-                if category == 'All':
-                    transactions = transactions.filter(name__icontains=search_term)
-                    
-                # specific category
-                if category != 'All':
-                    transactions = transactions.filter(category=category, name__icontains=search_term)
-
-            # 10 transactions per page
-            paginator = Paginator(transactions, 10)
-            page_obj = paginator.page(page) 
-            
-            serializer = TransactionSerializer(page_obj, many=True)
+            # 10 transactions per page (page number or cursor)
+            data = paginate_transactions(transactions, sort, page, request.query_params)
 
-            return Response({ 'page_list': serializer.data, 'num_pages': paginator.num_pages }, status=status.HTTP_200_OK)
+            return Response(data, status=status.HTTP_200_OK)
         
         except:
             return Response({ 'page_list': [], 'num_pages': 0 }, status=status.HTTP_204_NO_CONTENT)
 
 
 class TransactionSearchView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
 
+    @query_budget(4)
+    @read_from_replica
+    @conditional_response
     def get(self, request, sort_by, page, search_term, *args, **kwargs):
         try:
-            sort = get_sort_str(sort_by)
+            sort = get_sort_str(sort_by, search=search_term != 'empty')
 
-            transactions = Transaction.objects.filter(user=request.user.id).order_by(sort)
-            
-            if search_term != 'empty':
-                transactions = Transaction.objects.filter(user=request.user.id, name__icontains=search_term).order_by(sort)
+            transactions = filter_transactions(request.user.id, search_term, 'All', sort)
 
-            # 10 transactions per page
-            paginator = Paginator(transactions, 10)
-            page_obj = paginator.page(page) 
-            
-            serializer = TransactionSerializer(page_obj, many=True)
+            # 10 transactions per page (page number or cursor)
+            data = paginate_transactions(transactions, sort, page, request.query_params)
         
-            return Response({ 'page_list': serializer.data, 'num_pages': paginator.num_pages }, status=status.HTTP_200_OK)
+            return Response(data, status=status.HTTP_200_OK)
         
         except:
             return Response({ 'page_list': [], 'num_pages': 0 }, status=status.HTTP_204_NO_CONTENT)   
 
 
 class RecurringTransactionsView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
+    # cached until the next recurring transaction write
+    data_scope = 'recurring'
 
+    @query_budget(1)
+    @read_from_replica
+    @conditional_response
+    @cache_response
     def get(self, request, *args, **kwargs):
-        
-        transactions = Transaction.objects.filter(user=request.user.id)
-        recurring_bills = transactions.filter(recurring=True, amount__lt=0)
+        # ?summary=1 -> latest occurrence of every bill, paid / upcoming / due soon this month and their totals
+        if get_summary_mode(request.query_params):
+            return Response(get_recurring_summary(request.user.id), status=status.HTTP_200_OK)
 
-        serializer = TransactionSerializer(recurring_bills, many=True)
+        transactions = Transaction.objects.filter(user=request.user.id)
+        recurring_bills = transactions.filter(RECURRING, amount__lt=0)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(transaction_values.serialize(recurring_bills), status=status.HTTP_200_OK)
 
 
 class PotListView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
     
+    @query_budget(1)
+    @read_from_replica
+    @conditional_response
+    @cache_response
     def get(self, request, *args, **kwargs):
         # get all pots of user
         pots = Pot.objects.filter(user = request.user.id)
-        serializer = PotSerializer(pots, many=True)
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(pot_values.serialize(pots), status=status.HTTP_200_OK)
     
     # CREATE NEW
+    @query_budget(2)
     def post(self, request, *args, **kwargs):
         
         data = {
             'name': request.data.get('name'), 
-            'target': float(request.data.get('target')) * 100,
-            'total': float(request.data.get('total')) * 100,
+            'target': request.data.get('target'),
+            'total': request.data.get('total'),
             'theme': request.data.get('theme'), 
             'user': request.user.id
         }
+        data, errors = scale_amounts('pot', 'create', data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = PotSerializer(data=data)
 
@@ -318,7 +348,7 @@ class PotListView(APIView):
         
         
 class PotDetailView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
 
     # helper method to get budget instance
@@ -329,6 +359,9 @@ class PotDetailView(APIView):
                 return None
 
     # GET
+    @query_budget(1)
+    @read_from_replica
+    @conditional_response
     def get(self, request, pot_id, *args, **kwargs):
        
         pot_instance = self.get_object(pot_id, request.user.id)
@@ -343,6 +376,7 @@ class PotDetailView(APIView):
         return Response(serializer.data, status=status.HTTP_200_OK)        
     
     # UPDATE
+    @query_budget(3)
     def put(self, request, pot_id, *args, **kwargs):
         
         pot_instance = self.get_object(pot_id, request.user.id)
@@ -355,11 +389,14 @@ class PotDetailView(APIView):
         
         data = {
             'name': request.data.get('name'), 
-            'target': float(request.data.get('target')) * 100,
+            'target': request.data.get('target'),
             'total': pot_instance.total,
             'theme': request.data.get('theme'), 
             'user': request.user.id
         }
+        data, errors = scale_amounts('pot', 'update', data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = PotSerializer(pot_instance, data=data)
 
@@ -370,6 +407,7 @@ class PotDetailView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     # DELETE
+    @query_budget(2)
     def delete(self, request, pot_id, *args, **kwargs):
 
         pot_instance = self.get_object(pot_id, request.user.id)
@@ -390,86 +428,95 @@ class PotDetailView(APIView):
 
 # withdraw from pot
 class PotWithdrawView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_object(self, pot_id, user_id):
-        try:
-            return Pot.objects.get(id=pot_id, user=user_id)
-        except Pot.DoesNotExist:
-            return None
-        
+    # a rejected amount reads the pot to tell why
+    @query_budget(5)
     def put(self, request, pot_id, *args, **kwargs):
+        amount = parse_amount(request.data.get('amount'))
 
-        pot_instance = self.get_object(pot_id, request.user.id)
+        if amount is None:
+            return Response({ 'amount': ['Please enter a valid amount'] }, status=status.HTTP_400_BAD_REQUEST)
 
-        if not pot_instance:
-            return Response(
-                { 'message': 'Object with pot id does not exist' }, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        data = {
-            'name': pot_instance.name, 
-            'target': pot_instance.target,
-            'total': pot_instance.total - (float(request.data.get('amount')) * 100),
-            'theme': pot_instance.theme, 
-            'user': request.user.id
-        }
+        # one conditional update, concurrent withdrawals can't overdraw the pot
+        try:
+            pot_instance = move_pot_total(pot_id, request.user.id, -amount)
+        except PotError as error:
+            if error.message:
+                return Response({ 'message': error.message }, status=status.HTTP_400_BAD_REQUEST)
+            return Response(error.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = PotSerializer(pot_instance, data=data)
+        serializer = PotSerializer(pot_instance)
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.data, status=status.HTTP_200_OK)
             
 # add to pot
 class PotAddView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_object(self, pot_id, user_id):
+    # a rejected amount reads the pot to tell why
+    @query_budget(5)
+    def put(self, request, pot_id, *args, **kwargs):
+        amount = parse_amount(request.data.get('amount'))
+
+        if amount is None:
+            return Response({ 'amount': ['Please enter a valid amount'] }, status=status.HTTP_400_BAD_REQUEST)
+
+        # one conditional update, concurrent additions can't go past the target
         try:
-            return Pot.objects.get(id=pot_id, user=user_id)
-        except Pot.DoesNotExist:
-            return None
+            pot_instance = move_pot_total(pot_id, request.user.id, amount)
+        except PotError as error:
+            if error.message:
+                return Response({ 'message': error.message }, status=status.HTTP_400_BAD_REQUEST)
+            return Response(error.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def put(self, request, pot_id, *args, **kwargs):
-        
-        pot_instance = self.get_object(pot_id, request.user.id)
+        serializer = PotSerializer(pot_instance)
 
-        if not pot_instance:
-            return Response(
-                { 'message': 'Object with pot id does not exist' }, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        data = {
-            'name': pot_instance.name, 
-            'target': pot_instance.target,
-            'total': pot_instance.total + float(request.data.get('amount')) * 100,
-            'theme': pot_instance.theme, 
-            'user': request.user.id
-        }
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-        serializer = PotSerializer(pot_instance, data=data)
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+# move money between pots (all transfers or none)
+class PotTransferView(APIView):
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = [permissions.IsAuthenticated]
+
+    @query_budget(4)
+    def post(self, request, *args, **kwargs):
+        try:
+            transfers = [
+                (int(transfer['from']), int(transfer['to']), parse_amount(transfer['amount']))
+                for transfer in request.data.get('transfers')
+            ]
+        except (KeyError, TypeError, ValueError):
+            transfers = None
+
+        if not transfers or any(amount is None for _, _, amount in transfers):
+            return Response({ 'message': 'Please enter valid transfers' }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            pots = transfer_between_pots(request.user.id, transfers)
+        except PotError as error:
+            if error.message:
+                return Response({ 'message': error.message }, status=status.HTTP_400_BAD_REQUEST)
+            return Response(error.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = PotSerializer(pots, many=True)
+
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 # transaction form views
 # transaction create view
 class TransactionCreateView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
       
-    # CREATE NEW
+    # CREATE NEW (row and spending rollups are written together)
+    # series detection 2, the rollup and series writes extend the budget (checked before the commit)
+    @transaction.atomic
+    @query_budget(7)
     def post(self, request, *args, **kwargs):
         # income or expense?*
         # user transactions limit?*
@@ -479,10 +526,13 @@ class TransactionCreateView(APIView):
             'name': request.data.get('name'), 
             'category': request.data.get('category'),
             'date': request.data.get('date'),
-            'amount': float(request.data.get('amount')) * 100,
+            'amount': request.data.get('amount'),
             'recurring': request.data.get('recurring'),
             'user': request.user.id
         }
+        data, errors = scale_amounts('transaction', 'create', data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = TransactionSerializer(data=data)
 
@@ -494,19 +544,73 @@ class TransactionCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# bulk import (CSV or NDJSON upload)
+class TransactionImportView(APIView):
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = [permissions.IsAuthenticated]
+
+    # series detection, the inserts (a few per 500 rows), rollups (per category and month) and series
+    # writes extend the budget with the file, checked before the commit; a query per row goes far over
+    @query_budget(4)
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        fmt = get_import_format(upload, request.data.get('format')) if upload else None
+
+        if not fmt:
+            return Response(
+                { 'message': 'Please upload a CSV or NDJSON file' },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = import_transactions(request.user.id, parse_rows(upload, fmt))
+
+        return Response(result, status=status.HTTP_201_CREATED if result['imported'] else status.HTTP_400_BAD_REQUEST)
+
+
+# streamed export (CSV or NDJSON) with the transaction list filters
+class TransactionExportView(APIView):
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = [permissions.IsAuthenticated]
+
+    @query_budget(3)
+    @read_from_replica
+    @conditional_response
+    def get(self, request, fmt, search_term, category, sort_by, *args, **kwargs):
+        if fmt not in CONTENT_TYPES:
+            return Response(
+                { 'message': 'Please choose csv or ndjson' },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        sort = get_sort_str(sort_by, search=search_term != 'empty')
+        transactions = filter_transactions(request.user.id, search_term, category, sort)
+        archived = archived_rows(request.user.id, search_term, category, sort)
+
+        response = StreamingHttpResponse(
+            export_lines(export_rows(transactions, sort, archived), fmt),
+            content_type=CONTENT_TYPES[fmt]
+        )
+        response['Content-Disposition'] = f'attachment; filename="transactions.{fmt}"'
+
+        return response
+
+
 # transaction detail view
 class TransactionDetailView(APIView):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [permissions.IsAuthenticated]
 
-    # helper method to get budget instance
+    # helper method to get budget instance (row locked until the end of the request transaction)
     def get_object(self, t_id, user_id):
             try:
-                return Transaction.objects.get(id=t_id,  user=user_id)
+                return Transaction.objects.select_for_update().get(id=t_id,  user=user_id)
             except Transaction.DoesNotExist:
                 return None
 
     # UPDATE
+    # locked row, previous values, series detection 2, the rollup and series writes extend the budget
+    @transaction.atomic
+    @query_budget(6)
     def put(self, request, t_id, *args, **kwargs):
         
         transaction_instance = self.get_object(t_id, request.user.id)
@@ -536,6 +640,9 @@ class TransactionDetailView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     # DELETE
+    # the rollup writes extend the budget
+    @transaction.atomic
+    @query_budget(2)
     def delete(self, request, t_id, *args, **kwargs):
 
         transaction_instance = self.get_object(t_id, request.user.id)
@@ -551,4 +658,25 @@ class TransactionDetailView(APIView):
         return Response(
             { 'message': 'Transaction deleted!' },
             status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        )
+
+
+# many create / update / delete operations in one request and one database transaction
+class BatchView(APIView):
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = [permissions.IsAuthenticated]
+
+    # locked objects and a delete per model, series detection; bulk inserts and updates, rollups (per
+    # category and month) and series writes extend the budget with the operations, checked before the commit
+    @query_budget(11)
+    def post(self, request, *args, **kwargs):
+        operations = request.data.get('operations')
+
+        if not isinstance(operations, list) or not operations or not all(isinstance(operation, dict) for operation in operations):
+            return Response({ 'message': 'Please enter a list of operations' }, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > MAX_OPERATIONS:
+            return Response({ 'message': f'Max {MAX_OPERATIONS} operations per batch' }, status=status.HTTP_400_BAD_REQUEST)
+
+        ok, results = run_batch(request.user.id, operations)
+
+        return Response({ 'results': results }, status=status.HTTP_200_OK if ok else status.HTTP_400_BAD_REQUEST)
\ No newline at end of file